@@ -0,0 +1,285 @@
+"""
+热点路径的基准测试
+
+每项测试使用固定随机种子生成的工作量，重复多次取中位数，结果写成JSON；
+指定基准文件时逐项对比，慢于基准超过阈值的项标记为退化，并以非零状态码退出。
+
+用法:
+    python benchmark.py --output baseline.json             # 保存基准
+    python benchmark.py --baseline baseline.json           # 与基准对比
+    python benchmark.py --filter hand_type --repeats 9     # 只运行名称包含hand_type的测试
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from card.poker.poker_card import PokerCard
+from engine import GameEngine
+from environment import Environment
+from policy import GreedyPolicy, RandomPolicy
+from player import Player
+
+# 测试名称 -> 准备函数，准备函数接收随机数生成器，返回(每次重复执行的函数, 每次执行包含的操作数)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """注册一项基准测试"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _standard_deck(effects=False, rng=None):
+    """52张标准牌，effects为True时每张牌随机带一种效果"""
+    deck = []
+    for suit in PokerCard.SUITS[:4]:
+        for value in PokerCard.VALUES[:13]:
+            effect = rng.choice(PokerCard.EFFECTS) if effects else None
+            deck.append(PokerCard(suit, value, effect))
+    return deck
+
+
+def _random_hands(rng, size, count, effects=False):
+    deck = _standard_deck(effects, rng)
+    return [rng.sample(deck, size) for _ in range(count)]
+
+
+def _quiet_environment(rng):
+    player = Player(verbose=False)
+    return player, Environment(player, verbose=False, seed=rng.getrandbits(32))
+
+
+def _hand_type_setup(size, fast):
+    def setup(rng):
+        hand_rank = Player(verbose=False).poker_hand_rank
+        hands = _random_hands(rng, size, 2000)
+        classify = hand_rank.get_hand_type_fast if fast else hand_rank.get_hand_type
+
+        def run():
+            for hand in hands:
+                classify(hand)
+        return run, len(hands)
+    return setup
+
+
+for _size in range(1, 6):
+    benchmark(f'get_hand_type[{_size}]')(_hand_type_setup(_size, fast=False))
+    benchmark(f'get_hand_type_fast[{_size}]')(_hand_type_setup(_size, fast=True))
+
+
+def _compute_score_setup(effects):
+    def setup(rng):
+        player = Player(verbose=False)
+        hands = [hand for size in range(1, 6) for hand in _random_hands(rng, size, 400, effects)]
+        hand_rank = player.poker_hand_rank
+        jokers = player.jokers
+
+        def run():
+            for hand in hands:
+                player.compute_score(hand, hand_rank, jokers)
+        return run, len(hands)
+    return setup
+
+
+benchmark('compute_score')(_compute_score_setup(effects=False))
+benchmark('compute_score[effects]')(_compute_score_setup(effects=True))
+
+
+@benchmark('send_poker_card')
+def _send_poker_card(rng):
+    player, environment = _quiet_environment(rng)
+    pool = environment.poker_card_pool
+    rounds = 1000
+
+    def run():
+        # 发完整手后把手牌放回牌池，牌池大小保持不变
+        for _ in range(rounds):
+            environment.send_poker_card(player.hand_limit)
+            pool.extend(player.hand)
+            player.hand.clear()
+    return run, rounds
+
+
+@benchmark('refill_hand')
+def _refill_hand(rng):
+    player, environment = _quiet_environment(rng)
+    pool = environment.poker_card_pool
+    environment.refill_hand()
+    rounds = 1000
+
+    def run():
+        # 每次打出前5张再补满，与出牌后的补牌相同
+        for _ in range(rounds):
+            played = player.hand[:5]
+            del player.hand[:5]
+            environment.refill_hand()
+            pool.extend(played)
+    return run, rounds
+
+
+@benchmark('init_shop')
+def _init_shop(rng):
+    _, environment = _quiet_environment(rng)
+    rounds = 2000
+
+    def run():
+        for _ in range(rounds):
+            environment.init_shop()
+    return run, rounds
+
+
+@benchmark('refresh_shop')
+def _refresh_shop(rng):
+    _, environment = _quiet_environment(rng)
+    rounds = 2000
+
+    def run():
+        for _ in range(rounds):
+            environment.refresh_shop()
+    return run, rounds
+
+
+def _games_setup(policy, games):
+    def setup(rng):
+        seeds = [rng.getrandbits(32) for _ in range(games)]
+
+        def run():
+            for seed in seeds:
+                # RandomPolicy()使用全局随机数，每局重新设置以保证工作量可重复
+                random.seed(seed)
+                GameEngine(seed=seed).run(policy)
+        return run, games
+    return setup
+
+
+benchmark('game[random]')(_games_setup(RandomPolicy(), 200))
+benchmark('game[greedy]')(_games_setup(GreedyPolicy(), 50))
+
+
+def run_benchmarks(names=None, repeats=5, seed=0):
+    """
+    运行基准测试
+
+    参数:
+        names: 要运行的测试名称列表，为None时运行全部
+        repeats: 每项测试的重复次数
+        seed: 生成工作量的随机种子
+
+    返回:
+        dict: 测试名称 -> {'seconds_per_op', 'best_seconds_per_op', 'ops_per_second', 'ops', 'samples'}
+    """
+    results = {}
+    for name in names if names is not None else BENCHMARKS:
+        run, ops = BENCHMARKS[name](random.Random(f'{seed}:{name}'))
+        run()  # 预热：构建查找表、填充缓存
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - start) / ops)
+        median = statistics.median(samples)
+        results[name] = {
+            'seconds_per_op': median,
+            'best_seconds_per_op': min(samples),
+            'ops_per_second': 1 / median,
+            'ops': ops,
+            'samples': samples
+        }
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    与基准逐项对比
+
+    参数:
+        results: run_benchmarks的返回值
+        baseline: 基准JSON中的results部分
+        threshold: 允许的变慢比例，超过时视为退化
+
+    返回:
+        list: (测试名称, 当前耗时/基准耗时, 是否退化)，基准中没有的测试比例为None
+    """
+    rows = []
+    for name, result in results.items():
+        if name not in baseline:
+            rows.append((name, None, False))
+            continue
+        ratio = result['seconds_per_op'] / baseline[name]['seconds_per_op']
+        rows.append((name, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _format_time(seconds):
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.2f}毫秒'
+    return f'{seconds * 1e6:.2f}微秒'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='热点路径基准测试')
+    parser.add_argument('--output', help='结果JSON的保存路径')
+    parser.add_argument('--baseline', help='对比的基准JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='允许的变慢比例，默认0.1即10%%')
+    parser.add_argument('--repeats', type=int, default=5, help='每项测试的重复次数')
+    parser.add_argument('--seed', type=int, default=0, help='生成工作量的随机种子')
+    parser.add_argument('--filter', default='', help='只运行名称包含该字符串的测试')
+    parser.add_argument('--list', action='store_true', help='列出所有测试名称')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return 0
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    results = run_benchmarks(names, args.repeats, args.seed)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeats': args.repeats,
+            'seed': args.seed
+        },
+        'results': results
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        report['comparison'] = {name: ratio for name, ratio, _ in compare(results, baseline, args.threshold)}
+
+    regressions = []
+    ratios = {name: (ratio, regressed) for name, ratio, regressed in compare(results, baseline or {}, args.threshold)}
+    for name, result in results.items():
+        line = f"{name:<24} {_format_time(result['seconds_per_op']):>12}/次  {result['ops_per_second']:>12.0f}次/秒"
+        ratio, regressed = ratios[name]
+        if baseline is not None:
+            if ratio is None:
+                line += '  (基准中没有)'
+            else:
+                line += f"  {ratio:.2f}x {'✗ 退化' if regressed else '✓'}"
+            if regressed:
+                regressions.append(name)
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+    if regressions:
+        print(f"{len(regressions)}项慢于基准超过{args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,82 +1,328 @@
-from .tarot_card import TarotCard
-from ..poker.poker_card import PokerCard
+# -*- coding: utf-8 -*-
+import sys
+import os
 
-def apply_tarrot(tarot_card:TarotCard,poker_card:PokerCard=None,**kwargs):
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from card.Tarot.tarot_card import TarotCard
+from card.poker.poker_card import PokerCard
+from card.poker.poker_card_set import PokerCardSet
+
+# 牌的整数编码中各部分的权重，见PokerCard.code
+_NUM_VALUES = len(PokerCard.VALUES)
+_NUM_SUITS = len(PokerCard.SUITS)
+_EFFECT_STRIDE = _NUM_SUITS * _NUM_VALUES
+STONE_CODE = PokerCard('No_suits', 'stone').code
+# SELECTIVE_BOOST的点数变化：2-10加一，10变J，J变Q，Q变K，K变A，A变2，石头牌不变
+_NEXT_RANK = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 0, 13]
+
+# 一次使用塔罗牌最多选择的目标牌数
+MAX_TARGETS = 3
+
+# 塔罗牌效果的种类
+MODIFY = 'modify'  # 改写每张目标牌的编码
+DESTROY = 'destroy'  # 从手牌中移除目标牌
+CREATE = 'create'  # 向手牌末尾加入一张新牌
+FUNDS = 'funds'  # 改变资金
+
+
+class TarotRule:
+    """
+    一种塔罗牌的效果
+
+    transform(value, tarot_card)：MODIFY时value为目标牌的编码，返回新编码；
+    FUNDS时value为当前资金，返回新资金；CREATE时value为None，返回新牌的编码。
+    目标牌数需在[min_targets, max_targets]内，CREATE和FUNDS不使用目标牌。
+    """
+    __slots__ = ('kind', 'transform', 'min_targets', 'max_targets', 'requires_suits')
+
+    def __init__(self, kind, transform=None, min_targets=0, max_targets=MAX_TARGETS, requires_suits=False):
         """
-        应用塔罗牌效果到手牌
+        参数:
+            kind: 效果种类，MODIFY/DESTROY/CREATE/FUNDS之一
+            transform: 改写编码或资金的函数，DESTROY不需要
+            min_targets, max_targets: 目标牌数的范围
+            requires_suits: 是否需要塔罗牌指定花色（TarotCard.suits）
         """
-        tarot_type=tarot_card.tarot_type
-        
-        if tarot_type == 'POINT_BOOST':
-            # 给一张poker手牌增加点数30
-            assert isinstance(poker_card, list[PokerCard]), "必须是PokerCard对象"
-                # 选择第一张手牌来应用效果
-            assert len(poker_card) == 1, "POINT_BOOST效果只能应用于一张牌"
-            # 选择第一张手牌来应用效果
-            poker_card.effect = 'POINT_PLUS_30'
-            return poker_card
-            
-                
-        elif tarot_type == 'MULTIPLIER_ADD':
-            assert isinstance(poker_card, list[PokerCard]), "必须是PokerCard对象"
-            assert len(poker_card) == 1, "MULTIPLIER_ADD效果只能应用于一张牌"
-            poker_card.effect='MULTIPLIER_PLUS_4'
-            return poker_card
-            
-                
-        elif tarot_type == 'MULTIPLIER_BOOST':
-            assert isinstance(poker_card, list[PokerCard]), "必须是PokerCard对象"
-            assert len(poker_card) == 1, "MULTIPLIER_BOOST效果只能应用于一张牌"
-            poker_card.effect='MULTIPLIER_TIMES_1_5'
-            return poker_card
-            
-            
-        elif tarot_type == 'SUIT_TRANSFORM':
-            # 最多转变三张手牌为一种花色
-            assert isinstance(poker_card, list[PokerCard])
-            assert len(poker_card) <= 3, "SUIT_TRANSFORM效果最多只能应用于三张牌"
-            target_suit = tarot_card.suit
-            transformed_cards = []
-            # 创建新的手牌列表，保留牌的值但改变花色
-            new_hand = []
-            for i, card in enumerate(poker_card):
-                # 转变花色
-                new_card = PokerCard(target_suit, card.value, card.effect)
-                transformed_cards.append((card, new_card))
-                new_hand.append(new_card)
-            return 
-            
-        elif tarot_type == 'STONE_GENERATOR':
-            # 生成一张石头牌加入手牌
-            stone_card = PokerCard('No_suits', 'stone')  # 使用方块作为石头牌的默认花色
-            return stone_card
-            
-        elif tarot_type == 'CARD_DESTROY':
-            # 摧毁两张手牌
-            assert isinstance(poker_card, list[PokerCard])
-            assert len(poker_card) <= 2, "CARD_DESTROY效果最多只能应用于两张牌"
-            return None
-            
-        elif tarot_type == 'SELECTIVE_BOOST':
-            assert isinstance(poker_card, list[PokerCard])
-            assert len(poker_card) <= 3, "SELECTIVE_BOOST效果最多只能应用于两张牌"
-            # 将两张选定手牌点数加一
-            for i in range(len(poker_card)):
-                card=poker_card[i]
-                if card.value in ['2','3','4','5','6','7','8','9',]:
-                    card.value=str(int(card.value)+1)
-                    poker_card[i]=card
-                else:
-                    if card.value=='J':
-                        card.value='Q'
-                    elif card.value=='Q':
-                        card.value='K'
-                    elif card.value=='K':
-                        card.value='A'
-                    elif card.value=='A':
-                        card.value='2'
-                    elif card.value=='10':
-                        card.value='J'
-                    poker_card[i]=card
-            
-        return poker_card
\ No newline at end of file
+        self.kind = kind
+        self.transform = transform
+        self.min_targets = min_targets
+        self.max_targets = max_targets
+        self.requires_suits = requires_suits
+
+
+def _set_effect(effect):
+    """替换编码中效果部分的函数"""
+    offset = PokerCard._EFFECT_INDEX[effect] * _EFFECT_STRIDE
+
+    def transform(code, tarot_card):
+        return offset + code % _EFFECT_STRIDE
+    return transform
+
+
+def _next_rank(code, tarot_card):
+    """编码中的点数按SELECTIVE_BOOST规则加一"""
+    return code - code % _NUM_VALUES + _NEXT_RANK[code % _NUM_VALUES]
+
+
+def _set_suit(code, tarot_card):
+    """把编码中的花色替换为塔罗牌指定的花色"""
+    effect_index, rest = divmod(code, _EFFECT_STRIDE)
+    return (effect_index * _NUM_SUITS + PokerCard._SUIT_INDEX[tarot_card.suits]) * _NUM_VALUES + rest % _NUM_VALUES
+
+
+def _stone(code, tarot_card):
+    return STONE_CODE
+
+
+def _double_funds(funds, tarot_card):
+    """资金加倍，加倍后最多20，已超过20时不变"""
+    return max(funds, min(funds * 2, 20))
+
+
+# 塔罗牌类型 -> 效果，覆盖TarotCard.TAROT_TYPES的全部类型
+TAROT_RULES = {
+    'POINT_BOOST': TarotRule(MODIFY, _set_effect('POINT_PLUS_30'), 1, 1),
+    'MULTIPLIER_ADD': TarotRule(MODIFY, _set_effect('MULTIPLIER_PLUS_4'), 1, 1),
+    'MULTIPLIER_BOOST': TarotRule(MODIFY, _set_effect('MULTIPLIER_TIMES_1_5'), 1, 1),
+    'FUND_DOUBLE': TarotRule(FUNDS, _double_funds),
+    'SUIT_TRANSFORM': TarotRule(MODIFY, _set_suit, 1, 3, requires_suits=True),
+    'STONE_GENERATOR': TarotRule(CREATE, _stone),
+    'CARD_DESTROY': TarotRule(DESTROY, None, 1, 2),
+    'SELECTIVE_BOOST': TarotRule(MODIFY, _next_rank, 1, 2)
+}
+
+
+def get_tarot_rule(tarot_card, card_indices, hand_size):
+    """
+    校验塔罗牌能否用于所选的牌
+
+    参数:
+        tarot_card: 塔罗牌
+        card_indices: 目标手牌索引列表
+        hand_size: 手牌张数
+
+    返回:
+        TarotRule: 塔罗牌的效果，无效时返回None
+    """
+    rule = TAROT_RULES.get(tarot_card.tarot_type)
+    if rule is None:
+        return None
+    count = len(card_indices)
+    if not rule.min_targets <= count <= rule.max_targets or len(set(card_indices)) != count:
+        return None
+    if not all(0 <= index < hand_size for index in card_indices):
+        return None
+    if rule.requires_suits and not tarot_card.suits:
+        return None
+    return rule
+
+
+class TarotDelta:
+    """
+    一次使用塔罗牌对手牌和资金的改变，undo_tarot据此撤销
+
+    modified: (索引, 原编码, 新编码)元组，被改写的牌
+    removed: (索引, 牌)元组，被移除的牌，按索引从小到大
+    added: 加入手牌末尾的牌
+    funds: 资金的变化量，由调用方加到资金上
+    """
+    __slots__ = ('tarot_type', 'modified', 'removed', 'added', 'funds')
+
+    def __init__(self, tarot_type, modified=(), removed=(), added=(), funds=0):
+        self.tarot_type = tarot_type
+        self.modified = modified
+        self.removed = removed
+        self.added = added
+        self.funds = funds
+
+    def __repr__(self):
+        return (f"TarotDelta(tarot_type='{self.tarot_type}', modified={self.modified}, "
+                f"removed={self.removed}, added={self.added}, funds={self.funds})")
+
+
+def apply_tarot(tarot_card, hand, card_indices=None, funds=0):
+    """
+    把塔罗牌效果一次应用到手牌中的所有目标牌上
+
+    目标牌原地改写（PokerCard.set_code同时更新缓存的编码），手牌为PokerCardSet时
+    同步更新其位集合。资金不在这里修改，变化量记录在返回值中。
+
+    参数:
+        tarot_card: 塔罗牌
+        hand: 手牌，列表或PokerCardSet
+        card_indices: 目标手牌索引列表，CREATE和FUND_DOUBLE不需要
+        funds: 当前资金，用于FUND_DOUBLE
+
+    返回:
+        TarotDelta: 这次使用的改变，无效时返回None且手牌不变
+    """
+    card_indices = list(card_indices or ())
+    rule = get_tarot_rule(tarot_card, card_indices, len(hand))
+    if rule is None:
+        return None
+
+    delta = TarotDelta(tarot_card.tarot_type)
+    kind = rule.kind
+    if kind == MODIFY:
+        transform = rule.transform
+        modified = []
+        for index in card_indices:
+            card = hand[index]
+            code = card.code
+            new_code = transform(code, tarot_card)
+            if new_code != code:
+                card.set_code(new_code)
+            modified.append((index, code, new_code))
+        delta.modified = tuple(modified)
+        if isinstance(hand, PokerCardSet):
+            hand.refresh()
+    elif kind == DESTROY:
+        delta.removed = tuple((index, hand[index]) for index in sorted(card_indices))
+        for index, _ in reversed(delta.removed):
+            hand.pop(index)
+    elif kind == CREATE:
+        card = PokerCard.from_code(rule.transform(None, tarot_card))
+        hand.append(card)
+        delta.added = (card,)
+    else:
+        delta.funds = rule.transform(funds, tarot_card) - funds
+    return delta
+
+
+def undo_tarot(delta, hand):
+    """
+    撤销apply_tarot对手牌的改变，资金由调用方减去delta.funds
+
+    多次使用需按相反的顺序撤销。
+
+    参数:
+        delta: apply_tarot返回的TarotDelta
+        hand: 同一个手牌对象
+    """
+    for _ in delta.added:
+        hand.pop()
+    for index, card in delta.removed:
+        hand.insert(index, card)
+    if delta.modified:
+        for index, code, _ in delta.modified:
+            hand[index].set_code(code)
+        if isinstance(hand, PokerCardSet):
+            hand.refresh()
+
+
+def apply_tarot_codes(tarot_card, hand, card_indices=None, funds=0):
+    """
+    apply_tarot的编码版本，用于不可变的GameState
+
+    参数:
+        tarot_card: 塔罗牌
+        hand: 手牌编码元组
+        card_indices: 目标手牌索引列表
+        funds: 当前资金
+
+    返回:
+        tuple: (新的手牌编码元组, 新的资金)，手牌没有变化时返回原元组；无效时返回None
+    """
+    card_indices = list(card_indices or ())
+    rule = get_tarot_rule(tarot_card, card_indices, len(hand))
+    if rule is None:
+        return None
+
+    kind = rule.kind
+    if kind == MODIFY:
+        transform = rule.transform
+        codes = list(hand)
+        for index in card_indices:
+            codes[index] = transform(codes[index], tarot_card)
+        if codes != list(hand):
+            hand = tuple(codes)
+    elif kind == DESTROY:
+        selected = set(card_indices)
+        hand = tuple([code for index, code in enumerate(hand) if index not in selected])
+    elif kind == CREATE:
+        hand = hand + (rule.transform(None, tarot_card),)
+    else:
+        funds = rule.transform(funds, tarot_card)
+    return hand, funds
+
+
+def apply_tarrot(tarot_card: TarotCard, poker_card: PokerCard = None, **kwargs):
+    """
+    应用塔罗牌效果到手牌（旧接口）
+
+    poker_card为目标牌的列表（或单张牌），效果应用到其中每一张牌上。
+
+    返回:
+        生成新牌的塔罗牌返回新牌，其余返回目标牌列表（CARD_DESTROY后为剩下的牌）
+    """
+    if isinstance(poker_card, PokerCard):
+        poker_card = [poker_card]
+    cards = list(poker_card or ())
+    delta = apply_tarot(tarot_card, cards, range(len(cards)), kwargs.get('funds', 0))
+    if delta is None:
+        raise ValueError(f"{tarot_card.tarot_type}效果不能应用于{len(cards)}张牌")
+    if delta.added:
+        return delta.added[0]
+    return cards
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("===== 塔罗牌效果测试 =====")
+    print(f"覆盖全部塔罗牌类型: {'✓ 通过' if set(TAROT_RULES) == set(TarotCard.TAROT_TYPES) else '✗ 失败'}")
+
+    rng = random.Random(0)
+    tarots = [TarotCard(tarot_type, 3, suits='Hearts' if tarot_type == 'SUIT_TRANSFORM' else None)
+              for tarot_type in TarotCard.TAROT_TYPES]
+    deck = [PokerCard(suit, value, rng.choice(PokerCard.EFFECTS)) for suit in PokerCard.SUITS[:4] for value in PokerCard.VALUES[:13]]
+
+    mismatches = 0
+    restored = 0
+    applied = 0
+    for trial in range(20000):
+        hand = [PokerCard.from_code(card.code) for card in rng.sample(deck, 8)]
+        if trial % 2:
+            hand = PokerCardSet(hand, ordered=True)
+        tarot_card = rng.choice(tarots)
+        card_indices = rng.sample(range(8), rng.randint(0, 3))
+        funds = rng.randint(0, 30)
+        before = [card.code for card in hand]
+        mask = hand.mask if trial % 2 else None
+
+        expected = apply_tarot_codes(tarot_card, tuple(before), card_indices, funds)
+        delta = apply_tarot(tarot_card, hand, card_indices, funds)
+        if (delta is None) != (expected is None):
+            mismatches += 1
+            continue
+        if delta is None:
+            continue
+        applied += 1
+        codes = tuple(card.code for card in hand)
+        if expected != (codes, funds + delta.funds):
+            mismatches += 1
+        if trial % 2 and hand.mask != PokerCardSet([PokerCard.from_code(code) for code in codes]).mask:
+            mismatches += 1
+        undo_tarot(delta, hand)
+        restored += [card.code for card in hand] == before and (mask is None or hand.mask == mask)
+    print(f"对象与编码版本一致（{applied}次有效使用）: {'✓ 通过' if mismatches == 0 else f'✗ 失败 {mismatches}'}")
+    print(f"撤销后手牌恢复: {'✓ 通过' if restored == applied else f'✗ 失败 {applied - restored}'}")
+
+    card = PokerCard('Spades', 'K')
+    boosted = apply_tarrot(TarotCard('SELECTIVE_BOOST', 4), [card])
+    print(f"旧接口apply_tarrot: {'✓ 通过' if boosted == [card] and card.value == 'A' and card.code == PokerCard('Spades', 'A').code else '✗ 失败'}")
+
+    # 搜索中试用塔罗牌：原地应用再撤销，对比复制手牌
+    hand = [PokerCard.from_code(card.code) for card in deck[:8]]
+    boost = tarots[0]
+    start = time.perf_counter()
+    for _ in range(20000):
+        undo_tarot(apply_tarot(boost, hand, [3]), hand)
+    in_place = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(20000):
+        copied = [PokerCard.from_code(card.code) for card in hand]
+        apply_tarot(boost, copied, [3])
+    cloned = time.perf_counter() - start
+    print(f"应用并撤销 {in_place / 20000 * 1e6:.2f}微秒/次，复制手牌后应用 {cloned / 20000 * 1e6:.2f}微秒/次")
@@ -1,7 +1,363 @@
-def apply_joker(joker,card):
-    if not isinstance(card, list):
-        return card
-    if joker == JokerType.TAROT:
-        return card[0]
-    elif joker == JokerType.JOKER:
-        return card[1]
+# -*- coding: utf-8 -*-
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from card.poker.poker_card import PokerCard
+
+# 小丑牌效果的触发阶段
+PER_CARD = 'per_card'  # 计分时对每张满足条件的牌触发一次
+PER_HAND = 'per_hand'  # 每次出牌在所有牌计分后触发一次
+ON_DISCARD = 'on_discard'  # 每次成功弃牌后触发
+SHOP = 'shop'  # 在商店购买时生效
+COMPILE = 'compile'  # 编译时修改其他小丑牌的效果
+PHASES = (PER_CARD, PER_HAND, ON_DISCARD, SHOP, COMPILE)
+
+# 效果的操作
+ADD_CHIPS = 'add_chips'  # 加点数
+ADD_MULT = 'add_mult'  # 加倍率
+TIMES_MULT = 'times_mult'  # 乘倍率
+ADD_FUNDS = 'add_funds'  # 加资金（弃牌阶段）
+DISCOUNT = 'discount'  # 商店价格减少（商店阶段）
+BOOST = 'boost'  # 其他小丑牌的计分效果增强的倍数（编译阶段）
+# 各阶段允许的操作
+PHASE_OPERATIONS = {
+    PER_CARD: (ADD_CHIPS, ADD_MULT, TIMES_MULT),
+    PER_HAND: (ADD_CHIPS, ADD_MULT, TIMES_MULT),
+    ON_DISCARD: (ADD_FUNDS,),
+    SHOP: (DISCOUNT,),
+    COMPILE: (BOOST,)
+}
+# 计分操作在编译后的流水线中的编码
+OP_ADD_CHIPS = 0
+OP_ADD_MULT = 1
+OP_TIMES_MULT = 2
+_OP_CODES = {ADD_CHIPS: OP_ADD_CHIPS, ADD_MULT: OP_ADD_MULT, TIMES_MULT: OP_TIMES_MULT}
+
+
+class JokerEffect:
+    """
+    小丑牌的一个效果：触发阶段、操作、数值和触发条件
+
+    条件为None时不限制；suits/values为牌的花色和点数名称（PokerCard.SUITS/VALUES），
+    只用于per_card阶段；hand_types为牌型名称（TexasPokerHandRanking.HAND_TYPES），只用于per_hand阶段。
+    """
+    __slots__ = ('phase', 'operation', 'value', 'suits', 'values', 'hand_types')
+
+    def __init__(self, phase, operation, value, suits=None, values=None, hand_types=None):
+        if phase not in PHASE_OPERATIONS:
+            raise ValueError(f'触发阶段必须是以下之一: {list(PHASES)}')
+        if operation not in PHASE_OPERATIONS[phase]:
+            raise ValueError(f'{phase}阶段的操作必须是以下之一: {list(PHASE_OPERATIONS[phase])}')
+        self.phase = phase
+        self.operation = operation
+        self.value = value
+        self.suits = frozenset(PokerCard._SUIT_INDEX[suit] for suit in suits) if suits is not None else None
+        self.values = frozenset(PokerCard._VALUE_INDEX[value] for value in values) if values is not None else None
+        self.hand_types = frozenset(hand_types) if hand_types is not None else None
+
+    def __repr__(self):
+        return f"JokerEffect(phase='{self.phase}', operation='{self.operation}', value={self.value})"
+
+
+# 小丑牌名称 -> 效果元组，按名称查找，未注册的小丑牌没有效果
+JOKER_EFFECTS = {}
+# 注册表的版本号，注册新效果后已编译的流水线全部作废
+_registry_version = 0
+# 按小丑牌元组缓存的流水线，供GameState等直接传入元组的调用使用
+_compiled = {}
+
+
+def register_joker_effect(name, *effects):
+    """
+    注册（或替换）一种小丑牌的效果
+
+    参数:
+        name: 小丑牌名称
+        effects: JokerEffect对象，按计分顺序排列
+    """
+    global _registry_version
+    JOKER_EFFECTS[name] = tuple(effects)
+    _registry_version += 1
+    _compiled.clear()
+
+
+def get_joker_effects(joker_card):
+    """小丑牌注册的效果，未注册时为空元组"""
+    return JOKER_EFFECTS.get(joker_card.name, ())
+
+
+register_joker_effect("幸运星", JokerEffect(PER_CARD, ADD_CHIPS, 10))
+register_joker_effect("魔术师")  # 改变花色是主动效果，不参与计分
+register_joker_effect("小丑王", JokerEffect(COMPILE, BOOST, 2))
+
+
+def _boosted(effect, boost):
+    """编译阶段增强后的数值：加法效果乘以倍数，乘法效果的增量部分乘以倍数"""
+    if effect.operation == TIMES_MULT:
+        return 1 + (effect.value - 1) * boost
+    return effect.value * boost
+
+
+class JokerPipeline:
+    """
+    把拥有的小丑牌编译成的扁平计分流水线，计分时不再按名称查找效果
+
+    card_ops: 每张计分牌依次执行的 (操作编码, 数值, 花色下标集合或None, 点数下标集合或None)
+    hand_ops: 所有牌计分后依次执行的 (操作编码, 数值, 牌型集合或None)
+    discard_funds: 每次弃牌获得的资金
+    shop_discount: 商店价格的减少量
+    monotone: 所有操作都不会减少分数（加法数值非负、乘法倍数不小于1），出牌搜索的上界剪枝依赖于此
+    fingerprint: 计分相关部分的可哈希签名，用作计分缓存键
+    card_owners / hand_owners: 每个操作来自的小丑牌在列表中的下标，用于计分明细
+    """
+    __slots__ = ('card_ops', 'hand_ops', 'discard_funds', 'shop_discount', 'monotone', 'fingerprint',
+                 'card_owners', 'hand_owners', '_hand_bonus')
+
+    def __init__(self, jokers=()):
+        boost = 1
+        for joker_card in jokers:
+            for effect in get_joker_effects(joker_card):
+                if effect.phase == COMPILE:
+                    boost *= effect.value
+
+        card_ops = []
+        hand_ops = []
+        card_owners = []
+        hand_owners = []
+        discard_funds = 0
+        shop_discount = 0
+        for owner, joker_card in enumerate(jokers):
+            for effect in get_joker_effects(joker_card):
+                if effect.phase == PER_CARD:
+                    card_ops.append((_OP_CODES[effect.operation], _boosted(effect, boost), effect.suits, effect.values))
+                    card_owners.append(owner)
+                elif effect.phase == PER_HAND:
+                    hand_ops.append((_OP_CODES[effect.operation], _boosted(effect, boost), effect.hand_types))
+                    hand_owners.append(owner)
+                elif effect.phase == ON_DISCARD:
+                    discard_funds += effect.value
+                elif effect.phase == SHOP:
+                    shop_discount += effect.value
+        self.card_ops = tuple(card_ops)
+        self.hand_ops = tuple(hand_ops)
+        self.discard_funds = discard_funds
+        self.shop_discount = shop_discount
+        self.monotone = all(value >= (1 if op == OP_TIMES_MULT else 0) for op, value, *_ in card_ops + hand_ops)
+        self.fingerprint = (self.card_ops, self.hand_ops)
+        self.card_owners = tuple(card_owners)
+        self.hand_owners = tuple(hand_owners)
+        self._hand_bonus = {}
+
+    def __bool__(self):
+        """有计分效果时为True"""
+        return bool(self.card_ops or self.hand_ops)
+
+    def price(self, price):
+        """商店阶段效果后的价格"""
+        return max(0, price - self.shop_discount)
+
+    def card_bonus(self, card):
+        """
+        一张牌触发的per_card效果合计，用于估计上界
+
+        返回:
+            tuple: (加点数, 加倍率, 乘倍率)
+        """
+        chips = 0
+        plus = 0
+        times = 1
+        for op, value, suits, values in self.card_ops:
+            if (suits is None or card.suit_code in suits) and (values is None or card.rank in values):
+                if op == OP_ADD_CHIPS:
+                    chips += value
+                elif op == OP_ADD_MULT:
+                    plus += value
+                else:
+                    times *= value
+        return chips, plus, times
+
+    def hand_bonus(self, hand_type):
+        """
+        某牌型触发的per_hand效果合计，用于估计上界
+
+        返回:
+            tuple: (加点数, 加倍率, 乘倍率)
+        """
+        bonus = self._hand_bonus.get(hand_type)
+        if bonus is None:
+            chips = 0
+            plus = 0
+            times = 1
+            for op, value, hand_types in self.hand_ops:
+                if hand_types is None or hand_type in hand_types:
+                    if op == OP_ADD_CHIPS:
+                        chips += value
+                    elif op == OP_ADD_MULT:
+                        plus += value
+                    else:
+                        times *= value
+            bonus = self._hand_bonus[hand_type] = (chips, plus, times)
+        return bonus
+
+
+EMPTY_PIPELINE = JokerPipeline()
+
+
+def compile_jokers(jokers):
+    """
+    取得小丑牌列表的计分流水线
+
+    JokerList缓存自己的流水线，只在列表修改或注册新效果后重新编译；其他序列按元组缓存。
+
+    参数:
+        jokers: JokerList、列表或元组
+
+    返回:
+        JokerPipeline: 编译后的流水线
+    """
+    if not jokers:
+        return EMPTY_PIPELINE
+    if isinstance(jokers, JokerList):
+        return jokers.pipeline
+    key = tuple(jokers)
+    pipeline = _compiled.get(key)
+    if pipeline is None:
+        if len(_compiled) >= 1024:
+            _compiled.clear()
+        pipeline = _compiled[key] = JokerPipeline(key)
+    return pipeline
+
+
+class JokerList(list):
+    """
+    玩家拥有的小丑牌列表，记录修改的版本号并缓存编译后的流水线
+
+    任何修改列表的操作都使缓存的流水线作废，下一次计分时重新编译一次。
+    """
+    def __init__(self, jokers=()):
+        super().__init__(jokers)
+        self.version = 0
+        self._pipeline = None
+        self._registry_version = None
+
+    def _touch(self):
+        self.version += 1
+        self._pipeline = None
+
+    @property
+    def pipeline(self):
+        if self._pipeline is None or self._registry_version != _registry_version:
+            self._pipeline = JokerPipeline(self) if self else EMPTY_PIPELINE
+            self._registry_version = _registry_version
+        return self._pipeline
+
+    def __reduce__(self):
+        return (JokerList, (list(self),))
+
+
+def _mutator(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._touch()
+        return result
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'clear', 'reverse', 'sort',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(JokerList, _name, _mutator(_name))
+
+
+def apply_joker(joker_card, points, multiplier, hand_type=None):
+    """
+    单独应用一张小丑牌的per_hand效果
+
+    参数:
+        joker_card: 小丑牌
+        points: 当前点数
+        multiplier: 当前倍率
+        hand_type: 出牌的牌型，用于判断条件
+
+    返回:
+        tuple: (点数, 倍率)
+    """
+    for effect in get_joker_effects(joker_card):
+        if effect.phase != PER_HAND or (effect.hand_types is not None and hand_type not in effect.hand_types):
+            continue
+        if effect.operation == ADD_CHIPS:
+            points += effect.value
+        elif effect.operation == ADD_MULT:
+            multiplier += effect.value
+        else:
+            multiplier *= effect.value
+    return points, multiplier
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from itertools import combinations
+    from card.joker.joker import joker
+    from player import Player
+    from utils.batch_scoring import PAD_CARD, batch_compute_score
+
+    # 作为脚本运行时本文件是__main__，要注册到player使用的模块中
+    from card.joker import apply_joker as effects
+
+    print("===== 小丑牌计分流水线测试 =====")
+    effects.register_joker_effect("红桃", effects.JokerEffect(PER_CARD, ADD_MULT, 3, suits=['Hearts']))
+    effects.register_joker_effect("人头", effects.JokerEffect(PER_CARD, TIMES_MULT, 1.5, values=['J', 'Q', 'K']))
+    effects.register_joker_effect("同花", effects.JokerEffect(PER_HAND, ADD_CHIPS, 40, hand_types=['FLUSH', 'STRAIGHT_FLUSH']))
+    effects.register_joker_effect("省钱", effects.JokerEffect(ON_DISCARD, ADD_FUNDS, 1), effects.JokerEffect(SHOP, DISCOUNT, 1))
+    names = ["幸运星", "红桃", "人头", "同花", "小丑王"]
+    build = [joker(name, price=1, effect="测试") for name in names]
+
+    rng = random.Random(0)
+    player = Player(verbose=False)
+    player.jokers = build
+    hand_rank = player.poker_hand_rank
+    deck = [PokerCard(suit, value, rng.choice(PokerCard.EFFECTS)) for suit in PokerCard.SUITS[:4] for value in PokerCard.VALUES[:13]]
+    hands = [rng.sample(deck, rng.randint(1, 5)) for _ in range(5000)]
+
+    scalar = [player.compute_score(hand, hand_rank, player.jokers) for hand in hands]
+    codes = [[card.code for card in hand] + [PAD_CARD] * (5 - len(hand)) for hand in hands]
+    batch = batch_compute_score(codes, hand_rank, player.jokers)['scores'].tolist()
+    print(f"标量与批量计分一致（5张小丑牌）: {'✓ 通过' if scalar == batch else '✗ 失败'}")
+
+    mismatches = 0
+    for _ in range(300):
+        hand = rng.sample(deck, 8)
+        _, best = player.best_play(hand, player.jokers)
+        brute = max(player.compute_score([hand[i] for i in reversed(indices)], hand_rank, player.jokers)
+                    for size in range(1, 6) for indices in combinations(range(8), size))
+        mismatches += best != brute
+    print(f"best_play上界剪枝与穷举一致: {'✓ 通过' if mismatches == 0 else f'✗ 失败 {mismatches}'}")
+
+    # 逐张计分的小丑牌效果使分数与出牌顺序有关，缓存不能把不同顺序当作同一出牌
+    cached = Player(score_cache_size=100, verbose=False)
+    cached.jokers = build
+    mismatches = 0
+    for hand in hands[:2000] + [hand[::-1] for hand in hands[:2000]]:
+        mismatches += cached.compute_score(hand, hand_rank, cached.jokers) != player.compute_score(hand, hand_rank, player.jokers)
+    print(f"计分缓存与不缓存一致（含逆序出牌）: {'✓ 通过' if mismatches == 0 else f'✗ 失败 {mismatches}'}")
+
+    version = player.jokers.version
+    pipeline = player.jokers.pipeline
+    player.jokers.append(joker("省钱", price=1, effect="测试"))
+    print(f"修改小丑牌后重新编译: {'✓ 通过' if player.jokers.version == version + 1 and player.jokers.pipeline is not pipeline and player.jokers.pipeline.discard_funds == 1 else '✗ 失败'}")
+
+    empty = Player(verbose=False)
+    for label, scorer in (("0张小丑牌", empty), ("5张小丑牌", player)):
+        jokers = scorer.jokers
+        start = time.perf_counter()
+        for hand in hands:
+            scorer.compute_score(hand, hand_rank, jokers)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        batch_compute_score(codes, hand_rank, jokers)
+        batch_elapsed = time.perf_counter() - start
+        print(f"  {label}: 逐个 {elapsed / len(hands) * 1e6:.2f}微秒/手，批量 {batch_elapsed / len(hands) * 1e6:.3f}微秒/手")
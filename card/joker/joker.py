@@ -2,9 +2,17 @@
 
 class joker:
     """
-    Joker类，代表扑克牌中的小丑牌，拥有名称、效果和额外效果三个字段
+    Joker类，代表扑克牌中的小丑牌，拥有名称、效果、额外效果和稀有度字段
     """
-    def __init__(self, name, price,effect, extra_effect=None):
+    # 稀有度及其在商店中出现的相对权重
+    RARITY_WEIGHTS = {
+        'common': 70,
+        'uncommon': 25,
+        'rare': 5,
+        'legendary': 0
+    }
+    
+    def __init__(self, name, price,effect, extra_effect=None, rarity='common'):
         """
         初始化joker对象
         
@@ -12,11 +20,15 @@ class joker:
             name (str): Joker的名称
             effect (str): Joker的主要效果描述
             extra_effect (str, optional): Joker的额外效果描述，默认为None
+            rarity (str, optional): 稀有度，必须是RARITY_WEIGHTS中的一种，默认为'common'
         """
+        if rarity not in self.RARITY_WEIGHTS:
+            raise ValueError(f'稀有度必须是以下之一: {list(self.RARITY_WEIGHTS)}')
         self.name = name
         self.price = price
         self.effect = effect
         self.extra_effect = extra_effect
+        self.rarity = rarity
     
     def get_info(self):
         """
@@ -29,7 +41,8 @@ class joker:
             'name':self.name,
             'price':self.price,
             'effect':self.effect,
-            'extra_effect':self.extra_effect
+            'extra_effect':self.extra_effect,
+            'rarity':self.rarity
         }
     def get_price(self):
         """
@@ -3,7 +3,24 @@ class PokerCard:
     SUITS = ['Spades', 'Hearts', 'Clubs', 'Diamonds','Every_suits','No_suits']
     # Define 13 values
     VALUES = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K','stone']
-    
+    # Define bonus effects, None means no effect
+    EFFECTS = [None, 'POINT_PLUS_30', 'MULTIPLIER_PLUS_4', 'MULTIPLIER_TIMES_1_5']
+    # Chip value of each entry in VALUES
+    CHIPS = [11, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 50]
+    # One prime per entry in VALUES, the product of a hand's primes identifies its value multiset
+    RANK_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43]
+
+    # Lookup tables from names to small integer codes
+    _VALUE_INDEX = {value: index for index, value in enumerate(VALUES)}
+    _SUIT_INDEX = {suit: index for index, suit in enumerate(SUITS)}
+    _EFFECT_INDEX = {effect: index for index, effect in enumerate(EFFECTS)}
+    # Shared int objects for every code, codes above 256 would otherwise be allocated per card
+    _CODES = list(range(len(EFFECTS) * len(SUITS) * len(VALUES)))
+
+    # suit/value/effect are stored privately, the remaining slots are cached
+    # codes that the setters keep consistent with them
+    __slots__ = ('_suit', '_value', '_effect', 'rank', 'suit_code', 'chips', 'prime', 'code')
+
     def __init__(self, suit, value, effect=None):
         """
         Initialize a playing card
@@ -18,24 +35,90 @@ class PokerCard:
         if value not in self.VALUES:
             raise ValueError(f'Value must be one of: {self.VALUES}')
             
-        self.suit = suit
-        self.value = value
-        self.effect = effect  # Bonus effect, no effect by default
+        self._suit = suit
+        self._value = value
+        self._effect = effect  # Bonus effect, no effect by default
+        self._update_codes()
+
+    @classmethod
+    def from_code(cls, code):
+        """
+        Create a card from its integer code
+
+        Parameters:
+            code: Integer code as stored in the code attribute
+        """
+        # Every code maps to a valid card, so the validation in __init__ is skipped
+        card = cls.__new__(cls)
+        card.set_code(code)
+        return card
+
+    def set_code(self, code):
+        """
+        Overwrite suit, value and effect in place from an integer code
+
+        Parameters:
+            code: Integer code as stored in the code attribute
+        """
+        rest, value_index = divmod(int(code), len(self.VALUES))
+        effect_index, suit_index = divmod(rest, len(self.SUITS))
+        # The cached codes are filled directly from the indices
+        self._suit = self.SUITS[suit_index]
+        self._value = self.VALUES[value_index]
+        self._effect = self.EFFECTS[effect_index]
+        self.rank = value_index
+        self.suit_code = suit_index
+        self.chips = self.CHIPS[value_index]
+        self.prime = self.RANK_PRIMES[value_index]
+        self.code = self._CODES[code]
+
+    def _update_codes(self):
+        """Recompute the cached codes from suit, value and effect"""
+        rank = self._VALUE_INDEX[self._value]
+        suit_code = self._SUIT_INDEX[self._suit]
+        effect = getattr(self._effect, 'name', self._effect)
+        # Unknown effects are ignored when scoring, so they share the code of no effect
+        effect_code = self._EFFECT_INDEX.get(effect, 0)
+        self.rank = rank
+        self.suit_code = suit_code
+        self.chips = self.CHIPS[rank]
+        self.prime = self.RANK_PRIMES[rank]
+        self.code = self._CODES[(effect_code * len(self.SUITS) + suit_code) * len(self.VALUES) + rank]
+
+    @property
+    def suit(self):
+        return self._suit
+
+    @suit.setter
+    def suit(self, suit):
+        if suit not in self.SUITS:
+            raise ValueError(f'Suit must be one of: {self.SUITS}')
+        self._suit = suit
+        self._update_codes()
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if value not in self.VALUES:
+            raise ValueError(f'Value must be one of: {self.VALUES}')
+        self._value = value
+        self._update_codes()
+
+    @property
+    def effect(self):
+        return self._effect
+
+    @effect.setter
+    def effect(self, effect):
+        self._effect = effect
+        self._update_codes()
     
     def get_numeric_value(self):
         """Get numeric value representation of the card"""
-        if self.value == 'A':
-            return 11  # Can also return 11 depending on game rules
-        elif self.value in ['J', 'Q', 'K']:
-            return 10  # Can also return 11, 12, 13 depending on game rules
-        elif self.value == 'stone':
-            return 50  # Special value for stone
-        else:
-            try:
-                return int(self.value)
-            except ValueError:
-                # Handle any other non-numeric values
-                return 0
+        return self.chips
     
     def has_effect(self):
         """Check if the card has a bonus effect"""
@@ -92,4 +175,28 @@ if __name__ == "__main__":
     # ------------------------------
     # Test 2: Card Effect Creation
     # ------------------------------
-    
\ No newline at end of file
+    print("\n[Test 2] Card Effect Creation:")
+    try:
+        effect_card = PokerCard('Hearts', 'J', 'POINT_PLUS_30')
+        print(effect_card)
+        print(repr(effect_card))
+        # Cached codes must follow mutations, e.g. SELECTIVE_BOOST rewriting the value
+        effect_card.value = 'Q'
+        effect_card.effect = 'MULTIPLIER_PLUS_4'
+        assert effect_card.code == PokerCard('Hearts', 'Q', 'MULTIPLIER_PLUS_4').code
+        assert PokerCard.from_code(effect_card.code).get_info() == effect_card.get_info()
+        print("  ✓ Effects and cached codes are consistent")
+    except Exception as e:
+        print(f"  ✗ Error creating effect cards: {e}")
+
+    # ------------------------------
+    # Test 3: Memory per Card
+    # ------------------------------
+    print("\n[Test 3] Memory per Card:")
+    import tracemalloc
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cards = [PokerCard(suit, value) for suit in PokerCard.SUITS for value in PokerCard.VALUES for _ in range(100)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"  {(after - before) / len(cards):.1f} bytes per card ({len(cards)} cards)")
@@ -0,0 +1,253 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from card.poker.poker_card import PokerCard
+
+_STANDARD_SUITS = 4
+_STANDARD_RANKS = 13
+
+class PokerCardSet:
+    """
+    Container of poker cards backed by a 52-bit mask
+
+    Standard cards (the four regular suits, values A-K) each own one bit at
+    suit_code * 13 + rank, so membership and remaining rank/suit counts are
+    answered from the mask. Stone cards, Every_suits/No_suits cards and
+    duplicates produced by tarot effects go to an overflow list.
+
+    The container also keeps the cards in order so it can stand in for the
+    plain lists used by Environment.poker_card_pool and Player.hand:
+    len(), iteration, indexing, append/extend, pop and remove behave like
+    the list versions. In unordered mode (decks) remove() and pop(index)
+    swap the last card into the freed position, which is O(1) and keeps a
+    shuffled deck uniformly shuffled. In ordered mode (hands) the order of
+    the remaining cards is preserved so hand indices stay meaningful.
+    """
+    STANDARD_SUITS = _STANDARD_SUITS
+    STANDARD_RANKS = _STANDARD_RANKS
+    NUM_BITS = _STANDARD_SUITS * _STANDARD_RANKS
+
+    # Bits of every rank across the four suits, and of every suit
+    RANK_MASKS = [sum(1 << (suit * _STANDARD_RANKS + rank) for suit in range(_STANDARD_SUITS)) for rank in range(_STANDARD_RANKS)]
+    SUIT_MASKS = [((1 << _STANDARD_RANKS) - 1) << (suit * _STANDARD_RANKS) for suit in range(_STANDARD_SUITS)]
+
+    __slots__ = ('mask', 'ordered', '_order', '_bits', '_positions', '_overflow')
+
+    def __init__(self, cards=(), ordered=False):
+        """
+        Initialize the container
+
+        Parameters:
+            cards: Initial cards, kept in the given order
+            ordered: Keep the relative order of the remaining cards on removal
+        """
+        self.mask = 0  # Bit set for every standard card in the container
+        self.ordered = ordered
+        self._order = []  # All cards, last one is drawn first
+        self._bits = {}  # id(card) -> bit index, or -1 for overflow cards
+        self._positions = {}  # id(card) -> index in _order, unordered mode only
+        self._overflow = []  # Cards without a free standard bit
+        for card in cards:
+            self.append(card)
+
+    @staticmethod
+    def bit_index(card):
+        """Return the bit of a standard card, or -1 for cards outside the 52 standard cards"""
+        if card.suit_code < _STANDARD_SUITS and card.rank < _STANDARD_RANKS:
+            return card.suit_code * _STANDARD_RANKS + card.rank
+        return -1
+
+    def _register(self, card):
+        key = id(card)
+        if key in self._bits:
+            raise ValueError(f'Card already in set: {card!r}')
+        bit = self.bit_index(card)
+        if bit >= 0 and not self.mask >> bit & 1:
+            self.mask |= 1 << bit
+        else:
+            bit = -1
+            self._overflow.append(card)
+        self._bits[key] = bit
+
+    def _unregister(self, card):
+        bit = self._bits.pop(id(card))
+        if bit >= 0:
+            self.mask &= ~(1 << bit)
+        else:
+            for i, other in enumerate(self._overflow):
+                if other is card:
+                    self._overflow.pop(i)
+                    break
+
+    def append(self, card):
+        """Add a card at the end (the top of a deck)"""
+        self._register(card)
+        if not self.ordered:
+            self._positions[id(card)] = len(self._order)
+        self._order.append(card)
+
+    def extend(self, cards):
+        """Add several cards at the end"""
+        for card in cards:
+            self.append(card)
+
+    def insert(self, index, card):
+        """Add a card at index, like list.insert (e.g. to undo a pop)"""
+        self._register(card)
+        self._order.insert(index, card)
+        if not self.ordered:
+            self._positions = {id(card): i for i, card in enumerate(self._order)}
+
+    def pop(self, index=-1):
+        """Remove and return the card at index, by default the last one"""
+        order = self._order
+        if not order:
+            raise IndexError('pop from empty PokerCardSet')
+        size = len(order)
+        if index < 0:
+            index += size
+        if index < 0 or index >= size:
+            raise IndexError('PokerCardSet index out of range')
+
+        if index == size - 1:
+            card = order.pop()
+        elif self.ordered:
+            card = order.pop(index)
+        else:
+            card = order[index]
+            last = order.pop()
+            order[index] = last
+            self._positions[id(last)] = index
+
+        if not self.ordered:
+            del self._positions[id(card)]
+        self._unregister(card)
+        return card
+
+    def remove(self, card):
+        """Remove a specific card, raise ValueError if it is not in the set"""
+        if id(card) not in self._bits:
+            raise ValueError('PokerCardSet.remove(x): x not in set')
+        if self.ordered:
+            for i, other in enumerate(self._order):
+                if other is card:
+                    self.pop(i)
+                    return
+        self.pop(self._positions[id(card)])
+
+    def draw(self, num):
+        """Remove and return up to num cards from the top"""
+        return [self.pop() for _ in range(min(num, len(self._order)))]
+
+    def clear(self):
+        """Remove all cards"""
+        self.mask = 0
+        self._order.clear()
+        self._bits.clear()
+        self._positions.clear()
+        self._overflow.clear()
+
+    def shuffle(self, rng):
+        """
+        Shuffle the draw order
+
+        Parameters:
+            rng: Object with a shuffle method, e.g. the random module or a random.Random
+        """
+        rng.shuffle(self._order)
+        if not self.ordered:
+            self._positions = {id(card): i for i, card in enumerate(self._order)}
+
+    def refresh(self):
+        """Rebuild the mask after cards inside the set were mutated (e.g. by tarot effects)"""
+        cards = self._order
+        self._order = []
+        self._bits = {}
+        self._positions = {}
+        self._overflow = []
+        self.mask = 0
+        for card in cards:
+            self.append(card)
+
+    def copy(self):
+        """Return a shallow copy sharing the card objects, like list.copy()"""
+        other = PokerCardSet.__new__(PokerCardSet)
+        other.mask = self.mask
+        other.ordered = self.ordered
+        other._order = self._order.copy()
+        other._bits = self._bits.copy()
+        other._positions = self._positions.copy()
+        other._overflow = self._overflow.copy()
+        return other
+
+    def rank_counts(self):
+        """
+        Count the cards of every value
+
+        Returns:
+            list: Count per entry of PokerCard.VALUES
+        """
+        mask = self.mask
+        counts = [(mask & rank_mask).bit_count() for rank_mask in self.RANK_MASKS]
+        counts.extend([0] * (len(PokerCard.VALUES) - self.STANDARD_RANKS))
+        for card in self._overflow:
+            counts[card.rank] += 1
+        return counts
+
+    def suit_counts(self):
+        """
+        Count the cards of every suit
+
+        Returns:
+            list: Count per entry of PokerCard.SUITS
+        """
+        mask = self.mask
+        counts = [(mask & suit_mask).bit_count() for suit_mask in self.SUIT_MASKS]
+        counts.extend([0] * (len(PokerCard.SUITS) - self.STANDARD_SUITS))
+        for card in self._overflow:
+            counts[card.suit_code] += 1
+        return counts
+
+    def contains_standard(self, suit, value):
+        """Check whether the standard card with this suit and value is in the set"""
+        bit = PokerCard.SUITS.index(suit) * self.STANDARD_RANKS + PokerCard.VALUES.index(value)
+        return bool(self.mask >> bit & 1)
+
+    def __contains__(self, card):
+        return id(card) in self._bits
+
+    def __len__(self):
+        return len(self._order)
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __getitem__(self, index):
+        return self._order[index]
+
+    def __repr__(self):
+        return f"PokerCardSet({self._order!r}, ordered={self.ordered})"
+
+
+if __name__ == "__main__":
+    import random
+
+    print("===== Testing PokerCardSet =====\n")
+    deck = PokerCardSet(PokerCard(suit, value) for suit in PokerCard.SUITS[:4] for value in PokerCard.VALUES[:-1])
+    deck.append(PokerCard('No_suits', 'stone'))
+    deck.shuffle(random.Random(0))
+    print(f"Cards: {len(deck)}, rank counts: {deck.rank_counts()}")
+
+    hand = PokerCardSet(deck.draw(8), ordered=True)
+    print(f"Hand: {[str(card) for card in hand]}")
+    print(f"Deck suit counts after drawing: {deck.suit_counts()}")
+    assert sum(deck.rank_counts()) == len(deck) == 45
+    assert all(card not in deck for card in hand)
+
+    played = hand.pop(2)
+    assert played not in hand and len(hand) == 7
+    copy = deck.copy()
+    copy.pop()
+    assert len(copy) == len(deck) - 1
+    print("  ✓ Draw, pop and copy behave like lists")
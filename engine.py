@@ -0,0 +1,203 @@
+from environment import Environment
+from player import Player
+
+
+class Action:
+    """
+    玩家的一次行动，替代命令行输入驱动游戏引擎
+    """
+    PLAY = 'play'  # 出牌，card_indices为手牌索引
+    DISCARD = 'discard'  # 弃牌，card_indices为手牌索引
+    TAROT = 'tarot'  # 使用塔罗牌，index为塔罗牌索引，card_indices为目标手牌索引
+    BUY_JOKER = 'buy_joker'  # 购买商店中第index张小丑牌
+    BUY_TAROT = 'buy_tarot'  # 购买商店中第index张塔罗牌
+    SELL_JOKER = 'sell_joker'  # 出售拥有的第index张小丑牌
+    SELL_TAROT = 'sell_tarot'  # 出售拥有的第index张塔罗牌
+    REFRESH_SHOP = 'refresh_shop'  # 刷新商店
+
+    KINDS = (PLAY, DISCARD, TAROT, BUY_JOKER, BUY_TAROT, SELL_JOKER, SELL_TAROT, REFRESH_SHOP)
+
+    __slots__ = ('kind', 'card_indices', 'index')
+
+    def __init__(self, kind, card_indices=None, index=None):
+        """
+        初始化行动
+
+        参数:
+            kind: 行动类型，必须是KINDS中的一种
+            card_indices: 涉及的手牌索引列表
+            index: 塔罗牌、小丑牌或商店物品的索引
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f'行动类型必须是以下之一: {list(self.KINDS)}')
+        self.kind = kind
+        self.card_indices = list(card_indices) if card_indices is not None else None
+        self.index = index
+
+    @classmethod
+    def play(cls, card_indices):
+        return cls(cls.PLAY, card_indices)
+
+    @classmethod
+    def discard(cls, card_indices):
+        return cls(cls.DISCARD, card_indices)
+
+    @classmethod
+    def use_tarot(cls, tarot_index, card_indices=None):
+        return cls(cls.TAROT, card_indices, tarot_index)
+
+    def __repr__(self):
+        return f"Action(kind='{self.kind}', card_indices={self.card_indices}, index={self.index})"
+
+
+class GameEngine:
+    """
+    无界面的游戏引擎，与命令行版本执行相同的规则（出牌、弃牌、塔罗牌、商店、补牌），
+    由Action对象驱动，默认不打印任何信息，适合大批量模拟
+    """
+    def __init__(self, player=None, environment=None, verbose=False, max_rounds=10, seed=None, recorder=None, **player_config):
+        """
+        初始化游戏引擎
+
+        参数:
+            player: 玩家对象，为None时用player_config创建
+            environment: 游戏环境，为None时为玩家创建
+            verbose: 是否打印操作信息，默认为False
+            max_rounds: 最多进行的回合数，默认为10
+            seed: 新建环境时使用的随机种子
+            recorder: 轨迹记录器（如utils.trajectory.TrajectoryRecorder），为None时不记录
+            player_config: 创建玩家时的参数，如target_score、hand_limit等
+        """
+        if player is None:
+            player = Player(verbose=verbose, **player_config)
+        if environment is None:
+            environment = Environment(player, verbose=verbose, seed=seed)
+        self.player = player
+        self.environment = environment
+        self.verbose = verbose
+        self.max_rounds = max_rounds
+        self.current_round = 1
+        self.game_over = False
+        self.started = False
+        self.recorder = recorder
+
+    def start(self):
+        """发初始手牌并开始第一回合"""
+        if self.recorder is not None:
+            self.recorder.begin_game(self)
+        self.environment.send_poker_card(self.player.hand_limit)
+        self.player.new_round()
+        self.started = True
+        self._advance()
+
+    def step(self, action):
+        """
+        执行一次行动
+
+        参数:
+            action: Action对象
+
+        返回:
+            bool: 行动是否成功
+        """
+        if not self.started:
+            self.start()
+        if self.game_over:
+            return False
+
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.before_step(self, action)
+
+        player = self.player
+        environment = self.environment
+        kind = action.kind
+        if kind == Action.PLAY:
+            success = player.play_card(action.card_indices)
+            if success:
+                environment.refill_hand()
+        elif kind == Action.DISCARD:
+            success = player.discard_card(action.card_indices) > 0
+            if success:
+                environment.refill_hand()
+        elif kind == Action.TAROT:
+            success = player.use_tarot_card(action.index, action.card_indices)
+        elif kind == Action.BUY_JOKER:
+            success = environment.buy_joker_from_shop(action.index)
+        elif kind == Action.BUY_TAROT:
+            success = environment.buy_tarot_from_shop(action.index)
+        elif kind == Action.SELL_JOKER:
+            success = environment.sell_joker_to_shop(action.index)
+        elif kind == Action.SELL_TAROT:
+            success = environment.sell_tarot_to_shop(action.index)
+        else:
+            environment.refresh_shop()
+            success = True
+
+        self._advance()
+        if recorder is not None:
+            recorder.after_step(self, success)
+        return success
+
+    def _advance(self):
+        """检查胜利条件，出牌次数用完时结束回合并补牌，超过回合上限时结束游戏"""
+        player = self.player
+        if player.has_won():
+            self.game_over = True
+            return
+
+        while not player.can_play():
+            # 回合结束，补牌到手牌上限
+            self.environment.refill_hand()
+            self.current_round += 1
+            if self.current_round > self.max_rounds:
+                self.game_over = True
+                return
+            player.new_round()
+
+    def run(self, policy, max_steps=10000):
+        """
+        用策略函数完整进行一局游戏
+
+        参数:
+            policy: 接收引擎、返回Action的函数
+            max_steps: 最多执行的行动数，防止策略反复给出无效行动
+
+        返回:
+            bool: 是否获胜
+        """
+        if not self.started:
+            self.start()
+        steps = 0
+        while not self.game_over and steps < max_steps:
+            self.step(policy(self))
+            steps += 1
+        return self.player.has_won()
+
+    def snapshot(self):
+        """
+        保存环境、玩家和回合进度的完整状态
+
+        返回:
+            tuple: (环境快照, 当前回合, 是否结束, 是否已开始)
+        """
+        return self.environment.snapshot(), self.current_round, self.game_over, self.started
+
+    def restore(self, snapshot):
+        """
+        恢复到snapshot保存的状态
+
+        参数:
+            snapshot: snapshot()的返回值
+        """
+        environment_snapshot, self.current_round, self.game_over, self.started = snapshot
+        self.environment.restore(environment_snapshot)
+
+    def can_play(self):
+        return not self.game_over and self.player.can_play()
+
+    def can_discard(self):
+        return not self.game_over and self.player.can_discard()
+
+    def can_use_tarot(self):
+        return not self.game_over and len(self.player.tarot_cards) > 0
@@ -1,24 +1,64 @@
 import random
 from card.poker.poker_card import PokerCard
+from card.poker.poker_card_set import PokerCardSet
 from card.joker.joker import joker
 from card.Tarot.tarot_card import TarotCard
+from utils.indexed_pool import IndexedPool
+
+class EnvironmentSnapshot:
+    """
+    环境和玩家状态的紧凑快照，由Environment.snapshot生成、Environment.restore恢复
+
+    扑克牌（包括牌池和手牌）按PokerCard.code存为整数元组，恢复时重新创建牌对象，
+    因此被塔罗牌修改过的牌也能正确还原；小丑牌和塔罗牌不会被修改，只保存对象引用。
+    小丑牌池和塔罗牌池保存为IndexedPool的副本，恢复后每张牌（包括已移出牌池的）的稳定编号不变。
+    """
+    __slots__ = ('poker_codes', 'tarot_pool', 'joker_pool', 'shop_jokers', 'shop_tarots',
+                 'score', 'rng_state', 'hand_codes', 'jokers', 'tarot_cards', 'counters')
+
+    def __init__(self, poker_codes, tarot_pool, joker_pool, shop_jokers, shop_tarots,
+                 score, rng_state, hand_codes, jokers, tarot_cards, counters):
+        self.poker_codes = poker_codes  # 扑克牌池的编码，顺序即发牌顺序
+        self.tarot_pool = tarot_pool
+        self.joker_pool = joker_pool
+        self.shop_jokers = shop_jokers
+        self.shop_tarots = shop_tarots
+        self.score = score
+        self.rng_state = rng_state  # random.Random.getstate()
+        self.hand_codes = hand_codes  # 玩家手牌的编码
+        self.jokers = jokers
+        self.tarot_cards = tarot_cards
+        self.counters = counters  # 玩家的(资金, 分数, 出牌次数, 弃牌次数, 本回合出牌次数, 本回合弃牌次数)
+
 
 class Environment:
-    def __init__(self, player):
+    def __init__(self, player, use_bitset=False, verbose=True, seed=None):
         """
         初始化游戏环境
         
         参数:
             player: 玩家对象
+            use_bitset: 是否用位集合PokerCardSet存放扑克牌池和玩家手牌，默认为False使用列表
+            verbose: 是否打印操作信息，默认为True；无界面批量模拟时设为False
+            seed: 随机种子，为None时使用系统随机源
         """
         self.player = player
-        self.poker_card_pool = []  # 扑克牌池
-        self.tarot_card_pool = []  # 塔罗牌池
-        self.joker_card_pool = []  # 小丑牌池
+        self.verbose = verbose  # 是否打印操作信息
+        self.rng = random.Random(seed)  # 本环境独立的随机数生成器，洗牌和商店抽取都使用它
+        self.use_bitset = use_bitset
+        self.poker_card_pool = PokerCardSet() if use_bitset else []  # 扑克牌池
+        if use_bitset and not isinstance(player.hand, PokerCardSet):
+            # 手牌需要保持顺序，出牌和弃牌按索引进行
+            player.hand = PokerCardSet(player.hand, ordered=True)
+        self.tarot_card_pool = IndexedPool()  # 塔罗牌池
+        self.joker_card_pool = self._new_joker_card_pool()  # 小丑牌池，按稀有度加权抽取
         self.score = 0  # 当前的分数
         self.round=0 #当前轮次
         self.target_score = 300  # 目标分数
         self.shop = {"jokers": [], "tarots": []}  # 商店
+        self._engine = None  # reset/step使用的游戏引擎
+        self._encoder = None  # reset/step使用的观测编码器
+        self.recorder = None  # reset/step的轨迹记录器，如utils.trajectory.TrajectoryRecorder，为None时不记录
         
         # 初始化所有卡牌池
         self._init_poker_card_pool()
@@ -27,6 +67,11 @@ class Environment:
         
         # 初始化商店
         self.init_shop()
+    @staticmethod
+    def _new_joker_card_pool(jokers=()):
+        """创建按稀有度加权抽取的小丑牌池"""
+        return IndexedPool(jokers, weight_attr='rarity', weights=joker.RARITY_WEIGHTS)
+    
     def get_poker_card_pool(self):
         """
         获取扑克牌池
@@ -81,7 +126,42 @@ class Environment:
                 self.poker_card_pool.append(PokerCard(suit, value))
         
         # 打乱牌池顺序
-        random.shuffle(self.poker_card_pool)
+        self._shuffle_poker_card_pool()
+
+    def _shuffle_poker_card_pool(self):
+        """打乱扑克牌池顺序，兼容列表和PokerCardSet"""
+        if isinstance(self.poker_card_pool, PokerCardSet):
+            self.poker_card_pool.shuffle(self.rng)
+        else:
+            self.rng.shuffle(self.poker_card_pool)
+
+    def get_remaining_rank_counts(self):
+        """
+        获取牌池中每种点数剩余的牌数
+
+        返回:
+            list: 与PokerCard.VALUES对应的剩余张数
+        """
+        if isinstance(self.poker_card_pool, PokerCardSet):
+            return self.poker_card_pool.rank_counts()
+        counts = [0] * len(PokerCard.VALUES)
+        for card in self.poker_card_pool:
+            counts[card.rank] += 1
+        return counts
+
+    def get_remaining_suit_counts(self):
+        """
+        获取牌池中每种花色剩余的牌数
+
+        返回:
+            list: 与PokerCard.SUITS对应的剩余张数
+        """
+        if isinstance(self.poker_card_pool, PokerCardSet):
+            return self.poker_card_pool.suit_counts()
+        counts = [0] * len(PokerCard.SUITS)
+        for card in self.poker_card_pool:
+            counts[card.suit_code] += 1
+        return counts
     
     def _init_tarot_card_pool(self):
         """
@@ -99,12 +179,15 @@ class Environment:
             ('SELECTIVE_BOOST', 4)
         ]
         
-        # 创建塔罗牌池
+        # 创建塔罗牌池，转变花色的塔罗牌随机指定目标花色
         for tarot_type, price in tarot_types:
-            self.tarot_card_pool.append(TarotCard(tarot_type, price))
+            if tarot_type == 'SUIT_TRANSFORM':
+                self.tarot_card_pool.append(TarotCard(tarot_type, price, suits=self.rng.choice(PokerCard.SUITS[:4])))
+            else:
+                self.tarot_card_pool.append(TarotCard(tarot_type, price))
         
         # 打乱牌池顺序
-        random.shuffle(self.tarot_card_pool)
+        self.tarot_card_pool.shuffle(self.rng)
     
     def _init_joker_card_pool(self):
         """
@@ -113,16 +196,19 @@ class Environment:
         # 定义一些小丑牌
         joker_cards = [
             joker("幸运星",price=1,effect="增加所有牌的点数"),
-            joker("魔术师", price=1,effect="改变一张牌的花色"),
-            joker("小丑王", price=1,effect="提升所有小丑牌的效果"),
+            joker("魔术师", price=1,effect="改变一张牌的花色", rarity='uncommon'),
+            joker("小丑王", price=1,effect="提升所有小丑牌的效果", rarity='rare'),
             
         ]
         
+        # 记录所有小丑牌的名称，下标作为观测中的小丑牌编号
+        self.joker_names = [joker_card.name for joker_card in joker_cards]
+        
         # 添加到小丑牌池
         self.joker_card_pool.extend(joker_cards)
         
         # 打乱牌池顺序
-        random.shuffle(self.joker_card_pool)
+        self.joker_card_pool.shuffle(self.rng)
     
     def send_poker_card(self, num=7):
         """
@@ -138,7 +224,8 @@ class Environment:
         
         # 检查牌池是否有足够的牌
         if len(self.poker_card_pool) < num:
-            print(f"牌池中的牌不足，只能发{len(self.poker_card_pool)}张牌")
+            if self.verbose:
+                print(f"牌池中的牌不足，只能发{len(self.poker_card_pool)}张牌")
             num = len(self.poker_card_pool)
         
         # 无放回地发牌
@@ -154,25 +241,21 @@ class Environment:
         cards_needed = self.player.hand_limit - len(self.player.hand)
         if cards_needed > 0:
             sent_cards = self.send_poker_card(cards_needed)
-            print(f"补牌 {len(sent_cards)} 张")
+            if self.verbose:
+                print(f"补牌 {len(sent_cards)} 张")
     
     def init_shop(self):
         """
         初始化商店，从牌池中随机选择卡牌放入商店
         """
-        # 从小丑牌池中随机选择2张放入商店
-        if len(self.joker_card_pool) >= 2:
-            self.shop["jokers"] = random.sample(self.joker_card_pool, 2)
-        elif len(self.joker_card_pool) > 0:
-            self.shop["jokers"] = self.joker_card_pool.copy()
+        # 从小丑牌池中按稀有度随机选择2张放入商店，不足2张时全部放入
+        self.shop["jokers"] = self.joker_card_pool.sample(2, self.rng)
         
         # 从塔罗牌池中随机选择2张放入商店
-        if len(self.tarot_card_pool) >= 2:
-            self.shop["tarots"] = random.sample(self.tarot_card_pool, 2)
-        elif len(self.tarot_card_pool) > 0:
-            self.shop["tarots"] = self.tarot_card_pool.copy()
+        self.shop["tarots"] = self.tarot_card_pool.sample(2, self.rng)
         
-        print("商店已初始化完成")
+        if self.verbose:
+            print("商店已初始化完成")
     
     def get_shop_items(self):
         """
@@ -193,7 +276,8 @@ class Environment:
         # 重新初始化商店
         self.init_shop()
         
-        print("商店已刷新")
+        if self.verbose:
+            print("商店已刷新")
     
     def buy_joker_from_shop(self, index):
         """
@@ -217,10 +301,12 @@ class Environment:
                 if joker_card in self.joker_card_pool:
                     self.joker_card_pool.remove(joker_card)
                 
-                print(f"成功购买了小丑牌: {joker_card.name}")
+                if self.verbose:
+                    print(f"成功购买了小丑牌: {joker_card.name}")
                 return True
         
-        print("购买失败")
+        if self.verbose:
+            print("购买失败")
         return False
     
     def buy_tarot_from_shop(self, index):
@@ -244,10 +330,12 @@ class Environment:
                 
                 # 将塔罗牌添加给玩家
                 
-                print(f"成功购买了塔罗牌: {tarot_card.tarot_type}")
+                if self.verbose:
+                    print(f"成功购买了塔罗牌: {tarot_card.tarot_type}")
                 return True
         
-        print("购买失败")
+        if self.verbose:
+            print("购买失败")
         return False
     
     def sell_joker_to_shop(self, index):
@@ -264,7 +352,8 @@ class Environment:
         if 0 <= index < len(self.player.jokers):
             joker_card = self.player.jokers[index]
         else:
-            print("索引无效，无法售卖小丑牌")
+            if self.verbose:
+                print("索引无效，无法售卖小丑牌")
             return False
         
         # 添加到全局小丑牌池（实现放回功能）
@@ -273,10 +362,12 @@ class Environment:
             
             # 返还一部分购买价格（例如原价的70%）
             self.player.sell_joker(joker_card)
-            print(f"成功卖出了小丑牌: {joker_card.name}")
+            if self.verbose:
+                print(f"成功卖出了小丑牌: {joker_card.name}")
             return True
         
-        print("售卖失败")
+        if self.verbose:
+            print("售卖失败")
         return False
     def sell_tarot_to_shop(self, index):
         """
@@ -289,25 +380,25 @@ class Environment:
             bool: 是否售卖成功
         """
         # 检查索引是否有效
-        if 0 <= index < len(self.player.tarots):
-            tarot_card = self.player.tarots[index]
+        if 0 <= index < len(self.player.tarot_cards):
+            tarot_card = self.player.tarot_cards[index]
         else:
-            print("索引无效，无法售卖塔罗牌")
+            if self.verbose:
+                print("索引无效，无法售卖塔罗牌")
             return False
         
-        # 添加到全局塔罗牌池（实现放回功能）
+        # 塔罗牌购买时没有从牌池移除，可以重复出现，已在牌池中时不再放回
         if tarot_card not in self.tarot_card_pool:
             self.tarot_card_pool.append(tarot_card)
-            
-            # 返还一部分购买价格（例如原价的70%）
-            self.player.sell_tarot(tarot_card)
-            
-                
+
+        # 返还一部分购买价格（例如原价的70%）
+        funds_before = self.player.funds
+        self.player.sell_tarot(tarot_card)
+        sell_price = self.player.funds - funds_before
+        if self.verbose:
             print(f"成功卖出了塔罗牌: {tarot_card.tarot_type}，获得了{sell_price}金币")
-            return True
-        
-        print("售卖失败")
-        return False
+        return True
+
     def get_shop_status(self):
         """
         获取商店的状态
@@ -337,9 +428,9 @@ class Environment:
         """
         洗牌所有牌池
         """
-        random.shuffle(self.poker_card_pool)
-        random.shuffle(self.tarot_card_pool)
-        random.shuffle(self.joker_card_pool)
+        self._shuffle_poker_card_pool()
+        self.tarot_card_pool.shuffle(self.rng)
+        self.joker_card_pool.shuffle(self.rng)
     
     def check_game_end(self):
         """
@@ -350,14 +441,144 @@ class Environment:
         """
         # 检查玩家是否还有足够的资金
         if self.player.play_count == 0 and self.score<self.target:
-            print("游戏结束，玩家未达到目标分数")
+            if self.verbose:
+                print("游戏结束，玩家未达到目标分数")
             return True
         elif self.score>=self.target:
-            print("游戏结束，玩家达到目标分数")
+            if self.verbose:
+                print("游戏结束，玩家达到目标分数")
             return True
         
         return False
     
+    def reset(self, seed=None):
+        """
+        开始一局新游戏：重建所有牌池和商店，重置玩家状态并发初始手牌
+        
+        参数:
+            seed: 随机种子，为None时不重新设置
+        
+        返回:
+            numpy.ndarray: 观测向量，布局见utils.observation.ObservationEncoder；
+                缓冲区在每次reset/step时复用，需要保留时请复制
+        """
+        # 引擎和numpy只在reset/step时需要，延迟导入
+        from engine import GameEngine
+        from utils.observation import ObservationEncoder
+        
+        if seed is not None:
+            self.rng.seed(seed)
+        
+        self.player.reset()
+        self.poker_card_pool = PokerCardSet() if self.use_bitset else []
+        self.tarot_card_pool = IndexedPool()
+        self.joker_card_pool = self._new_joker_card_pool()
+        self.shop = {"jokers": [], "tarots": []}
+        self.score = 0
+        self._init_poker_card_pool()
+        self._init_tarot_card_pool()
+        self._init_joker_card_pool()
+        self.init_shop()
+        
+        self._engine = GameEngine(self.player, self, verbose=self.verbose, recorder=self.recorder)
+        self._engine.start()
+        if self._encoder is None or self._encoder.hand_limit != self.player.hand_limit:
+            self._encoder = ObservationEncoder(self.player.hand_limit, self.joker_names)
+        self._step_info = {"success": True, "won": False, "round": 1}
+        return self._encoder.encode(self, self._engine.current_round, self._engine.game_over)
+    
+    def step(self, action):
+        """
+        执行一次行动
+        
+        参数:
+            action: engine.Action对象
+        
+        返回:
+            tuple: (observation, reward, done, info)
+                observation: 观测向量，与reset返回的是同一个缓冲区
+                reward: 本次行动获得的分数
+                done: 对局是否结束
+                info: 复用的字典，包含success（行动是否成功）、won（是否获胜）、round（当前回合）
+        """
+        if self._engine is None:
+            raise RuntimeError("请先调用reset开始一局游戏")
+        
+        engine = self._engine
+        score_before = self.player.score
+        success = engine.step(action)
+        self.update_score()
+        
+        info = self._step_info
+        info["success"] = success
+        info["won"] = self.player.has_won()
+        info["round"] = engine.current_round
+        observation = self._encoder.encode(self, engine.current_round, engine.game_over)
+        return observation, self.player.score - score_before, engine.game_over, info
+    
+    def get_action_mask(self):
+        """
+        获取当前状态的行动掩码，布局见utils.observation.ObservationEncoder
+        
+        返回:
+            numpy.ndarray: 布尔缓冲区，在每次reset/step时更新
+        """
+        if self._encoder is None:
+            raise RuntimeError("请先调用reset开始一局游戏")
+        return self._encoder.action_mask
+    
+    def snapshot(self):
+        """
+        保存当前的完整游戏状态：牌池、商店、随机数状态以及玩家的手牌、小丑牌、塔罗牌、资金、分数和计数
+        
+        返回:
+            EnvironmentSnapshot: 快照对象，可以多次restore
+        """
+        player = self.player
+        return EnvironmentSnapshot(
+            tuple([card.code for card in self.poker_card_pool]),
+            self.tarot_card_pool.copy(),
+            self.joker_card_pool.copy(),
+            tuple(self.shop["jokers"]),
+            tuple(self.shop["tarots"]),
+            self.score,
+            self.rng.getstate(),
+            tuple([card.code for card in player.hand]),
+            tuple(player.jokers),
+            tuple(player.tarot_cards),
+            (player.funds, player.score, player.play_count, player.discard_count,
+             player.current_plays, player.current_discards)
+        )
+    
+    def restore(self, snapshot):
+        """
+        恢复到snapshot保存的游戏状态，扑克牌按编码重新创建
+        
+        参数:
+            snapshot: snapshot()返回的快照对象
+        """
+        from_code = PokerCard.from_code
+        poker_cards = [from_code(code) for code in snapshot.poker_codes]
+        hand = [from_code(code) for code in snapshot.hand_codes]
+        if self.use_bitset:
+            self.poker_card_pool = PokerCardSet(poker_cards)
+            hand = PokerCardSet(hand, ordered=True)
+        else:
+            self.poker_card_pool = poker_cards
+        # 再复制一次，快照可以多次恢复
+        self.tarot_card_pool = snapshot.tarot_pool.copy()
+        self.joker_card_pool = snapshot.joker_pool.copy()
+        self.shop = {"jokers": list(snapshot.shop_jokers), "tarots": list(snapshot.shop_tarots)}
+        self.score = snapshot.score
+        self.rng.setstate(snapshot.rng_state)
+        
+        player = self.player
+        player.hand = hand
+        player.jokers = list(snapshot.jokers)
+        player.tarot_cards = list(snapshot.tarot_cards)
+        (player.funds, player.score, player.play_count, player.discard_count,
+         player.current_plays, player.current_discards) = snapshot.counters
+    
     def update_score(self):
         """
         更新当前轮次的分数
@@ -369,3 +590,88 @@ class Environment:
     
         
 
+
+
+if __name__ == "__main__":
+    import copy
+    import time
+    from player import Player
+    from engine import Action, GameEngine
+
+    print("===== 独立随机数生成器测试 =====")
+    first = Environment(Player(verbose=False), verbose=False, seed=42)
+    random.seed(0)  # 全局random不影响环境
+    second = Environment(Player(verbose=False), verbose=False, seed=42)
+    same = [card.code for card in first.poker_card_pool] == [card.code for card in second.poker_card_pool]
+    print(f"相同种子的牌池一致: {'✓ 通过' if same else '✗ 失败'}")
+
+    print("\n===== 牌池塔罗牌可用性测试 =====")
+    unusable = []
+    for tarot_card in first.tarot_card_pool:
+        player = Player(verbose=False)
+        engine = GameEngine(player, Environment(player, verbose=False, seed=0))
+        engine.start()
+        player.tarot_cards.append(tarot_card)
+        if not engine.step(Action.use_tarot(0, [0])):
+            unusable.append(tarot_card.tarot_type)
+    print(f"牌池中每种塔罗牌都能通过引擎使用: {'✓ 通过' if not unusable else f'✗ 失败 {unusable}'}")
+
+    # 塔罗牌购买后仍留在牌池中，出售不能依赖牌池
+    environment = Environment(Player(verbose=False), verbose=False, seed=0)
+    environment.reset()
+    environment.player.funds = 20
+    _, _, _, info = environment.step(Action(Action.BUY_TAROT, index=0))
+    bought = info["success"]
+    encoder = environment._encoder
+    sellable = bool(environment.get_action_mask()[encoder.mask_slices['sell_tarot']][0])
+    _, _, _, info = environment.step(Action(Action.SELL_TAROT, index=0))
+    sold = info["success"]
+    print(f"购买塔罗牌后掩码允许出售且出售成功: {'✓ 通过' if bought and sellable and sold and not environment.player.tarot_cards else '✗ 失败'}")
+
+    print("\n===== 快照与恢复测试 =====")
+    for use_bitset in (False, True):
+        player = Player(verbose=False)
+        engine = GameEngine(player, Environment(player, use_bitset=use_bitset, verbose=False, seed=1))
+        engine.start()
+        engine.step(Action.discard([0, 1]))
+        saved = engine.snapshot()
+
+        def play_out():
+            # 确定性地打完一局，记录每一步的手牌和分数
+            history = []
+            while not engine.game_over:
+                engine.step(Action.play([0, 1, 2]))
+                engine.environment.refresh_shop()
+                history.append(([card.code for card in engine.player.hand], engine.player.score, tuple(id(jk) for jk in engine.environment.shop["jokers"])))
+            return history
+
+        expected = play_out()
+        engine.restore(saved)
+        replayed = play_out()
+        print(f"use_bitset={use_bitset} 恢复后重放一致: {'✓ 通过' if expected == replayed else '✗ 失败'}")
+
+    # 恢复后牌池中和已移出牌池的小丑牌、塔罗牌的稳定编号不变
+    environment = Environment(Player(verbose=False), verbose=False, seed=1)
+    environment.refresh_shop()
+
+    def card_ids():
+        pools = (environment.tarot_card_pool, environment.joker_card_pool)
+        cards = list(environment.tarot_card_pool) + list(environment.joker_card_pool) + environment.shop["jokers"] + environment.shop["tarots"]
+        return sorted((id(card), pool.id_of(card)) for card in cards for pool in pools if pool.id_of(card) is not None)
+
+    before = card_ids()
+    environment.restore(environment.snapshot())
+    print(f"恢复后卡牌编号不变: {'✓ 通过' if before and card_ids() == before else '✗ 失败'}")
+
+    environment = Environment(Player(verbose=False), verbose=False, seed=3)
+    environment.send_poker_card(8)
+    repeats = 2000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        environment.restore(environment.snapshot())
+    snapshot_time = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        copy.deepcopy(environment)
+    deepcopy_time = (time.perf_counter() - start) / repeats
+    print(f"快照+恢复 {snapshot_time * 1e6:.1f}微秒，deepcopy {deepcopy_time * 1e6:.1f}微秒，快 {deepcopy_time / snapshot_time:.1f}倍")
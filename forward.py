@@ -1,12 +1,28 @@
-from environment import Environment
-from player import Player
+from engine import Action, GameEngine
+from game_state import GameState
+from policy import HumanPolicy
 
 class GameController:
-    def __init__(self):
-        self.current_round = 1
-        self.player = Player()
-        self.environment = Environment(self.player)
-        self.game_over = False
+    """
+    命令行前端：由策略根据游戏状态选择Action，GameEngine执行游戏规则
+    """
+    def __init__(self, policy=None):
+        """
+        参数:
+            policy: 选择行动的策略（policy.Policy，如mcts.MCTSPlanner），为None时使用HumanPolicy读取命令行输入
+        """
+        self.policy = policy if policy is not None else HumanPolicy()
+        self.engine = GameEngine(verbose=True)
+        self.player = self.engine.player
+        self.environment = self.engine.environment
+
+    @property
+    def current_round(self):
+        return self.engine.current_round
+
+    @property
+    def game_over(self):
+        return self.engine.game_over
     
     def start_game(self):
         """开始游戏"""
@@ -15,7 +31,7 @@ class GameController:
         print(f"初始资金: {self.player.funds}")
         
         # 发初始手牌
-        self.environment.send_poker_card(self.player.hand_limit)
+        self.engine.start()
         print(f"发牌完成，当前手牌数: {len(self.player.hand)}")
         
         # 开始游戏循环
@@ -26,39 +42,16 @@ class GameController:
     
     def process_round(self):
         """处理一个回合"""
-        print(f"\n=== 第 {self.current_round} 回合 ===")
-        self.player.new_round()
-        
-        # 显示当前状态
+        round_number = self.current_round
+        print(f"\n=== 第 {round_number} 回合 ===")
         
-        
-        # 回合循环：玩家可以使用塔罗牌、出牌，直到出牌次数用完
-        while self.player.can_play() and not self.player.has_won():
+        # 回合循环：玩家可以使用塔罗牌、出牌，直到出牌次数用完；回合结束时由引擎补牌
+        while not self.game_over and self.current_round == round_number:
             self.show_game_status()
-            action = self.get_player_action()
-            
-            if action == "play":
-                self.handle_play_cards()
-            elif action == "discard":
-                self.handle_discard_cards()
-            elif action == "tarot":
-                self.handle_use_tarot()
-            else:
-                print("无效的选择，请重新输入")
-                continue
-            
-            # 检查胜利条件
-            if self.player.has_won():
-                self.game_over = True
-                return
-        
-        # 回合结束，补牌到手牌上限
-        self.refill_hand()
-        self.current_round += 1
-        
-        # 检查是否需要结束游戏（可以添加其他结束条件）
-        if self.current_round > 10:  # 示例：10回合后结束
-            self.game_over = True
+            action = self.policy.act(GameState.from_engine(self.engine))
+            if not self.policy.interactive:
+                print(f"\n选择行动: {action}")
+            self.handle_action(action)
     
     def show_game_status(self):
         """显示游戏状态"""
@@ -76,91 +69,47 @@ class GameController:
             for i, tarot in enumerate(self.player.tarot_cards):
                 print(f"  {i}: {tarot}")
     
-    def get_player_action(self):
-        """获取玩家行动选择"""
-        print("\n请选择行动:")
-        actions = []
-        
-        if self.player.can_play():
-            actions.append("play - 出牌")
-        if self.player.can_discard():
-            actions.append("discard - 弃牌")
-        if self.player.tarot_cards:
-            actions.append("tarot - 使用塔罗牌")
-        
-        for action in actions:
-            print(f"  {action}")
-        
-        choice = input("请输入选择: ").strip().lower()
-        return choice
-    
-    def handle_play_cards(self):
+    def handle_action(self, action):
+        """执行策略选择的行动"""
+        if action.kind == Action.PLAY:
+            self.handle_play_cards(action.card_indices)
+        elif action.kind == Action.DISCARD:
+            self.handle_discard_cards(action.card_indices)
+        elif action.kind == Action.TAROT:
+            self.handle_use_tarot(action.index, action.card_indices)
+        elif not self.engine.step(action):
+            print("行动无效")
+
+    def handle_play_cards(self, indices):
         """处理出牌"""
-        if not self.player.can_play():
+        if not self.engine.can_play():
             print("无法出牌")
             return
-        
-        print("请选择要出的牌（输入索引，用空格分隔，最多5张）:")
         try:
-            indices_input = input("牌索引: ").strip()
-            if not indices_input:
-                print("未选择任何牌")
-                return
-            
-            indices = [int(x) for x in indices_input.split()]
-            success = self.player.play_card(indices)
-            
-            if success:
+            if self.engine.step(Action.play(indices)):
                 print(f"成功出牌")
-                self.refill_hand()
-        except ValueError:
-            print("输入格式错误，请输入数字")
         except Exception as e:
             print(f"出牌失败: {e}")
     
-    def handle_discard_cards(self):
+    def handle_discard_cards(self, indices):
         """处理弃牌"""
-        if not self.player.can_discard():
+        if not self.engine.can_discard():
             print("无法弃牌")
             return
-        
-        print("请选择要弃的牌（输入索引，用空格分隔，最多5张）:")
         try:
-            indices_input = input("牌索引: ").strip()
-            if not indices_input:
-                print("未选择任何牌")
-                return
-            
-            indices = [int(x) for x in indices_input.split()]
-            discarded_count = self.player.discard_card(indices)
-            
-            if discarded_count > 0:
-                print(f"成功弃掉 {discarded_count} 张牌")
-        except ValueError:
-            print("输入格式错误，请输入数字")
+            if self.engine.step(Action.discard(indices)):
+                print(f"成功弃掉 {len(indices)} 张牌")
         except Exception as e:
             print(f"弃牌失败: {e}")
     
-    def handle_use_tarot(self):
+    def handle_use_tarot(self, tarot_index, card_indices=None):
         """处理使用塔罗牌"""
-        if not self.player.tarot_cards:
+        if not self.engine.can_use_tarot():
             print("没有塔罗牌可以使用")
             return
-        
-        print("请选择要使用的塔罗牌索引:")
         try:
-            tarot_index = int(input("塔罗牌索引: ").strip())
-            
-            # 根据塔罗牌类型，可能需要选择目标牌
-            print("请选择目标牌索引（如果不需要可直接回车）:")
-            card_input = input("目标牌索引: ").strip()
-            card_index = int(card_input) if card_input else None
-            
-            success = self.player.use_tarot_card(tarot_index, card_index)
-            if success:
+            if self.engine.step(Action.use_tarot(tarot_index, card_indices)):
                 print("塔罗牌使用成功")
-        except ValueError:
-            print("输入格式错误，请输入数字")
         except Exception as e:
             print(f"使用塔罗牌失败: {e}")
     
@@ -173,9 +122,24 @@ class GameController:
             print("游戏结束")
         
         print(f"最终分数: {self.player.score}/{self.player.target_score}")
-        print(f"游戏回合数: {self.current_round - 1}")
+        print(f"游戏回合数: {min(self.current_round, self.engine.max_rounds)}")
         print(f"剩余资金: {self.player.funds}")
 
 if __name__ == "__main__":
-    game_controller = GameController()
-    game_controller.start_game()
\ No newline at end of file
+    import sys
+    
+    policy = None
+    if "--mcts" in sys.argv:
+        # 由MCTS规划器代替玩家操作
+        from mcts import MCTSPlanner
+        policy = MCTSPlanner()
+    game_controller = GameController(policy)
+    if "--profile" in sys.argv:
+        # 记录各阶段耗时和出牌统计，游戏结束后打印
+        from utils.profiler import profiling
+        with profiling() as profiler:
+            game_controller.start_game()
+        print("\n=== 性能统计 ===")
+        print(profiler.format_report())
+    else:
+        game_controller.start_game()
\ No newline at end of file
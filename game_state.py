@@ -0,0 +1,416 @@
+import math
+
+from card.joker.apply_joker import compile_jokers
+from card.Tarot.apply_tarot import apply_tarot_codes
+from card.poker.poker_card import PokerCard
+from engine import Action
+from player import Player
+
+
+class GameConfig:
+    """
+    一局游戏的固定参数，同一棵搜索树中的所有状态共享一个对象
+    """
+    __slots__ = ('target_score', 'hand_limit', 'plays_per_round', 'discards_per_round', 'max_rounds', 'hand_rank', 'scorer')
+
+    def __init__(self, target_score=200, hand_limit=8, plays_per_round=4, discards_per_round=3, max_rounds=10, scorer=None):
+        """
+        参数:
+            target_score, hand_limit, plays_per_round, discards_per_round: 同Player
+            max_rounds: 最多进行的回合数，同GameEngine
+            scorer: 用于计分的Player对象，为None时新建；只使用其compute_score
+        """
+        self.target_score = target_score
+        self.hand_limit = hand_limit
+        self.plays_per_round = plays_per_round
+        self.discards_per_round = discards_per_round
+        self.max_rounds = max_rounds
+        if scorer is None:
+            scorer = Player(target_score=target_score, hand_limit=hand_limit, plays_per_round=plays_per_round,
+                            discards_per_round=discards_per_round, verbose=False)
+        self.scorer = scorer
+        self.hand_rank = scorer.poker_hand_rank
+
+
+class GameState:
+    """
+    不可变的游戏状态，用于树搜索
+
+    扑克牌以PokerCard.code整数存放：牌堆是整张洗好的编码元组加上剩余张数，
+    发牌只减少剩余张数；手牌、小丑牌、塔罗牌、商店和牌池都是元组。
+    每个行动返回一个新状态，没有变化的元组直接与父状态共享，只复制被行动改变的部分
+    （如出牌后的手牌、塔罗牌修改后的一张牌的编码），原状态保持不变。
+
+    规则与GameEngine一致：出牌按手牌索引从大到小的顺序计分，出牌和弃牌成功后补牌，
+    出牌次数用完时回合结束并补牌，达到目标分数或超过回合上限时对局结束。
+    商店刷新需要随机数，不在状态中进行。
+    """
+    __slots__ = ('config', 'deck', 'deck_size', 'hand', 'jokers', 'tarot_cards', 'joker_pool', 'tarot_pool',
+                 'shop_jokers', 'shop_tarots', 'funds', 'score', 'current_plays', 'current_discards',
+                 'current_round', 'game_over')
+
+    @classmethod
+    def from_engine(cls, engine):
+        """
+        从已开始的GameEngine创建状态
+
+        参数:
+            engine: GameEngine对象
+
+        返回:
+            GameState: 与引擎当前状态一致的根状态
+        """
+        player = engine.player
+        environment = engine.environment
+        config = GameConfig(player.target_score, player.hand_limit, player.plays_per_round,
+                            player.discards_per_round, engine.max_rounds, scorer=player)
+        state = cls.__new__(cls)
+        state.config = config
+        state.deck = tuple([card.code for card in environment.poker_card_pool])
+        state.deck_size = len(state.deck)
+        state.hand = tuple([card.code for card in player.hand])
+        state.jokers = tuple(player.jokers)
+        state.tarot_cards = tuple(player.tarot_cards)
+        state.joker_pool = tuple(environment.joker_card_pool)
+        state.tarot_pool = tuple(environment.tarot_card_pool)
+        state.shop_jokers = tuple(environment.shop["jokers"])
+        state.shop_tarots = tuple(environment.shop["tarots"])
+        state.funds = player.funds
+        state.score = player.score
+        state.current_plays = player.current_plays
+        state.current_discards = player.current_discards
+        state.current_round = engine.current_round
+        state.game_over = engine.game_over
+        return state
+
+    def _child(self):
+        """浅复制：新状态与本状态共享所有元组"""
+        child = GameState.__new__(GameState)
+        child.config = self.config
+        child.deck = self.deck
+        child.deck_size = self.deck_size
+        child.hand = self.hand
+        child.jokers = self.jokers
+        child.tarot_cards = self.tarot_cards
+        child.joker_pool = self.joker_pool
+        child.tarot_pool = self.tarot_pool
+        child.shop_jokers = self.shop_jokers
+        child.shop_tarots = self.shop_tarots
+        child.funds = self.funds
+        child.score = self.score
+        child.current_plays = self.current_plays
+        child.current_discards = self.current_discards
+        child.current_round = self.current_round
+        child.game_over = self.game_over
+        return child
+
+    def remaining_deck(self):
+        """牌堆中剩余牌的编码，最后一张最先发出"""
+        return self.deck[:self.deck_size]
+
+    def determinize(self, rng):
+        """
+        对未知的牌堆顺序采样：返回剩余牌堆随机重排后的新状态，其余部分与本状态共享
+
+        参数:
+            rng: random.Random对象
+
+        返回:
+            GameState: 新状态
+        """
+        remaining = list(self.deck[:self.deck_size])
+        rng.shuffle(remaining)
+        child = self._child()
+        child.deck = tuple(remaining)
+        return child
+
+    def hand_cards(self):
+        """把手牌编码还原为PokerCard列表"""
+        return [PokerCard.from_code(code) for code in self.hand]
+
+    def can_play(self):
+        return not self.game_over and self.current_plays < self.config.plays_per_round and len(self.hand) > 0
+
+    def can_discard(self):
+        return not self.game_over and self.current_discards < self.config.discards_per_round and len(self.hand) > 0
+
+    def has_won(self):
+        return self.score >= self.config.target_score
+
+    def _refill(self):
+        """从牌堆末尾补牌到手牌上限，同Environment.refill_hand"""
+        needed = min(self.config.hand_limit - len(self.hand), self.deck_size)
+        if needed > 0:
+            start = self.deck_size - needed
+            self.hand = self.hand + self.deck[start:self.deck_size][::-1]
+            self.deck_size = start
+
+    def _advance(self):
+        """检查胜利条件并结束出牌次数用完的回合，同GameEngine._advance"""
+        config = self.config
+        if self.score >= config.target_score:
+            self.game_over = True
+            return
+        while not (self.current_plays < config.plays_per_round and len(self.hand) > 0):
+            self._refill()
+            self.current_round += 1
+            if self.current_round > config.max_rounds:
+                self.game_over = True
+                return
+            self.current_plays = 0
+            self.current_discards = 0
+
+    def _valid_indices(self, card_indices, max_cards):
+        """同Player.play_card的索引校验，另外拒绝重复索引"""
+        if not card_indices or len(card_indices) > max_cards or len(set(card_indices)) != len(card_indices):
+            return False
+        size = len(self.hand)
+        return all(0 <= index < size for index in card_indices)
+
+    def _remove_from_hand(self, card_indices):
+        """返回按索引从大到小取出的牌编码，并从手牌中移除"""
+        hand = self.hand
+        removed = [hand[index] for index in sorted(card_indices, reverse=True)]
+        selected = set(card_indices)
+        self.hand = tuple([code for index, code in enumerate(hand) if index not in selected])
+        return removed
+
+    def play(self, card_indices):
+        """
+        出牌
+
+        参数:
+            card_indices: 要出的牌在手牌中的索引列表
+
+        返回:
+            GameState: 新状态，行动无效时返回None
+        """
+        if not self.can_play() or not self._valid_indices(card_indices, 5):
+            return None
+        child = self._child()
+        played = [PokerCard.from_code(code) for code in child._remove_from_hand(card_indices)]
+        config = self.config
+        child.score += config.scorer.compute_score(played, config.hand_rank, self.jokers)
+        child.current_plays += 1
+        child._refill()
+        child._advance()
+        return child
+
+    def discard(self, card_indices):
+        """
+        弃牌
+
+        参数:
+            card_indices: 要弃的牌在手牌中的索引列表
+
+        返回:
+            GameState: 新状态，行动无效时返回None
+        """
+        if not self.can_discard() or not self._valid_indices(card_indices, 5):
+            return None
+        child = self._child()
+        child._remove_from_hand(card_indices)
+        child.current_discards += 1
+        child.funds += compile_jokers(self.jokers).discard_funds
+        child._refill()
+        child._advance()
+        return child
+
+    def use_tarot(self, tarot_index, card_indices=None):
+        """
+        使用塔罗牌，效果同Player.use_tarot_card，只复制被修改的手牌元组
+
+        参数:
+            tarot_index: 塔罗牌索引
+            card_indices: 目标手牌索引列表
+
+        返回:
+            GameState: 新状态，行动无效时返回None
+        """
+        if self.game_over or not 0 <= tarot_index < len(self.tarot_cards):
+            return None
+        result = apply_tarot_codes(self.tarot_cards[tarot_index], self.hand, card_indices, self.funds)
+        if result is None:
+            return None
+
+        child = self._child()
+        child.hand, child.funds = result
+        child.tarot_cards = self.tarot_cards[:tarot_index] + self.tarot_cards[tarot_index + 1:]
+        child._advance()
+        return child
+
+    def buy_joker(self, index):
+        """购买商店中的小丑牌，同Environment.buy_joker_from_shop，无效时返回None"""
+        if self.game_over or not 0 <= index < len(self.shop_jokers):
+            return None
+        joker_card = self.shop_jokers[index]
+        price = compile_jokers(self.jokers).price(joker_card.get_price())
+        if self.funds < price:
+            return None
+        child = self._child()
+        child.funds -= price
+        child.jokers = self.jokers + (joker_card,)
+        child.shop_jokers = self.shop_jokers[:index] + self.shop_jokers[index + 1:]
+        child.joker_pool = tuple([card for card in self.joker_pool if card is not joker_card])
+        return child
+
+    def buy_tarot(self, index):
+        """购买商店中的塔罗牌，同Environment.buy_tarot_from_shop，无效时返回None"""
+        if self.game_over or not 0 <= index < len(self.shop_tarots):
+            return None
+        tarot_card = self.shop_tarots[index]
+        price = compile_jokers(self.jokers).price(tarot_card.get_price())
+        if self.funds < price:
+            return None
+        child = self._child()
+        child.funds -= price
+        child.tarot_cards = self.tarot_cards + (tarot_card,)
+        child.shop_tarots = self.shop_tarots[:index] + self.shop_tarots[index + 1:]
+        return child
+
+    def sell_joker(self, index):
+        """出售拥有的小丑牌并放回牌池，同Environment.sell_joker_to_shop，无效时返回None"""
+        if self.game_over or not 0 <= index < len(self.jokers):
+            return None
+        joker_card = self.jokers[index]
+        if joker_card in self.joker_pool:
+            return None
+        child = self._child()
+        child.funds += math.floor(joker_card.get_price() * 0.7)
+        child.jokers = self.jokers[:index] + self.jokers[index + 1:]
+        child.joker_pool = self.joker_pool + (joker_card,)
+        return child
+
+    def sell_tarot(self, index):
+        """出售拥有的塔罗牌并放回牌池，同Environment.sell_tarot_to_shop，无效时返回None"""
+        if self.game_over or not 0 <= index < len(self.tarot_cards):
+            return None
+        tarot_card = self.tarot_cards[index]
+        child = self._child()
+        child.funds += math.floor(tarot_card.get_price() * 0.7)
+        child.tarot_cards = self.tarot_cards[:index] + self.tarot_cards[index + 1:]
+        if tarot_card not in self.tarot_pool:
+            child.tarot_pool = self.tarot_pool + (tarot_card,)
+        return child
+
+    def apply(self, action):
+        """
+        执行Action，返回新状态
+
+        参数:
+            action: engine.Action对象，不支持REFRESH_SHOP
+
+        返回:
+            GameState: 新状态，行动无效时返回None
+        """
+        kind = action.kind
+        if kind == Action.PLAY:
+            return self.play(action.card_indices)
+        if kind == Action.DISCARD:
+            return self.discard(action.card_indices)
+        if kind == Action.TAROT:
+            return self.use_tarot(action.index, action.card_indices)
+        if kind == Action.BUY_JOKER:
+            return self.buy_joker(action.index)
+        if kind == Action.BUY_TAROT:
+            return self.buy_tarot(action.index)
+        if kind == Action.SELL_JOKER:
+            return self.sell_joker(action.index)
+        if kind == Action.SELL_TAROT:
+            return self.sell_tarot(action.index)
+        return None
+
+
+
+if __name__ == "__main__":
+    import copy
+    import random
+    import sys
+    import time
+    import tracemalloc
+    from engine import GameEngine
+
+    print("===== GameState与GameEngine规则一致性测试 =====")
+    rng = random.Random(0)
+    mismatches = 0
+    tarots_used = 0
+    for game in range(200):
+        engine = GameEngine(seed=game)
+        engine.start()
+        state = GameState.from_engine(engine)
+        while not engine.game_over:
+            player = engine.player
+            hand_size = len(player.hand)
+            indices = rng.sample(range(hand_size), rng.randint(1, min(5, hand_size)))
+            roll = rng.random()
+            if roll < 0.1 and engine.environment.shop["tarots"]:
+                action = Action(Action.BUY_TAROT, index=0)
+            elif roll < 0.3 and player.tarot_cards:
+                action = Action.use_tarot(rng.randrange(len(player.tarot_cards)), indices[:rng.randint(0, 3)])
+            elif rng.random() < 0.7 or not engine.can_discard():
+                action = Action.play(indices)
+            else:
+                action = Action.discard(indices)
+            success = engine.step(action)
+            child = state.apply(action)
+            if (child is not None) != success:
+                mismatches += 1
+                break
+            if child is None:
+                continue
+            state = child
+            tarots_used += action.kind == Action.TAROT
+            if (state.score != player.score or list(state.hand) != [card.code for card in player.hand]
+                    or state.funds != player.funds or len(state.tarot_cards) != len(player.tarot_cards)
+                    or state.current_round != engine.current_round or state.game_over != engine.game_over):
+                mismatches += 1
+                break
+    print(f"200局随机对局（使用塔罗牌 {tarots_used} 次），不一致 {mismatches} 局")
+    print(f"测试结果: {'✓ 通过' if mismatches == 0 else '✗ 失败'}")
+
+    print("\n===== 克隆延迟与每个节点的内存 =====")
+    engine = GameEngine(seed=1)
+    engine.start()
+    root = GameState.from_engine(engine)
+    action = Action.discard([0, 1])
+    repeats = 5000
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        root._child()
+    clone_time = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        root.apply(action)
+    discard_time = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        root.play([0, 1, 2])
+    play_time = (time.perf_counter() - start) / repeats
+    snapshot = engine.snapshot()
+    start = time.perf_counter()
+    for _ in range(repeats // 10):
+        engine.restore(snapshot)
+        engine.step(action)
+    restore_time = (time.perf_counter() - start) / (repeats // 10)
+    engine.restore(snapshot)
+    start = time.perf_counter()
+    for _ in range(repeats // 50):
+        clone = copy.deepcopy(engine)
+        clone.step(action)
+    deepcopy_time = (time.perf_counter() - start) / (repeats // 50)
+    print(f"共享克隆 {clone_time * 1e6:.2f}微秒，弃牌子节点 {discard_time * 1e6:.2f}微秒，出牌子节点 {play_time * 1e6:.2f}微秒")
+    print(f"对比: snapshot/restore+step {restore_time * 1e6:.1f}微秒，deepcopy+step {deepcopy_time * 1e6:.1f}微秒")
+
+    nodes = 10000
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    children = [root.apply(action) for _ in range(nodes)]
+    state_bytes = (tracemalloc.get_traced_memory()[0] - before) / nodes
+    tracemalloc.stop()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copies = [copy.deepcopy(engine) for _ in range(nodes // 50)]
+    deepcopy_bytes = (tracemalloc.get_traced_memory()[0] - before) / (nodes // 50)
+    tracemalloc.stop()
+    print(f"每个弃牌子节点 {state_bytes:.0f}字节（GameState对象本身 {sys.getsizeof(root)}字节），deepcopy每份 {deepcopy_bytes:.0f}字节")
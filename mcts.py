@@ -0,0 +1,357 @@
+import heapq
+import math
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+from card.poker.poker_card import PokerCard
+from engine import Action
+from game_state import GameState
+from policy import Policy
+
+_NUM_VALUES = len(PokerCard.VALUES)
+_NUM_SUITS = len(PokerCard.SUITS)
+
+# 需要一张目标牌、修改其效果的塔罗牌
+_SINGLE_TARGET_TAROTS = ('POINT_BOOST', 'MULTIPLIER_ADD', 'MULTIPLIER_BOOST', 'SELECTIVE_BOOST')
+
+
+class _Node:
+    """ISMCTS搜索树节点，children以行动签名为键"""
+    __slots__ = ('visits', 'total', 'availability', 'children')
+
+    def __init__(self):
+        self.visits = 0
+        self.total = 0.0
+        self.availability = 0  # 该行动在采样状态中合法的次数
+        self.children = {}
+
+
+def action_key(state, action):
+    """
+    行动的签名：行动类型、涉及的牌的编码和索引
+
+    同一节点在不同采样下手牌顺序可能不同，用牌的编码而不是手牌索引区分出牌和弃牌
+    """
+    cards = tuple(sorted(state.hand[index] for index in action.card_indices)) if action.card_indices else ()
+    return action.kind, cards, action.index
+
+
+def state_value(state):
+    """
+    局面的价值，范围[0, 1]：获胜为0.5到1，越早获胜越高；未获胜时按分数进度给0到0.5
+    """
+    config = state.config
+    if state.has_won():
+        return 1.0 - 0.5 * (state.current_round - 1) / config.max_rounds
+    return 0.5 * min(state.score / config.target_score, 1.0)
+
+
+class MCTSPlanner(Policy):
+    """
+    单观察者ISMCTS规划器：每次迭代先对未知的牌堆顺序采样，再在共享的搜索树上
+    用UCB选择、扩展一个新行动、用随机贪心策略模拟到对局结束并回传价值
+
+    候选行动经过裁剪以控制分支数：
+        出牌：按即时得分最高的max_play_actions种组合
+        弃牌：保留高分组合的牌弃掉其余牌，弃掉筹码最低的牌，以及为同花弃掉其他花色
+        塔罗牌：对最佳出牌中的牌或其余的牌使用
+        购买：资金足够的商店物品
+    实现Policy接口，也可以直接作为GameEngine.run和MonteCarloEstimator的策略使用。
+    """
+    def __init__(self, iterations=200, time_limit=None, exploration=0.7, max_play_actions=6,
+                 rollout_samples=4, use_tarots=True, workers=1, play_cache_size=4096, seed=None):
+        """
+        初始化规划器
+
+        参数:
+            iterations: 每次决策的迭代次数上限，为None时只受time_limit限制
+            time_limit: 每次决策的时间上限（秒），为None时只受iterations限制
+            exploration: UCB的探索系数
+            max_play_actions: 每个节点保留的出牌候选数
+            rollout_samples: 模拟时每步随机抽取的出牌组合数，打出其中得分最高的
+            use_tarots: 是否把使用塔罗牌作为候选行动
+            workers: 根并行的进程数，大于1时每个进程独立搜索后合并根节点统计
+            play_cache_size: 按手牌缓存的最佳出牌候选的条目数，超过时淘汰最久未使用的条目
+            seed: 随机种子
+        """
+        if iterations is None and time_limit is None:
+            raise ValueError("iterations和time_limit至少要设置一个")
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.max_play_actions = max_play_actions
+        self.rollout_samples = rollout_samples
+        self.use_tarots = use_tarots
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.play_cache_size = play_cache_size
+        self._play_cache = OrderedDict()  # (手牌, 小丑牌) -> 得分最高的出牌组合
+        self._executor = None
+
+    def __getstate__(self):
+        # 进程池和缓存不随规划器传给工作进程
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_play_cache'] = OrderedDict()
+        return state
+
+    def close(self):
+        """关闭根并行使用的进程池"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def choose_action(self, engine):
+        """
+        为引擎的当前局面选择行动
+
+        参数:
+            engine: 已开始的GameEngine
+
+        返回:
+            Action: 访问次数最多的根行动
+        """
+        return self.act(GameState.from_engine(engine))
+
+    def act(self, root):
+        """
+        为状态选择行动
+
+        参数:
+            root: 未结束的GameState
+
+        返回:
+            Action: 访问次数最多的根行动
+        """
+        if root.current_round == 1 and root.current_plays == 0 and root.current_discards == 0:
+            # 新对局开始，上一局的手牌不会再出现
+            self._play_cache.clear()
+        candidates = self.candidate_actions(root)
+        if len(candidates) == 1:
+            return candidates[0]
+
+        if self.workers > 1:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            iterations = None if self.iterations is None else math.ceil(self.iterations / self.workers)
+            seeds = [self.rng.getrandbits(64) for _ in range(self.workers)]
+            futures = [self._executor.submit(_search_worker, self, root, seed, iterations) for seed in seeds]
+            stats = {}
+            for future in futures:
+                for key, (visits, total) in future.result().items():
+                    merged = stats.setdefault(key, [0, 0.0])
+                    merged[0] += visits
+                    merged[1] += total
+        else:
+            stats = self.search(root, self.rng, self.iterations)
+
+        best_action = candidates[0]
+        best_visits = -1
+        for action in candidates:
+            visits = stats.get(action_key(root, action), (0, 0.0))[0]
+            if visits > best_visits:
+                best_action, best_visits = action, visits
+        return best_action
+
+    def search(self, root, rng, iterations):
+        """
+        从root开始搜索
+
+        参数:
+            root: GameState根状态
+            rng: random.Random对象
+            iterations: 迭代次数上限，为None时只受time_limit限制
+
+        返回:
+            dict: 根节点每个行动签名的(访问次数, 价值总和)
+        """
+        root_node = _Node()
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        count = 0
+        while (iterations is None or count < iterations) and (deadline is None or time.perf_counter() < deadline):
+            self._iterate(root_node, root.determinize(rng), rng)
+            count += 1
+        return {key: (child.visits, child.total) for key, child in root_node.children.items()}
+
+    def _iterate(self, node, state, rng):
+        """一次选择、扩展、模拟和回传"""
+        path = [node]
+        while not state.game_over:
+            legal = {action_key(state, action): action for action in self.candidate_actions(state)}
+            unexpanded = [key for key in legal if key not in node.children]
+            if unexpanded:
+                key = rng.choice(unexpanded)
+                child = _Node()
+                node.children[key] = child
+                for other in legal:
+                    if other in node.children:
+                        node.children[other].availability += 1
+                state = state.apply(legal[key])
+                path.append(child)
+                break
+
+            # 所有合法行动都已扩展，按可用次数修正的UCB选择
+            best_key = None
+            best_score = -1.0
+            for key in legal:
+                child = node.children[key]
+                child.availability += 1
+                score = child.total / child.visits + self.exploration * math.sqrt(math.log(child.availability) / child.visits)
+                if score > best_score:
+                    best_key, best_score = key, score
+            node = node.children[best_key]
+            state = state.apply(legal[best_key])
+            path.append(node)
+
+        value = self._rollout(state, rng)
+        for visited in path:
+            visited.visits += 1
+            visited.total += value
+
+    def _rollout(self, state, rng):
+        """每步随机抽取rollout_samples种出牌组合，打出得分最高的一种，直到对局结束"""
+        while not state.game_over:
+            hand_size = len(state.hand)
+            best = None
+            for _ in range(self.rollout_samples):
+                indices = rng.sample(range(hand_size), rng.randint(1, min(5, hand_size)))
+                child = state.play(indices)
+                if best is None or child.score > best.score:
+                    best = child
+            state = best
+        return state_value(state)
+
+    def _ranked_plays(self, state):
+        """
+        即时得分最高的max_play_actions种1-5张出牌组合，从高到低排列，结果按(手牌, 小丑牌)缓存
+
+        返回:
+            list: (分数, 索引元组)
+        """
+        key = (state.hand, state.jokers)
+        cache = self._play_cache
+        ranked = cache.get(key)
+        if ranked is not None:
+            cache.move_to_end(key)
+            return ranked
+
+        cards = state.hand_cards()
+        config = state.config
+        compute_score = config.scorer.compute_score
+        ranked = []
+        for size in range(1, min(5, len(cards)) + 1):
+            for indices in combinations(range(len(cards)), size):
+                # play_card按索引从大到小的顺序计分
+                played = [cards[index] for index in reversed(indices)]
+                ranked.append((compute_score(played, config.hand_rank, state.jokers), indices))
+        # 只保留候选行动用到的组合
+        ranked = heapq.nsmallest(max(1, self.max_play_actions), ranked, key=lambda item: -item[0])
+
+        cache[key] = ranked
+        if len(cache) > self.play_cache_size:
+            cache.popitem(last=False)
+        return ranked
+
+    def candidate_actions(self, state):
+        """
+        生成裁剪后的候选行动
+
+        参数:
+            state: GameState
+
+        返回:
+            list: 合法的Action列表，对局结束时为空
+        """
+        if state.game_over:
+            return []
+        actions = []
+        hand = state.hand
+        ranked = self._ranked_plays(state) if hand else []
+        top_plays = [indices for _, indices in ranked[:self.max_play_actions]]
+        best_play = top_plays[0] if top_plays else ()
+        # 手牌索引按筹码从低到高排列
+        by_chips = sorted(range(len(hand)), key=lambda index: PokerCard.CHIPS[hand[index] % _NUM_VALUES])
+
+        if state.can_play():
+            actions.extend(Action.play(indices) for indices in top_plays)
+
+        if state.can_discard():
+            discards = []
+            for indices in top_plays[:3]:
+                rest = [index for index in by_chips if index not in indices][:5]
+                if rest:
+                    discards.append(tuple(sorted(rest)))
+            discards.append(tuple(sorted(by_chips[:3])))
+            suit_counts = {}
+            for code in hand:
+                suit = code // _NUM_VALUES % _NUM_SUITS
+                suit_counts[suit] = suit_counts.get(suit, 0) + 1
+            flush_suit = max(suit_counts, key=suit_counts.get)
+            off_suit = [index for index in by_chips if hand[index] // _NUM_VALUES % _NUM_SUITS != flush_suit][:5]
+            if off_suit:
+                discards.append(tuple(sorted(off_suit)))
+            seen = set()
+            for indices in discards:
+                if indices not in seen:
+                    seen.add(indices)
+                    actions.append(Action.discard(indices))
+
+        others = [index for index in by_chips if index not in best_play]
+        for tarot_index, tarot_card in enumerate(state.tarot_cards if self.use_tarots else ()):
+            tarot_type = tarot_card.tarot_type
+            if tarot_type in _SINGLE_TARGET_TAROTS:
+                targets = [best_play[-1]] if best_play else None
+            elif tarot_type == 'CARD_DESTROY':
+                targets = others[:2] or None
+            elif tarot_type == 'SUIT_TRANSFORM':
+                targets = others[:3] or None
+            else:
+                targets = None
+            action = Action.use_tarot(tarot_index, targets)
+            if state.apply(action) is not None:
+                actions.append(action)
+
+        for index, joker_card in enumerate(state.shop_jokers):
+            if state.funds >= joker_card.get_price():
+                actions.append(Action(Action.BUY_JOKER, index=index))
+        for index, tarot_card in enumerate(state.shop_tarots):
+            if state.funds >= tarot_card.get_price():
+                actions.append(Action(Action.BUY_TAROT, index=index))
+        return actions
+
+
+def _search_worker(planner, root, seed, iterations):
+    """根并行的工作进程：用独立的种子搜索同一个根状态"""
+    return planner.search(root, random.Random(seed), iterations)
+
+
+if __name__ == "__main__":
+    from engine import GameEngine
+    from monte_carlo import MonteCarloEstimator
+    from policy import GreedyPolicy
+
+    print("===== MCTS规划器 =====")
+    engine = GameEngine(seed=0)
+    engine.start()
+    planner = MCTSPlanner(iterations=200, seed=0)
+    start = time.perf_counter()
+    action = planner.choose_action(engine)
+    print(f"首个决策: {action}，用时 {time.perf_counter() - start:.3f}秒（含牌型表构建）")
+
+    # 目标分数提高到贪心策略难以稳定达到的水平，比较两种策略
+    config = {'target_score': 1200, 'max_rounds': 3}
+    num_games = 40
+    start = time.perf_counter()
+    mcts_result = MonteCarloEstimator(MCTSPlanner(iterations=100, seed=0), max_workers=1, **config).run(num_games, seed=1)
+    elapsed = time.perf_counter() - start
+    greedy_result = MonteCarloEstimator(GreedyPolicy(), max_workers=1, **config).run(num_games, seed=1)
+    print(f"目标{config['target_score']}分、{config['max_rounds']}回合，{num_games}局:")
+    print(f"  MCTS: 胜率 {mcts_result['win_rate'][0]:.2f}，平均分数 {mcts_result['score_mean'][0]:.0f}，每局 {elapsed / num_games:.2f}秒")
+    print(f"  贪心: 胜率 {greedy_result['win_rate'][0]:.2f}，平均分数 {greedy_result['score_mean'][0]:.0f}")
+
+    parallel = MCTSPlanner(iterations=200, workers=2, seed=0)
+    print(f"根并行(2进程)决策: {parallel.choose_action(engine)}")
+    parallel.close()
@@ -0,0 +1,213 @@
+import math
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import GameEngine
+from policy import GreedyPolicy, RandomPolicy
+
+# 正态分布95%置信区间的分位数
+_Z_95 = 1.959963984540054
+
+
+def _run_chunk(policy, player_config, max_rounds, seeds):
+    """
+    在工作进程中依次进行一批对局
+
+    参数:
+        policy: 接收引擎、返回Action的可调用对象（如policy.Policy），必须能被pickle
+        player_config: 创建Player的参数
+        max_rounds: 最多进行的回合数
+        seeds: 每局的随机种子
+
+    返回:
+        list: 每局的(是否获胜, 最终分数, 结束时的回合数)
+    """
+    results = []
+    for seed in seeds:
+        # 环境使用自己的随机数生成器，全局random只留给策略使用
+        random.seed(seed)
+        engine = GameEngine(max_rounds=max_rounds, seed=seed, **player_config)
+        won = engine.run(policy)
+        results.append((won, engine.player.score, min(engine.current_round, max_rounds)))
+    return results
+
+
+def wilson_interval(successes, trials, z=_Z_95):
+    """
+    二项比例的Wilson置信区间
+
+    参数:
+        successes: 成功次数
+        trials: 试验次数
+        z: 正态分位数，默认对应95%
+
+    返回:
+        tuple: (下限, 上限)，trials为0时返回(0.0, 1.0)
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def mean_interval(values, z=_Z_95):
+    """
+    样本均值及其正态近似置信区间
+
+    返回:
+        tuple: (均值, 下限, 上限)，样本为空时全为None
+    """
+    if not values:
+        return None, None, None
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, mean, mean
+    half_width = z * statistics.stdev(values) / math.sqrt(len(values))
+    return mean, mean - half_width, mean + half_width
+
+
+class MonteCarloEstimator:
+    """
+    多进程蒙特卡洛胜率估计：把N局完整对局分块分发到ProcessPoolExecutor并行运行
+
+    每局的种子在主进程中由seed一次性生成，结果只取决于seed和对局数，
+    与进程数和分块大小无关。
+    """
+    def __init__(self, policy, initial_funds=4, target_score=200, hand_limit=8,
+                 plays_per_round=4, discards_per_round=3, max_rounds=10, max_workers=None):
+        """
+        初始化估计器
+
+        参数:
+            policy: 接收引擎、返回Action的可调用对象，如policy.Policy对象或模块级函数，必须能被pickle以便传给工作进程
+            initial_funds, target_score, hand_limit, plays_per_round, discards_per_round: 同Player
+            max_rounds: 最多进行的回合数，同GameEngine
+            max_workers: 工作进程数，为None时使用CPU核数
+        """
+        self.policy = policy
+        self.player_config = {
+            'initial_funds': initial_funds,
+            'target_score': target_score,
+            'hand_limit': hand_limit,
+            'plays_per_round': plays_per_round,
+            'discards_per_round': discards_per_round
+        }
+        self.max_rounds = max_rounds
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def run(self, num_games, seed=None, chunk_size=None):
+        """
+        并行进行num_games局并汇总结果
+
+        参数:
+            num_games: 对局数
+            seed: 随机种子，决定每局的种子
+            chunk_size: 每个任务包含的对局数，为None时按进程数自动分块
+
+        返回:
+            dict: 见summarize
+        """
+        seed_rng = random.Random(seed)
+        seeds = [seed_rng.getrandbits(64) for _ in range(num_games)]
+        if chunk_size is None:
+            # 每个进程约分到4块，兼顾负载均衡和进程间通信开销
+            chunk_size = max(1, math.ceil(num_games / (self.max_workers * 4)))
+        chunks = [seeds[start:start + chunk_size] for start in range(0, num_games, chunk_size)]
+
+        results = []
+        if self.max_workers == 1:
+            for chunk in chunks:
+                results.extend(_run_chunk(self.policy, self.player_config, self.max_rounds, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(_run_chunk, self.policy, self.player_config, self.max_rounds, chunk) for chunk in chunks]
+                for future in futures:
+                    results.extend(future.result())
+        return self.summarize(results)
+
+    @staticmethod
+    def summarize(results):
+        """
+        汇总对局结果
+
+        参数:
+            results: 每局的(是否获胜, 最终分数, 结束时的回合数)
+
+        返回:
+            dict: 包含
+                games: 对局数
+                wins: 获胜局数
+                win_rate: 胜率及其95% Wilson置信区间 (估计值, 下限, 上限)
+                score_mean: 平均分数及其95%置信区间 (均值, 下限, 上限)
+                score_percentiles: 分数的5/25/50/75/95百分位数
+                score_histogram: 分数直方图，{区间下界: 局数}，区间宽度为50分
+                rounds_to_win: 获胜对局所用回合数的均值及其95%置信区间
+                rounds_to_win_histogram: {回合数: 获胜局数}
+        """
+        games = len(results)
+        wins = sum(1 for won, _, _ in results if won)
+        scores = sorted(score for _, score, _ in results)
+        win_rounds = [rounds for won, _, rounds in results if won]
+
+        win_rate = wins / games if games else 0.0
+        low, high = wilson_interval(wins, games)
+
+        percentiles = {}
+        if scores:
+            for q in (5, 25, 50, 75, 95):
+                percentiles[q] = scores[min(games - 1, int(q / 100 * games))]
+
+        histogram = {}
+        for score in scores:
+            bucket = score // 50 * 50
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+        rounds_histogram = {}
+        for rounds in win_rounds:
+            rounds_histogram[rounds] = rounds_histogram.get(rounds, 0) + 1
+
+        return {
+            'games': games,
+            'wins': wins,
+            'win_rate': (win_rate, low, high),
+            'score_mean': mean_interval(scores),
+            'score_percentiles': percentiles,
+            'score_histogram': dict(sorted(histogram.items())),
+            'rounds_to_win': mean_interval(win_rounds),
+            'rounds_to_win_histogram': dict(sorted(rounds_histogram.items()))
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    print("===== 蒙特卡洛胜率估计 =====")
+    num_games = 4000
+
+    serial = MonteCarloEstimator(RandomPolicy(), max_workers=1)
+    start = time.perf_counter()
+    serial_result = serial.run(num_games, seed=0)
+    serial_time = time.perf_counter() - start
+
+    # 至少2个进程，单核机器上也走进程池
+    parallel = MonteCarloEstimator(RandomPolicy(), max_workers=max(2, os.cpu_count() or 1))
+    start = time.perf_counter()
+    parallel_result = parallel.run(num_games, seed=0)
+    parallel_time = time.perf_counter() - start
+
+    win_rate, low, high = parallel_result['win_rate']
+    mean, mean_low, mean_high = parallel_result['score_mean']
+    print(f"随机策略 {num_games}局: 胜率 {win_rate:.3f} (95% CI {low:.3f}-{high:.3f})，平均分数 {mean:.1f} ({mean_low:.1f}-{mean_high:.1f})")
+    print(f"分数百分位数: {parallel_result['score_percentiles']}")
+    print(f"获胜回合分布: {parallel_result['rounds_to_win_histogram']}")
+    print(f"单进程 {num_games / serial_time:.0f}局/秒，{parallel.max_workers}进程 {num_games / parallel_time:.0f}局/秒，加速 {serial_time / parallel_time:.1f}倍")
+    print(f"结果与进程数无关: {'✓ 通过' if serial_result == parallel_result else '✗ 失败'}")
+
+    greedy = MonteCarloEstimator(GreedyPolicy()).run(500, seed=0)
+    win_rate, low, high = greedy['win_rate']
+    print(f"贪心策略 500局: 胜率 {win_rate:.3f} (95% CI {low:.3f}-{high:.3f})，平均获胜回合 {greedy['rounds_to_win'][0]}")
@@ -1,9 +1,10 @@
-from card.Tarot import apply_tarot
 from card.joker.joker import joker
+from card.joker.apply_joker import JokerList, compile_jokers, OP_ADD_CHIPS, OP_ADD_MULT
 from card.Tarot.tarot_card import TarotCard
 from card.poker.poker_card import PokerCard
-from card.Tarot.apply_tarot import apply_tarrot
+from card.Tarot.apply_tarot import apply_tarot, apply_tarrot
 from utils.texas_poker_hand_ranking import TexasPokerHandRanking
+from utils.score_cache import ScoreCache
 import math
 
 
@@ -13,7 +14,7 @@ class Player:
     """
     玩家类，包含游戏中玩家的所有属性和操作方法
     """
-    def __init__(self, initial_funds=4, target_score=200, hand_limit=8, plays_per_round=4, discards_per_round=3):
+    def __init__(self, initial_funds=4, target_score=200, hand_limit=8, plays_per_round=4, discards_per_round=3, score_cache_size=0, verbose=True):
         """
         初始化玩家对象
         
@@ -23,7 +24,10 @@ class Player:
             hand_limit (int): 手牌上限，默认为8
             plays_per_round (int): 每回合出牌次数，默认为4
             discards_per_round (int): 每回合弃牌次数，默认为3
+            score_cache_size (int): 计分缓存容量，默认为0即不使用缓存；计分本身已很快，只有计分较重时才值得开启
+            verbose (bool): 是否打印操作信息，默认为True；无界面批量模拟时设为False
         """
+        self.verbose = verbose  # 是否打印操作信息
         self.hand = []  # 手牌
         self.poker_hand_rank = TexasPokerHandRanking()
         self.deck = []  # 牌组中的牌
@@ -31,6 +35,7 @@ class Player:
         self.discard_count = 0  # 弃牌次数
         self.jokers = []  # 当前拥有的小丑牌
         self.tarot_cards = []  # 当前拥有的塔罗牌
+        self.initial_funds = initial_funds  # 初始资金
         self.funds = initial_funds  # 当前的资金
         self.score = 0  # 当前的分数
         self.target_score = target_score  # 目标分数
@@ -41,37 +46,68 @@ class Player:
         self.discards_per_round = discards_per_round  # 每回合弃牌次数
         self.current_plays = 0  # 当前回合已出牌次数
         self.current_discards = 0  # 当前回合已弃牌次数
+        self.score_cache = ScoreCache(score_cache_size) if score_cache_size > 0 else None  # 计分缓存
     
-    def play_card(self, card_index=None):
+    @property
+    def jokers(self):
+        """当前拥有的小丑牌，JokerList在修改后重新编译计分流水线"""
+        return self._jokers
+
+    @jokers.setter
+    def jokers(self, jokers):
+        self._jokers = jokers if isinstance(jokers, JokerList) else JokerList(jokers)
+
+    def reset(self):
+        """
+        重置为一局新游戏开始时的状态：清空手牌、小丑牌和塔罗牌，恢复初始资金，清零分数和计数
+        """
+        self.hand.clear()
+        self.deck = []
+        self.play_count = 0
+        self.discard_count = 0
+        self.jokers = []
+        self.tarot_cards = []
+        self.funds = self.initial_funds
+        self.score = 0
+        self.current_plays = 0
+        self.current_discards = 0
+
+    def play_card(self, card_index=None, breakdown=None):
         """
         出一次牌
         
         参数:
             card_index (list): 要出的牌在手中的索引列表
+            breakdown (ScoreBreakdown, optional): 传入时记录这次出牌的计分明细，见compute_score
         
         返回:
             bool: 是否成功出牌
         """
         if not self.hand:
-            print("手牌为空，无法出牌")
+            if self.verbose:
+                print("手牌为空，无法出牌")
             return False
             
         if self.current_plays >= self.plays_per_round:
-            print(f"本回合出牌次数已用完 ({self.current_plays}/{self.plays_per_round})")
+            if self.verbose:
+                print(f"本回合出牌次数已用完 ({self.current_plays}/{self.plays_per_round})")
             return False
             
         if card_index is None or len(card_index) == 0:
-            print("请选择要出的牌")
+            if self.verbose:
+                print("请选择要出的牌")
             return False
             
         if len(card_index) > 5:
-            print("最多只能出牌5张")
+            if self.verbose:
+                print("最多只能出牌5张")
             return False
         
         # 验证索引有效性
         for index in card_index:
             if index < 0 or index >= len(self.hand):
-                print(f"无效的牌索引: {index}")
+                if self.verbose:
+                    print(f"无效的牌索引: {index}")
                 return False
         
         # 出牌
@@ -80,12 +116,14 @@ class Player:
             card = self.hand.pop(index)
             played_cards.append(card)
         
-        print(f"打出了牌: {', '.join([str(card) for card in played_cards])}")
+        if self.verbose:
+            print(f"打出了牌: {', '.join([str(card) for card in played_cards])}")
         
         # 计算分数
-        score = self.compute_score(played_cards, self.poker_hand_rank, self.jokers)
+        score = self.compute_score(played_cards, self.poker_hand_rank, self.jokers, breakdown)
         self.score += score
-        print(f"本次出牌得分: {score}, 总分: {self.score}/{self.target_score}")
+        if self.verbose:
+            print(f"本次出牌得分: {score}, 总分: {self.score}/{self.target_score}")
         
         # 更新当前回合出牌次数
         self.current_plays += 1
@@ -103,25 +141,30 @@ class Player:
             int: 弃掉的牌数量，如果无法弃牌则返回0
         """
         if not self.hand:
-            print("手牌为空，无法弃牌")
+            if self.verbose:
+                print("手牌为空，无法弃牌")
             return 0
             
         if self.current_discards >= self.discards_per_round:
-            print(f"本回合弃牌次数已用完 ({self.current_discards}/{self.discards_per_round})")
+            if self.verbose:
+                print(f"本回合弃牌次数已用完 ({self.current_discards}/{self.discards_per_round})")
             return 0
             
         if card_index is None or len(card_index) == 0:
-            print("请选择要弃的牌")
+            if self.verbose:
+                print("请选择要弃的牌")
             return 0
             
         if len(card_index) > 5:
-            print("最多只能弃牌5张")
+            if self.verbose:
+                print("最多只能弃牌5张")
             return 0
         
         # 验证索引有效性
         for index in card_index:
             if index < 0 or index >= len(self.hand):
-                print(f"无效的牌索引: {index}")
+                if self.verbose:
+                    print(f"无效的牌索引: {index}")
                 return 0
         
         # 弃牌
@@ -132,7 +175,10 @@ class Player:
         
         self.current_discards += 1
         self.discard_count += 1
-        print(f"弃掉了牌: {', '.join([str(card) for card in discarded_cards])}")
+        # 小丑牌的弃牌效果
+        self.funds += self.jokers.pipeline.discard_funds
+        if self.verbose:
+            print(f"弃掉了牌: {', '.join([str(card) for card in discarded_cards])}")
         return len(discarded_cards)
     
     def use_tarot_card(self, tarot_index=None,card_index=None):
@@ -140,27 +186,31 @@ class Player:
         使用tarot牌
         
         参数:
-            tarot_index (int, optional): 要使用的塔罗牌索引，如果为None则使用第一张
+            tarot_index (int): 要使用的塔罗牌索引
+            card_index (list[int], optional): 目标手牌索引列表，不需要目标牌的塔罗牌可以为None
         
         返回:
-            bool: 是否成功使用塔罗牌
+            bool: 是否成功使用塔罗牌；目标牌不符合塔罗牌要求时不使用，塔罗牌保留
         """
         if not self.tarot_cards:
-            print("没有塔罗牌可以使用")
+            if self.verbose:
+                print("没有塔罗牌可以使用")
             return False
         
         if tarot_index is None or tarot_index < 0 or tarot_index >= len(self.tarot_cards):
-            return False # 默认使用第一张塔罗牌
-        else:
-            tarot_card = self.tarot_cards.pop(tarot_index)
-        
-        apply_tarot(tarot_card, self.hand[card_index])
-        # 根据塔罗牌类型执行相应效果
-        print(f"使用了塔罗牌: {tarot_card.tarot_type} - {tarot_card.description}")
-        
-        # 根据塔罗牌类型执行不同效果
+            return False
+        tarot_card = self.tarot_cards[tarot_index]
         
-            
+        # 目标牌原地修改，资金的变化由delta给出
+        delta = apply_tarot(tarot_card, self.hand, card_index, self.funds)
+        if delta is None:
+            if self.verbose:
+                print(f"塔罗牌 {tarot_card.tarot_type} 不能用于所选的牌")
+            return False
+        self.tarot_cards.pop(tarot_index)
+        self.funds += delta.funds
+        if self.verbose:
+            print(f"使用了塔罗牌: {tarot_card.tarot_type} - {tarot_card.description}")
         return True
     
     def new_round(self):
@@ -169,7 +219,8 @@ class Player:
         """
         self.current_plays = 0
         self.current_discards = 0
-        print(f"新回合开始！出牌次数: {self.plays_per_round}, 弃牌次数: {self.discards_per_round}")
+        if self.verbose:
+            print(f"新回合开始！出牌次数: {self.plays_per_round}, 弃牌次数: {self.discards_per_round}")
     
     def can_play(self):
         """
@@ -210,7 +261,8 @@ class Player:
             self.hand.extend(card)
         else:
             self.hand.append(card)
-        print(f"获得了新牌: {card}")
+        if self.verbose:
+            print(f"获得了新牌: {card}")
         
     
     def buy_joker(self, joker_card):
@@ -221,15 +273,19 @@ class Player:
             joker_card (joker): 要购买的小丑牌
         """
         if isinstance(joker_card, joker):
-            if self.funds >= joker_card.get_price():
+            price = self.jokers.pipeline.price(joker_card.get_price())
+            if self.funds >= price:
                 self.jokers.append(joker_card)
-                self.funds -= joker_card.get_price()
-                print(f"获得了新小丑牌: {joker_card.name}")
+                self.funds -= price
+                if self.verbose:
+                    print(f"获得了新小丑牌: {joker_card.name}")
             else:
-                print("资金不足，无法购买小丑牌")
+                if self.verbose:
+                    print("资金不足，无法购买小丑牌")
                 return False
         else:
-            print("只能添加joker类型的牌")
+            if self.verbose:
+                print("只能添加joker类型的牌")
             return False
         return True
     def sell_joker(self, joker_card):
@@ -243,11 +299,14 @@ class Player:
             if joker_card in self.jokers:
                 self.jokers.remove(joker_card)
                 self.funds += math.floor(joker_card.get_price() * 0.7)
-                print(f"出售了小丑牌: {joker_card.name}")
+                if self.verbose:
+                    print(f"出售了小丑牌: {joker_card.name}")
             else:
-                print("你没有这张小丑牌")
+                if self.verbose:
+                    print("你没有这张小丑牌")
         else:
-            print("只能出售joker类型的牌")
+            if self.verbose:
+                print("只能出售joker类型的牌")
     
     def buy_tarot_card(self, tarot_card):
         """
@@ -257,16 +316,20 @@ class Player:
             tarot_card (TarotCard): 要添加的塔罗牌
         """
         if isinstance(tarot_card, TarotCard):
-            if self.funds >= tarot_card.get_price():
+            price = self.jokers.pipeline.price(tarot_card.get_price())
+            if self.funds >= price:
                 self.tarot_cards.append(tarot_card)
-                self.funds -= tarot_card.get_price()
-                print(f"获得了新塔罗牌: {tarot_card.tarot_type}-{tarot_card.description}")
+                self.funds -= price
+                if self.verbose:
+                    print(f"获得了新塔罗牌: {tarot_card.tarot_type}-{tarot_card.description}")
 
             else:
-                print("资金不足，无法购买塔罗牌")
+                if self.verbose:
+                    print("资金不足，无法购买塔罗牌")
                 return False
         else:
-            print("只能添加TarotCard类型的牌")
+            if self.verbose:
+                print("只能添加TarotCard类型的牌")
             return False
         return True
     def sell_tarot(self, tarot_card):
@@ -281,11 +344,14 @@ class Player:
                 self.tarot_cards.remove(tarot_card)
                 
                 self.funds += math.floor(tarot_card.get_price() * 0.7)
-                print(f"出售了塔罗牌: {tarot_card.tarot_type}-{tarot_card.description}")
+                if self.verbose:
+                    print(f"出售了塔罗牌: {tarot_card.tarot_type}-{tarot_card.description}")
             else:
-                print("你没有这张小塔罗牌")
+                if self.verbose:
+                    print("你没有这张小塔罗牌")
         else:
-            print("只能出售TarotCard类型的牌")
+            if self.verbose:
+                print("只能出售TarotCard类型的牌")
     
     def get_status(self):
         """
@@ -321,7 +387,7 @@ class Player:
             hand (list[PokerCard]): 玩家的手牌
         """
         apply_tarrot(tarot_card,hand)
-    def compute_score(self, hand, hand_rank: TexasPokerHandRanking, jokers):
+    def compute_score(self, hand, hand_rank: TexasPokerHandRanking, jokers, breakdown=None):
         """
         计算手牌的分数
         
@@ -329,41 +395,276 @@ class Player:
             hand: 手牌列表
             hand_rank: 牌型判断器
             jokers: 小丑牌列表
+            breakdown: 预先创建的utils.score_breakdown.ScoreBreakdown，传入时原地记录计分明细（不经过计分缓存）；
+                默认为None，计分路径与不记录明细时完全相同
         
         返回:
             int: 计算得到的分数
         """
+        if breakdown is not None:
+            return self._score_hand_breakdown(hand, hand_rank, jokers, breakdown)
         if not hand:
             return 0
-        
+
+        # 先查计分缓存，未命中时再计算并写入
+        cache = self.score_cache
+        if cache is not None:
+            key = cache.make_key(hand, hand_rank, jokers)
+            score = cache.get(key, hand_rank)
+            if score is not None:
+                return score
+
+        hand_type, final_score = self._score_hand(hand, hand_rank, jokers)
+        if cache is not None:
+            cache.put(key, hand_type, final_score, hand_rank)
+        return final_score
+
+    def _score_hand(self, hand, hand_rank, jokers):
+        """
+        不经过缓存计算一组非空出牌的分数
+
+        小丑牌效果按编译后的流水线执行：每张牌计分后依次执行per_card效果，
+        所有牌计分后依次执行per_hand效果。
+
+        返回:
+            tuple: (牌型, 分数)
+        """
         # 获取牌型基础分数和倍率
-        hand_type = hand_rank.get_hand_type(hand)
+        hand_type = hand_rank.get_hand_type_fast(hand)
         base_point, base_multiplier = hand_rank.get_points(hand_type)
+        pipeline = compile_jokers(jokers)
+        card_ops = pipeline.card_ops
         
         total_point = base_point
         total_multiplier = base_multiplier
         
         # 计算每张牌的点数和效果
         for card in hand:
-            card_value = card.get_numeric_value()
-            total_point += card_value
+            total_point += card.chips
             
             # 处理牌的特殊效果
+            # 塔罗牌写入的效果是字符串，也兼容带name属性的效果对象
             if card.has_effect():
-                if hasattr(card.effect, 'name'):
-                    if card.effect.name == 'MULTIPLIER_TIMES_1_5':
-                        total_multiplier *= 1.5
-                    elif card.effect.name == 'MULTIPLIER_PLUS_4':
-                        total_multiplier += 4
-                    elif card.effect.name == 'POINT_PLUS_30':
-                        total_point += 30
-        
-        # TODO: 应用小丑牌效果（需要实现apply_joker函数）
-        # for joker_card in jokers:
-        #     total_point, total_multiplier = apply_joker(joker_card, total_point, total_multiplier)
+                effect = getattr(card.effect, 'name', card.effect)
+                if effect == 'MULTIPLIER_TIMES_1_5':
+                    total_multiplier *= 1.5
+                elif effect == 'MULTIPLIER_PLUS_4':
+                    total_multiplier += 4
+                elif effect == 'POINT_PLUS_30':
+                    total_point += 30
+            
+            # 小丑牌对每张计分牌的效果
+            for op, value, suits, values in card_ops:
+                if (suits is None or card.suit_code in suits) and (values is None or card.rank in values):
+                    if op == OP_ADD_CHIPS:
+                        total_point += value
+                    elif op == OP_ADD_MULT:
+                        total_multiplier += value
+                    else:
+                        total_multiplier *= value
+        
+        # 小丑牌对整手牌的效果
+        for op, value, hand_types in pipeline.hand_ops:
+            if hand_types is None or hand_type in hand_types:
+                if op == OP_ADD_CHIPS:
+                    total_point += value
+                elif op == OP_ADD_MULT:
+                    total_multiplier += value
+                else:
+                    total_multiplier *= value
         
         final_score = int(total_point * total_multiplier)
-        return final_score 
+        return hand_type, final_score
+
+    def _score_hand_breakdown(self, hand, hand_rank, jokers, breakdown):
+        """
+        与_score_hand相同的计分过程，同时把每一步的贡献写入breakdown
+
+        返回:
+            int: 分数
+        """
+        pipeline = compile_jokers(jokers)
+        breakdown.reset(len(hand), len(jokers))
+        if not hand:
+            return 0
+        hand_type = hand_rank.get_hand_type_fast(hand)
+        base_point, base_multiplier = hand_rank.get_points(hand_type)
+        breakdown.hand_type = hand_type
+        breakdown.base_points = base_point
+        breakdown.base_multiplier = base_multiplier
+        card_codes = breakdown.card_codes
+        card_chips = breakdown.card_chips
+        effect_points = breakdown.effect_points
+        effect_multipliers = breakdown.effect_multipliers
+        joker_points = breakdown.joker_points
+        joker_multipliers = breakdown.joker_multipliers
+        card_ops = pipeline.card_ops
+        card_owners = pipeline.card_owners
+
+        total_point = base_point
+        total_multiplier = base_multiplier
+        for position, card in enumerate(hand):
+            total_point += card.chips
+            card_codes[position] = card.code
+            card_chips[position] = card.chips
+
+            point_before = total_point
+            multiplier_before = total_multiplier
+            if card.has_effect():
+                effect = getattr(card.effect, 'name', card.effect)
+                if effect == 'MULTIPLIER_TIMES_1_5':
+                    total_multiplier *= 1.5
+                elif effect == 'MULTIPLIER_PLUS_4':
+                    total_multiplier += 4
+                elif effect == 'POINT_PLUS_30':
+                    total_point += 30
+            effect_points[position] = total_point - point_before
+            effect_multipliers[position] = total_multiplier - multiplier_before
+
+            for op_index in range(len(card_ops)):
+                op, value, suits, values = card_ops[op_index]
+                if (suits is None or card.suit_code in suits) and (values is None or card.rank in values):
+                    owner = card_owners[op_index]
+                    if op == OP_ADD_CHIPS:
+                        total_point += value
+                        joker_points[owner] += value
+                    elif op == OP_ADD_MULT:
+                        total_multiplier += value
+                        joker_multipliers[owner] += value
+                    else:
+                        joker_multipliers[owner] += total_multiplier * (value - 1)
+                        total_multiplier *= value
+
+        hand_ops = pipeline.hand_ops
+        hand_owners = pipeline.hand_owners
+        for op_index in range(len(hand_ops)):
+            op, value, hand_types = hand_ops[op_index]
+            if hand_types is None or hand_type in hand_types:
+                owner = hand_owners[op_index]
+                if op == OP_ADD_CHIPS:
+                    total_point += value
+                    joker_points[owner] += value
+                elif op == OP_ADD_MULT:
+                    total_multiplier += value
+                    joker_multipliers[owner] += value
+                else:
+                    joker_multipliers[owner] += total_multiplier * (value - 1)
+                    total_multiplier *= value
+
+        final_score = int(total_point * total_multiplier)
+        breakdown.points = total_point
+        breakdown.multiplier = total_multiplier
+        breakdown.score = final_score
+        return final_score
+
+    def best_play(self, hand, jokers):
+        """
+        在手牌的所有1-5张子集中搜索得分最高的出牌
+
+        深度优先枚举子集，子集的点数签名、筹码和效果计数由父子集增量得到；
+        先用查表牌型和效果上界给每个子集估计分数上界，再按上界从高到低只对
+        可能超过当前最优的子集调用compute_score。小丑牌的效果计入上界；
+        流水线含有会减少分数的效果时上界不成立，此时对所有子集求精确分数。
+
+        参数:
+            hand: 手牌列表
+            jokers: 小丑牌列表
+
+        返回:
+            tuple: (出牌索引列表, 分数)，手牌为空时返回([], 0)
+        """
+        # 出牌数量受play_card的5张限制和手牌上限约束
+        max_cards = min(5, self.hand_limit, len(hand))
+        if max_cards <= 0:
+            return [], 0
+
+        hand_rank = self.poker_hand_rank
+        table = TexasPokerHandRanking._hand_type_table
+        if table is None:
+            table = TexasPokerHandRanking._build_hand_type_table()
+        pipeline = compile_jokers(jokers)
+        # 每种牌型的基础点数和倍率加上小丑牌per_hand效果：(点数, 倍率, 乘倍率)
+        rank_points = {}
+        for hand_type in TexasPokerHandRanking.HAND_TYPES:
+            points, multiplier = hand_rank.get_points(hand_type)
+            hand_chips, hand_plus, hand_times = pipeline.hand_bonus(hand_type)
+            rank_points[hand_type] = (points + hand_chips, multiplier + hand_plus, hand_times)
+
+        # 每张牌只解析一次：质数签名、筹码（含加点效果）、加倍率和乘倍率（含小丑牌per_card效果）
+        primes = []
+        chips = []
+        plus_values = []
+        times_values = []
+        suits = []
+        for card in hand:
+            effect = getattr(card.effect, 'name', card.effect)
+            card_chips, card_plus, card_times = pipeline.card_bonus(card)
+            primes.append(card.prime)
+            chips.append(card.chips + (30 if effect == 'POINT_PLUS_30' else 0) + card_chips)
+            plus_values.append((4 if effect == 'MULTIPLIER_PLUS_4' else 0) + card_plus)
+            times_values.append((1.5 if effect == 'MULTIPLIER_TIMES_1_5' else 1) * card_times)
+            suits.append(card.suit_code)
+
+        candidates = []
+        card_count = len(hand)
+
+        def search(start, indices, key, chip_sum, plus, times, suit):
+            for i in range(start, card_count):
+                indices.append(i)
+                sub_key = key * primes[i]
+                sub_chips = chip_sum + chips[i]
+                sub_plus = plus + plus_values[i]
+                sub_times = times * times_values[i]
+                if len(indices) == 1:
+                    sub_suit = suits[i]
+                else:
+                    sub_suit = suit if suits[i] == suit else None
+
+                flush = 1 if len(indices) == 5 and sub_suit is not None else 0
+                points, multiplier, hand_times = rank_points[table[(sub_key << 1) | flush]]
+                # 加倍率全部先于乘倍率时倍率最大，作为分数上界
+                bound = (points + sub_chips) * (multiplier + sub_plus) * sub_times * hand_times
+                candidates.append((bound, tuple(indices)))
+
+                if len(indices) < max_cards:
+                    search(i + 1, indices, sub_key, sub_chips, sub_plus, sub_times, sub_suit)
+                indices.pop()
+
+        search(0, [], 1, 0, 0, 1, None)
+        prune = pipeline.monotone
+
+        # 按上界从高到低求精确分数，上界不超过当前最优时即可停止
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        best_indices = []
+        best_score = -1
+        for bound, indices in candidates:
+            # 留出浮点误差的余量，避免错误剪枝
+            if prune and int(bound * (1 + 1e-9)) <= best_score:
+                break
+            # 与play_card一致，按索引从大到小的顺序计分
+            played_cards = [hand[i] for i in reversed(indices)]
+            score = self.compute_score(played_cards, hand_rank, jokers)
+            if score > best_score:
+                best_indices = list(indices)
+                best_score = score
+
+        return best_indices, best_score
+
+    def compute_score_batch(self, cards, hand_rank: TexasPokerHandRanking, jokers):
+        """
+        批量计算多组出牌的分数，结果与compute_score逐个计算一致
+
+        参数:
+            cards: 形状为(N, 5)的整数编码数组，空位为PAD_CARD，可用utils.batch_scoring.encode_hands生成
+            hand_rank: 牌型判断器
+            jokers: 小丑牌列表
+
+        返回:
+            dict: 牌型编码、基础点数、基础倍率、总点数、总倍率和最终分数的numpy数组
+        """
+        # numpy只在批量计算时需要，延迟导入
+        from utils.batch_scoring import batch_compute_score
+        return batch_compute_score(cards, hand_rank, jokers)
     
     
 
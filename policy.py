@@ -0,0 +1,257 @@
+import random
+from itertools import combinations
+
+from engine import Action
+from game_state import GameState
+
+
+class Policy:
+    """
+    策略接口：接收结构化的游戏状态（GameState），返回Action
+
+    子类实现act；需要一次为多局做决策（如批量模型推理）时重写act_batch，
+    默认逐个调用act。策略对象也可以直接作为接收引擎的函数使用
+    （GameEngine.run、MonteCarloEstimator），此时先把引擎转为GameState。
+    """
+    interactive = False  # 是否由人通过命令行输入决策
+
+    def act(self, state):
+        """
+        为一个状态选择行动
+
+        参数:
+            state: 未结束的GameState
+
+        返回:
+            Action: 选择的行动
+        """
+        raise NotImplementedError
+
+    def act_batch(self, states):
+        """
+        为多个状态选择行动
+
+        参数:
+            states: GameState列表
+
+        返回:
+            list: 与states一一对应的Action
+        """
+        return [self.act(state) for state in states]
+
+    def __call__(self, engine):
+        return self.act(GameState.from_engine(engine))
+
+
+class HumanPolicy(Policy):
+    """
+    从命令行读取玩家的选择，字符串解析只在这里进行
+    """
+    interactive = True
+
+    def __init__(self, input_fn=input, output_fn=print):
+        """
+        参数:
+            input_fn: 读取一行输入的函数，默认为input
+            output_fn: 输出提示的函数，默认为print
+        """
+        self.input = input_fn
+        self.output = output_fn
+
+    def act(self, state):
+        """反复读取输入，直到得到一个格式正确的行动"""
+        while True:
+            choice = self.read_choice(state)
+            try:
+                if choice == "play":
+                    if not state.can_play():
+                        self.output("无法出牌")
+                        continue
+                    self.output("请选择要出的牌（输入索引，用空格分隔，最多5张）:")
+                    indices = self.read_indices()
+                    if indices is not None:
+                        return Action.play(indices)
+                elif choice == "discard":
+                    if not state.can_discard():
+                        self.output("无法弃牌")
+                        continue
+                    self.output("请选择要弃的牌（输入索引，用空格分隔，最多5张）:")
+                    indices = self.read_indices()
+                    if indices is not None:
+                        return Action.discard(indices)
+                elif choice == "tarot":
+                    if not state.tarot_cards:
+                        self.output("没有塔罗牌可以使用")
+                        continue
+                    self.output("请选择要使用的塔罗牌索引:")
+                    tarot_index = int(self.input("塔罗牌索引: ").strip())
+                    # 根据塔罗牌类型，可能需要选择目标牌
+                    self.output("请选择目标牌索引（用空格分隔，如果不需要可直接回车）:")
+                    card_input = self.input("目标牌索引: ").strip()
+                    card_indices = [int(x) for x in card_input.split()] if card_input else None
+                    return Action.use_tarot(tarot_index, card_indices)
+                else:
+                    self.output("无效的选择，请重新输入")
+            except ValueError:
+                self.output("输入格式错误，请输入数字")
+
+    def read_choice(self, state):
+        """列出可选的行动并读取选择"""
+        self.output("\n请选择行动:")
+        actions = []
+        if state.can_play():
+            actions.append("play - 出牌")
+        if state.can_discard():
+            actions.append("discard - 弃牌")
+        if state.tarot_cards:
+            actions.append("tarot - 使用塔罗牌")
+        for action in actions:
+            self.output(f"  {action}")
+        return self.input("请输入选择: ").strip().lower()
+
+    def read_indices(self):
+        """读取用空格分隔的索引，未输入时返回None"""
+        indices_input = self.input("牌索引: ").strip()
+        if not indices_input:
+            self.output("未选择任何牌")
+            return None
+        return [int(x) for x in indices_input.split()]
+
+
+class RandomPolicy(Policy):
+    """
+    随机策略：随机选1-5张牌，能弃牌时以discard_probability的概率弃牌，否则出牌
+    """
+    def __init__(self, seed=None, discard_probability=0.0):
+        """
+        参数:
+            seed: 随机种子，为None时使用random模块的全局随机数（便于MonteCarloEstimator按局设置种子）
+            discard_probability: 能弃牌时选择弃牌的概率
+        """
+        # 不保存random模块本身，否则对象不能被pickle传给工作进程
+        self.rng = None if seed is None else random.Random(seed)
+        self.discard_probability = discard_probability
+
+    def act(self, state):
+        rng = self.rng or random
+        hand_size = len(state.hand)
+        indices = rng.sample(range(hand_size), rng.randint(1, min(5, hand_size)))
+        if state.can_play() and not (state.can_discard() and rng.random() < self.discard_probability):
+            return Action.play(indices)
+        return Action.discard(indices)
+
+
+class GreedyPolicy(Policy):
+    """
+    贪心策略：打出当前手牌中得分最高的组合
+
+    act用Player.best_play剪枝搜索；act_batch把所有状态的全部出牌组合
+    一次交给batch_compute_score计分，适合同时推进大量对局。
+    """
+    def __init__(self):
+        self._subsets = {}  # 手牌张数 -> 所有1-5张组合的索引数组（按计分顺序，空位为-1）
+
+    def act(self, state):
+        indices, _ = state.config.scorer.best_play(state.hand_cards(), state.jokers)
+        return Action.play(indices)
+
+    def _subset_indices(self, hand_size):
+        """
+        手牌张数为hand_size时所有1-5张组合的索引
+
+        返回:
+            tuple: (索引数组(M, 5)，空位为-1，每行按索引从大到小排列与play_card计分顺序一致；
+                    每行按索引从小到大的列表)
+        """
+        cached = self._subsets.get(hand_size)
+        if cached is None:
+            import numpy as np
+            subsets = [indices for size in range(1, min(5, hand_size) + 1) for indices in combinations(range(hand_size), size)]
+            array = np.full((len(subsets), 5), -1, dtype=np.int64)
+            for row, indices in enumerate(subsets):
+                array[row, :len(indices)] = indices[::-1]
+            cached = self._subsets[hand_size] = (array, subsets)
+        return cached
+
+    def act_batch(self, states):
+        """
+        为多个状态一次计分所有出牌组合
+
+        共享同一计分表和小丑牌的状态合并为一次batch_compute_score调用；
+        没有手牌的状态不能出牌，抛出ValueError
+        """
+        import numpy as np
+        from utils.batch_scoring import PAD_CARD, batch_compute_score
+
+        actions = [None] * len(states)
+        groups = {}
+        for position, state in enumerate(states):
+            if not state.hand:
+                raise ValueError(f"第{position}个状态没有手牌，无法出牌")
+            key = (id(state.config.hand_rank), state.jokers)
+            groups.setdefault(key, []).append(position)
+
+        for positions in groups.values():
+            first = states[positions[0]]
+            blocks = []
+            owners = []
+            for position in positions:
+                hand = states[position].hand
+                index_array, _ = self._subset_indices(len(hand))
+                codes = np.append(np.asarray(hand, dtype=np.int64), PAD_CARD)
+                blocks.append(codes[index_array])  # 索引-1取到末尾的空位
+                owners.append((position, len(index_array)))
+            scores = batch_compute_score(np.concatenate(blocks), first.config.hand_rank, list(first.jokers))['scores']
+
+            start = 0
+            for position, count in owners:
+                best = int(np.argmax(scores[start:start + count]))
+                _, subsets = self._subset_indices(len(states[position].hand))
+                actions[position] = Action.play(list(subsets[best]))
+                start += count
+        return actions
+
+
+if __name__ == "__main__":
+    import time
+    from engine import GameEngine
+    from mcts import MCTSPlanner
+    from monte_carlo import MonteCarloEstimator
+
+    print("===== 策略接口测试 =====")
+    engines = [GameEngine(seed=seed) for seed in range(300)]
+    for engine in engines:
+        engine.start()
+    states = [GameState.from_engine(engine) for engine in engines]
+    greedy = GreedyPolicy()
+    greedy.act_batch(states[:1])  # 预热：构建牌型表和组合索引
+
+    start = time.perf_counter()
+    single = [greedy.act(state) for state in states]
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = greedy.act_batch(states)
+    batch_time = time.perf_counter() - start
+    same_score = all(state.play(a.card_indices).score == state.play(b.card_indices).score for state, a, b in zip(states, single, batch))
+    print(f"贪心 {len(states)}个状态: 逐个 {single_time * 1e3:.1f}毫秒，批量 {batch_time * 1e3:.1f}毫秒；得分一致: {'✓ 通过' if same_score else '✗ 失败'}")
+
+    # 同时推进多局：每步对所有未结束的对局批量决策
+    start = time.perf_counter()
+    running = [GameEngine(seed=seed) for seed in range(300)]
+    for engine in running:
+        engine.start()
+    while running:
+        actions = greedy.act_batch([GameState.from_engine(engine) for engine in running])
+        for engine, action in zip(running, actions):
+            engine.step(action)
+        running = [engine for engine in running if not engine.game_over]
+    print(f"批量推进300局贪心对局用时 {time.perf_counter() - start:.2f}秒")
+
+    scripted = iter(["jump", "play", "0 x", "play", "0 1"])
+    human = HumanPolicy(input_fn=lambda prompt: next(scripted), output_fn=lambda *args: None)
+    action = human.act(states[0])
+    print(f"命令行输入解析: {'✓ 通过' if action.kind == Action.PLAY and action.card_indices == [0, 1] else '✗ 失败'}")
+
+    for name, policy in (('随机', RandomPolicy()), ('贪心', GreedyPolicy()), ('MCTS', MCTSPlanner(iterations=50, seed=0))):
+        result = MonteCarloEstimator(policy, max_workers=1, target_score=600, max_rounds=3).run(30, seed=0)
+        print(f"  {name}策略: 胜率 {result['win_rate'][0]:.2f}，平均分数 {result['score_mean'][0]:.0f}")
@@ -0,0 +1,436 @@
+"""
+基于asyncio的多会话游戏主机，一个事件循环同时运行大量对局
+
+每个会话有自己的GameEngine和一对有界队列：客户端把行动放入输入队列，会话逐个执行并把结果放入输出队列。
+队列满时放入方等待（背压），等待行动或等待客户端取走结果超过action_timeout、或整局超过session_timeout时会话结束。
+结束消息不受背压限制：输出队列满时丢弃未读的消息，保证会话总能结束并释放名额。
+客户端可以是进程内的SessionClient，也可以通过serve()用TCP连接，每行一个JSON消息。
+"""
+import asyncio
+import json
+
+from engine import Action, GameEngine
+
+# 会话结束的原因
+END_FINISHED = 'finished'  # 游戏正常结束
+END_CLOSED = 'closed'  # 客户端关闭
+END_ACTION_TIMEOUT = 'action_timeout'  # 等待行动超时
+END_SESSION_TIMEOUT = 'session_timeout'  # 整局超时
+
+# 行动执行前的检查，与GameController.handle_*中的检查和提示一致
+_PRECHECKS = {
+    Action.PLAY: (GameEngine.can_play, "无法出牌"),
+    Action.DISCARD: (GameEngine.can_discard, "无法弃牌"),
+    Action.TAROT: (GameEngine.can_use_tarot, "没有塔罗牌可以使用")
+}
+
+
+def action_from_message(message):
+    """
+    把客户端消息转为Action
+
+    参数:
+        message: Action对象，或{'kind': ..., 'card_indices': [...], 'index': ...}形式的字典
+
+    返回:
+        Action: 行动对象，消息格式错误时抛出ValueError
+    """
+    if isinstance(message, Action):
+        return message
+    if not isinstance(message, dict) or 'kind' not in message:
+        raise ValueError('消息必须包含kind字段')
+    return Action(message['kind'], message.get('card_indices'), message.get('index'))
+
+
+def game_state(engine):
+    """
+    会话发给客户端的状态
+
+    返回:
+        dict: 可以直接序列化为JSON的状态
+    """
+    player = engine.player
+    return {
+        'round': min(engine.current_round, engine.max_rounds),
+        'score': player.score,
+        'target_score': player.target_score,
+        'funds': player.funds,
+        'plays_left': player.plays_per_round - player.current_plays,
+        'discards_left': player.discards_per_round - player.current_discards,
+        'hand': [str(card) for card in player.hand],
+        'hand_codes': [card.code for card in player.hand],
+        'tarot_cards': [str(tarot) for tarot in player.tarot_cards],
+        'game_over': engine.game_over,
+        'won': player.has_won()
+    }
+
+
+class GameSession:
+    """
+    一个对局会话：从输入队列取行动，按GameEngine的规则执行，把结果放入输出队列
+    """
+    def __init__(self, session_id, engine, queue_size, action_timeout, session_timeout):
+        """
+        参数:
+            session_id: 会话编号
+            engine: 该会话的游戏引擎
+            queue_size: 输入和输出队列的容量
+            action_timeout: 等待下一个行动的秒数，为None时不限
+            session_timeout: 整局的秒数，为None时不限
+        """
+        self.session_id = session_id
+        self.engine = engine
+        self.inbox = asyncio.Queue(maxsize=queue_size)
+        self.outbox = asyncio.Queue(maxsize=queue_size)
+        self.action_timeout = action_timeout
+        self.session_timeout = session_timeout
+        self.end_reason = None
+        self.actions = 0  # 已处理的行动数
+        self.task = None
+
+    def apply(self, message):
+        """
+        执行一条消息，与GameController处理一次输入的规则相同
+
+        返回:
+            dict: {'type': 'result', 'success', 'message', 'state'}
+        """
+        try:
+            action = action_from_message(message)
+        except (ValueError, TypeError) as e:
+            return {'type': 'result', 'success': False, 'message': f"输入格式错误: {e}", 'state': game_state(self.engine)}
+
+        precheck = _PRECHECKS.get(action.kind)
+        if precheck is not None and not precheck[0](self.engine):
+            return {'type': 'result', 'success': False, 'message': precheck[1], 'state': game_state(self.engine)}
+        try:
+            success = self.engine.step(action)
+            text = "" if success else "行动无效"
+        except Exception as e:
+            success = False
+            text = f"行动失败: {e}"
+        self.actions += 1
+        return {'type': 'result', 'success': success, 'message': text, 'state': game_state(self.engine)}
+
+    async def run(self):
+        """会话主循环，结束时放入{'type': 'end'}消息"""
+        try:
+            if self.session_timeout is None:
+                await self._loop()
+            else:
+                await asyncio.wait_for(self._loop(), self.session_timeout)
+        except asyncio.TimeoutError:
+            self.end_reason = END_SESSION_TIMEOUT
+        self._put_end()
+
+    def _put_end(self):
+        """
+        不等待地放入结束消息
+
+        客户端不再读取时输出队列可能一直是满的，先丢弃未读的消息（结束消息带有最终状态），
+        否则会话永远不会结束，占用的名额也不会释放。
+        """
+        message = {'type': 'end', 'reason': self.end_reason, 'state': game_state(self.engine)}
+        while True:
+            try:
+                self.outbox.put_nowait(message)
+                return
+            except asyncio.QueueFull:
+                self.outbox.get_nowait()
+
+    async def _loop(self):
+        engine = self.engine
+        if not engine.started:
+            engine.start()
+        await self.outbox.put({'type': 'state', 'state': game_state(engine)})
+        while not engine.game_over:
+            try:
+                if self.action_timeout is None:
+                    message = await self.inbox.get()
+                else:
+                    message = await asyncio.wait_for(self.inbox.get(), self.action_timeout)
+            except asyncio.TimeoutError:
+                self.end_reason = END_ACTION_TIMEOUT
+                return
+            if message is None:
+                self.end_reason = END_CLOSED
+                return
+            # 放入结果时若客户端还没取走之前的结果，在这里等待，同样受action_timeout限制
+            try:
+                if self.action_timeout is None:
+                    await self.outbox.put(self.apply(message))
+                else:
+                    await asyncio.wait_for(self.outbox.put(self.apply(message)), self.action_timeout)
+            except asyncio.TimeoutError:
+                self.end_reason = END_ACTION_TIMEOUT
+                return
+        self.end_reason = END_FINISHED
+
+
+class SessionClient:
+    """
+    进程内客户端，直接读写会话的队列
+    """
+    def __init__(self, host, session):
+        self.host = host
+        self.session = session
+        self.closed = False
+
+    @property
+    def session_id(self):
+        return self.session.session_id
+
+    async def send(self, action):
+        """发送行动，输入队列满时等待"""
+        await self.session.inbox.put(action)
+
+    async def receive(self):
+        """接收下一条消息（state/result/end）"""
+        return await self.session.outbox.get()
+
+    async def act(self, action):
+        """
+        发送行动并等待其结果
+
+        返回:
+            dict: result消息；会话已结束时为end消息
+        """
+        await self.send(action)
+        message = await self.receive()
+        if message['type'] == 'end':
+            self.closed = True
+        return message
+
+    async def close(self):
+        """结束会话并等待其退出"""
+        if not self.session.task.done():
+            try:
+                self.session.inbox.put_nowait(None)
+            except asyncio.QueueFull:
+                self.session.task.cancel()
+        # 丢弃未读的消息，避免会话在放入结束消息时阻塞
+        while not self.session.task.done():
+            try:
+                self.session.outbox.get_nowait()
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(0)
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class SessionHost:
+    """
+    在一个事件循环中托管多个会话
+
+    同时运行的会话数达到max_sessions时，新的connect会等待已有会话结束（背压）。
+    """
+    def __init__(self, max_sessions=10000, queue_size=4, action_timeout=30.0, session_timeout=None, **player_config):
+        """
+        参数:
+            max_sessions: 同时运行的会话数上限
+            queue_size: 每个会话输入和输出队列的容量
+            action_timeout: 等待客户端行动的秒数，超时结束会话，为None时不限
+            session_timeout: 每局的秒数上限，为None时不限
+            player_config: 创建Player的参数，如target_score、hand_limit等
+        """
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.action_timeout = action_timeout
+        self.session_timeout = session_timeout
+        self.player_config = player_config
+        self.sessions = {}  # 会话编号 -> 运行中的GameSession
+        self.finished = {}  # 结束原因 -> 会话数
+        self._slots = None
+        self._next_id = 0
+
+    def _get_slots(self):
+        # 信号量在事件循环中创建
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_sessions)
+        return self._slots
+
+    async def open_session(self, seed=None, max_rounds=10):
+        """
+        创建并启动一个会话，运行中的会话数达到上限时等待
+
+        返回:
+            GameSession: 已启动的会话
+        """
+        slots = self._get_slots()
+        await slots.acquire()
+        session_id = self._next_id
+        self._next_id += 1
+        engine = GameEngine(max_rounds=max_rounds, seed=seed, **self.player_config)
+        session = GameSession(session_id, engine, self.queue_size, self.action_timeout, self.session_timeout)
+        self.sessions[session_id] = session
+        session.task = asyncio.get_running_loop().create_task(session.run())
+        session.task.add_done_callback(lambda task: self._release(session))
+        return session
+
+    def _release(self, session):
+        self.sessions.pop(session.session_id, None)
+        reason = session.end_reason or ('cancelled' if session.task.cancelled() else 'error')
+        self.finished[reason] = self.finished.get(reason, 0) + 1
+        self._slots.release()
+
+    async def connect(self, seed=None, max_rounds=10):
+        """
+        创建会话并返回进程内客户端
+
+        返回:
+            SessionClient: 客户端，第一条消息为初始状态
+        """
+        return SessionClient(self, await self.open_session(seed, max_rounds))
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """
+        启动TCP服务，每个连接对应一个会话，每行一个JSON消息
+
+        返回:
+            asyncio.Server: 服务对象
+        """
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def _handle_connection(self, reader, writer):
+        session = await self.open_session()
+
+        async def forward_actions():
+            while True:
+                line = await reader.readline()
+                if not line:
+                    await session.inbox.put(None)
+                    return
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    message = {}
+                await session.inbox.put(message)
+
+        reading = asyncio.get_running_loop().create_task(forward_actions())
+        try:
+            while True:
+                message = await session.outbox.get()
+                writer.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+                # 客户端读取慢时在这里等待，会话随之在输出队列上等待；超过action_timeout仍未读取时断开
+                if self.action_timeout is None:
+                    await writer.drain()
+                else:
+                    await asyncio.wait_for(writer.drain(), self.action_timeout)
+                if message['type'] == 'end':
+                    break
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            reading.cancel()
+            if not session.task.done():
+                session.task.cancel()
+            writer.close()
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("===== 多会话主机测试 =====")
+
+    async def random_client(host, seed):
+        """随机出牌直到游戏结束"""
+        rng = random.Random(seed)
+        client = await host.connect(seed=seed)
+        message = await client.receive()
+        while message['type'] != 'end':
+            state = message['state']
+            indices = rng.sample(range(len(state['hand'])), rng.randint(1, min(5, len(state['hand']))))
+            kind = Action.DISCARD if state['discards_left'] and rng.random() < 0.2 else Action.PLAY
+            message = await client.act({'kind': kind, 'card_indices': indices})
+            if message['type'] == 'result' and message['state']['game_over']:
+                message = await client.receive()
+        return message
+
+    async def main():
+        host = SessionHost(max_sessions=1000, action_timeout=5.0)
+        num_sessions = 5000
+        start = time.perf_counter()
+        results = await asyncio.gather(*(random_client(host, seed) for seed in range(num_sessions)))
+        elapsed = time.perf_counter() - start
+        finished = sum(1 for message in results if message['reason'] == END_FINISHED)
+        won = sum(1 for message in results if message['state']['won'])
+        print(f"{num_sessions}个会话（同时最多{host.max_sessions}个）: 正常结束 {finished}，获胜 {won}，用时 {elapsed:.2f}秒，{num_sessions / elapsed:.0f}局/秒")
+        print(f"会话全部释放: {'✓ 通过' if not host.sessions and host.finished == {END_FINISHED: num_sessions} else '✗ 失败'}")
+
+        # 与直接用GameEngine执行相同行动的结果一致
+        client = await host.connect(seed=7)
+        engine = GameEngine(seed=7)
+        engine.start()
+        await client.receive()
+        same = True
+        for _ in range(3):
+            action = {'kind': 'play', 'card_indices': [0, 1, 2]}
+            message = await client.act(action)
+            engine.step(action_from_message(action))
+            same &= message['state'] == game_state(engine)
+        await client.close()
+        print(f"与GameEngine结果一致: {'✓ 通过' if same else '✗ 失败'}")
+
+        # 不发送行动的客户端超时结束
+        slow_host = SessionHost(action_timeout=0.05)
+        client = await slow_host.connect(seed=1)
+        await client.receive()
+        message = await client.receive()
+        print(f"等待行动超时: {'✓ 通过' if message['reason'] == END_ACTION_TIMEOUT else '✗ 失败'}")
+
+        # 不再读取消息的客户端：结束消息不因输出队列满而阻塞，名额被释放，下一个连接不会一直等待
+        stuck_host = SessionHost(max_sessions=1, queue_size=1, action_timeout=0.05, session_timeout=0.1)
+        await stuck_host.connect(seed=3)
+        await asyncio.sleep(0.5)
+        released = not stuck_host.sessions and stuck_host.finished == {END_ACTION_TIMEOUT: 1}
+        try:
+            client = await asyncio.wait_for(stuck_host.connect(seed=4), 1.0)
+            await client.close()
+        except asyncio.TimeoutError:
+            released = False
+        print(f"不读取消息的客户端释放名额: {'✓ 通过' if released else '✗ 失败'}")
+
+        # 只发送行动不读取结果的客户端在放入结果时超时
+        stuck_host = SessionHost(queue_size=1, action_timeout=0.05)
+        client = await stuck_host.connect(seed=5)
+        for _ in range(2):
+            await client.send({'kind': 'play', 'card_indices': [0]})
+        await asyncio.sleep(0.5)
+        print(f"等待取走结果超时: {'✓ 通过' if stuck_host.finished == {END_ACTION_TIMEOUT: 1} else '✗ 失败'}")
+
+        # 无效输入与命令行前端的提示一致
+        client = await host.connect(seed=2)
+        await client.receive()
+        bad = await client.act({'kind': 'jump'})
+        no_tarot = await client.act({'kind': 'tarot', 'index': 0})
+        await client.close()
+        print(f"无效输入: {bad['message']} / {no_tarot['message']}")
+
+        # 通过TCP连接
+        try:
+            server = await host.serve(port=0)
+        except OSError as e:
+            print(f"无法监听本地端口，跳过TCP测试: {e}")
+            return
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        first = json.loads(await reader.readline())
+        writer.write(json.dumps({'kind': 'play', 'card_indices': [0]}).encode() + b'\n')
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        writer.close()
+        await writer.wait_closed()
+        # 连接关闭后会话随之结束
+        while host.sessions:
+            await asyncio.sleep(0.01)
+        server.close()
+        await server.wait_closed()
+        print(f"TCP会话: {'✓ 通过' if first['type'] == 'state' and reply['type'] == 'result' and reply['success'] else '✗ 失败'}")
+
+    asyncio.run(main())
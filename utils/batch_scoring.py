@@ -0,0 +1,277 @@
+import sys
+import os
+import itertools
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card.poker.poker_card import PokerCard
+from utils.texas_poker_hand_ranking import TexasPokerHandRanking, _RANK_PRIMES
+from card.joker.apply_joker import compile_jokers, OP_ADD_CHIPS, OP_ADD_MULT
+
+# 批量牌型判断与计分
+# 牌用整数编码：code = (效果下标 * 花色数 + 花色下标) * 点数数 + 点数下标，
+# 下标分别对应PokerCard.EFFECTS、PokerCard.SUITS和PokerCard.VALUES。
+# 一批出牌是形状为(N, 5)的整数数组，不足5张的行用PAD_CARD补齐。
+PAD_CARD = -1
+
+_NUM_VALUES = len(PokerCard.VALUES)
+_NUM_SUITS = len(PokerCard.SUITS)
+
+# 每种点数对应的筹码，与PokerCard.get_numeric_value一致
+_CHIPS = np.array(PokerCard.CHIPS, dtype=np.int64)
+
+_POINT_PLUS_30 = PokerCard.EFFECTS.index('POINT_PLUS_30')
+_MULTIPLIER_PLUS_4 = PokerCard.EFFECTS.index('MULTIPLIER_PLUS_4')
+_MULTIPLIER_TIMES_1_5 = PokerCard.EFFECTS.index('MULTIPLIER_TIMES_1_5')
+
+# 排序后的点数下标按(点数数+1)进制组合成键，补齐位使用最大的数字，保证排在末尾
+_KEY_BASE = _NUM_VALUES + 1
+_KEY_WEIGHTS = np.array([_KEY_BASE ** (4 - i) for i in range(5)], dtype=np.int64)
+
+# 稠密牌型表，下标为 键*2+同花标志，首次使用时构建
+_dense_hand_type_table = None
+
+
+def encode_card(card):
+    """
+    将一张PokerCard编码为整数
+
+    参数:
+        card: PokerCard对象
+
+    返回:
+        int: 牌的整数编码
+    """
+    return card.code
+
+
+def decode_card(code):
+    """
+    将整数编码还原为PokerCard对象
+
+    参数:
+        code: 牌的整数编码
+
+    返回:
+        PokerCard: 对应的扑克牌
+    """
+    return PokerCard.from_code(code)
+
+
+def encode_hands(hands):
+    """
+    将多组出牌编码为(N, 5)的整数数组
+
+    参数:
+        hands: 每个元素是包含0-5张PokerCard的列表
+
+    返回:
+        numpy.ndarray: 形状为(N, 5)的int64数组，空位为PAD_CARD
+    """
+    codes = np.full((len(hands), 5), PAD_CARD, dtype=np.int64)
+    for row, hand in enumerate(hands):
+        if len(hand) > 5:
+            raise ValueError("每组出牌最多5张")
+        for col, card in enumerate(hand):
+            codes[row, col] = card.code
+    return codes
+
+
+def _get_dense_hand_type_table():
+    """
+    由TexasPokerHandRanking的查表分类器构建稠密牌型表
+
+    返回:
+        numpy.ndarray: 下标为 键*2+同花标志 的牌型编码数组，无效键为-1
+    """
+    global _dense_hand_type_table
+    if _dense_hand_type_table is not None:
+        return _dense_hand_type_table
+
+    table = TexasPokerHandRanking._hand_type_table
+    if table is None:
+        table = TexasPokerHandRanking._build_hand_type_table()
+
+    dense = np.full(_KEY_BASE ** 5 * 2, -1, dtype=np.int8)
+    codes = TexasPokerHandRanking.HAND_TYPE_CODES
+    for count in range(1, 6):
+        for indices in itertools.combinations_with_replacement(range(_NUM_VALUES), count):
+            prime_key = 1
+            for index in indices:
+                prime_key *= _RANK_PRIMES[PokerCard.VALUES[index]]
+            prime_key <<= 1
+
+            padded = list(indices) + [_NUM_VALUES] * (5 - count)
+            dense_key = sum(index * int(weight) for index, weight in zip(padded, _KEY_WEIGHTS)) * 2
+            dense[dense_key] = codes[table[prime_key]]
+            if count == 5:
+                dense[dense_key + 1] = codes[table[prime_key | 1]]
+
+    _dense_hand_type_table = dense
+    return dense
+
+
+def _split_codes(cards):
+    """
+    拆分整数编码为点数、花色和效果下标
+
+    返回:
+        tuple: (有效位掩码, 点数下标, 花色下标, 效果下标)，空位的点数下标为_NUM_VALUES
+    """
+    cards = np.asarray(cards, dtype=np.int64)
+    if cards.ndim != 2 or cards.shape[1] != 5:
+        raise ValueError("输入必须是形状为(N, 5)的整数数组")
+
+    valid = cards != PAD_CARD
+    safe = np.where(valid, cards, 0)
+    rest, values = np.divmod(safe, _NUM_VALUES)
+    effects, suits = np.divmod(rest, _NUM_SUITS)
+    values = np.where(valid, values, _NUM_VALUES)
+    return valid, values, suits, effects
+
+
+def _hand_types_from_parts(valid, values, suits):
+    """根据拆分后的点数和花色批量查表得到牌型编码，空行为-1"""
+    counts = valid.sum(axis=1)
+
+    # 同花：5张牌且花色全部相同
+    flush = (counts == 5) & (suits == suits[:, :1]).all(axis=1)
+
+    keys = np.sort(values, axis=1) @ _KEY_WEIGHTS
+    hand_types = _get_dense_hand_type_table()[keys * 2 + flush].astype(np.int64)
+    hand_types[counts == 0] = -1
+    return hand_types
+
+
+def batch_get_hand_types(cards):
+    """
+    批量判断牌型
+
+    参数:
+        cards: 形状为(N, 5)的整数编码数组，空位为PAD_CARD
+
+    返回:
+        numpy.ndarray: 牌型编码数组，对应TexasPokerHandRanking.HAND_TYPES的下标，空行为-1
+    """
+    valid, values, suits, _ = _split_codes(cards)
+    return _hand_types_from_parts(valid, values, suits)
+
+
+def batch_compute_score(cards, hand_rank, jokers=None):
+    """
+    批量计算出牌分数，结果与Player.compute_score逐个计算完全一致
+
+    参数:
+        cards: 形状为(N, 5)的整数编码数组，空位为PAD_CARD
+        hand_rank: 牌型判断器，提供各牌型的基础点数和倍率
+        jokers: 小丑牌列表
+
+    返回:
+        dict: 包含以下numpy数组
+            hand_types: 牌型编码，空行为-1
+            base_points: 牌型基础点数
+            base_multipliers: 牌型基础倍率
+            points: 加上牌面点数、效果和小丑牌效果后的总点数
+            multipliers: 应用效果和小丑牌效果后的总倍率
+            scores: 最终分数
+    """
+    valid, values, suits, effects = _split_codes(cards)
+    hand_types = _hand_types_from_parts(valid, values, suits)
+
+    table_points = np.array([hand_rank.get_points(hand_type)[0] for hand_type in TexasPokerHandRanking.HAND_TYPES] + [0], dtype=np.int64)
+    table_multipliers = np.array([hand_rank.get_points(hand_type)[1] for hand_type in TexasPokerHandRanking.HAND_TYPES] + [0.0], dtype=np.float64)
+    base_points = table_points[hand_types]
+    base_multipliers = table_multipliers[hand_types]
+
+    # 牌面点数与加点效果
+    chips = np.where(valid, _CHIPS[np.minimum(values, _NUM_VALUES - 1)], 0)
+    points = base_points + chips.sum(axis=1) + 30 * (valid & (effects == _POINT_PLUS_30)).sum(axis=1)
+
+    # 倍率效果与出牌顺序有关，按列依次应用以保持与逐张计算相同的浮点结果
+    pipeline = compile_jokers(jokers)
+    multipliers = base_multipliers.copy()
+    for col in range(5):
+        column_valid = valid[:, col]
+        column_effect = effects[:, col]
+        multipliers = np.where(column_valid & (column_effect == _MULTIPLIER_PLUS_4), multipliers + 4, multipliers)
+        multipliers = np.where(column_valid & (column_effect == _MULTIPLIER_TIMES_1_5), multipliers * 1.5, multipliers)
+        # 小丑牌对每张计分牌的效果，紧接在该牌自身的效果之后
+        for op, value, suit_codes, value_codes in pipeline.card_ops:
+            triggered = column_valid
+            if suit_codes is not None:
+                triggered = triggered & np.isin(suits[:, col], list(suit_codes))
+            if value_codes is not None:
+                triggered = triggered & np.isin(values[:, col], list(value_codes))
+            if op == OP_ADD_CHIPS:
+                points = np.where(triggered, points + value, points)
+            elif op == OP_ADD_MULT:
+                multipliers = np.where(triggered, multipliers + value, multipliers)
+            else:
+                multipliers = np.where(triggered, multipliers * value, multipliers)
+
+    # 小丑牌对整手牌的效果
+    for op, value, hand_type_names in pipeline.hand_ops:
+        triggered = hand_types >= 0
+        if hand_type_names is not None:
+            triggered = triggered & np.isin(hand_types, [TexasPokerHandRanking.HAND_TYPE_CODES[name] for name in hand_type_names])
+        if op == OP_ADD_CHIPS:
+            points = np.where(triggered, points + value, points)
+        elif op == OP_ADD_MULT:
+            multipliers = np.where(triggered, multipliers + value, multipliers)
+        else:
+            multipliers = np.where(triggered, multipliers * value, multipliers)
+
+    scores = np.trunc(points * multipliers).astype(np.int64)
+    return {
+        'hand_types': hand_types,
+        'base_points': base_points,
+        'base_multipliers': base_multipliers,
+        'points': points,
+        'multipliers': multipliers,
+        'scores': scores
+    }
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from player import Player
+
+    print("===== 批量计分一致性测试 =====")
+    rng = random.Random(0)
+    player = Player()
+    hand_ranking = TexasPokerHandRanking()
+    deck = [PokerCard(suit, value) for suit in PokerCard.SUITS[:4] for value in PokerCard.VALUES[:-1]]
+
+    hands = []
+    for _ in range(20000):
+        count = rng.randint(1, 5)
+        hand = []
+        for card in rng.sample(deck, count):
+            # 随机加入石头牌和各种效果
+            if rng.random() < 0.05:
+                card = PokerCard('No_suits', 'stone')
+            hand.append(PokerCard(card.suit, card.value, rng.choice(PokerCard.EFFECTS)))
+        hands.append(hand)
+    hands.append([])
+
+    codes = encode_hands(hands)
+    # 预先构建牌型表，不计入用时
+    hand_ranking._build_hand_type_table()
+    _get_dense_hand_type_table()
+    start = time.perf_counter()
+    result = batch_compute_score(codes, hand_ranking, [])
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [player.compute_score(hand, hand_ranking, []) for hand in hands]
+    scalar_time = time.perf_counter() - start
+
+    mismatches = int((result['scores'] != np.array(expected)).sum())
+    for row, hand in enumerate(hands[:-1]):
+        if TexasPokerHandRanking.HAND_TYPES[result['hand_types'][row]] != hand_ranking.get_hand_type(hand):
+            mismatches += 1
+    print(f"共检查 {len(hands)} 组牌，不一致 {mismatches} 组")
+    print(f"批量用时 {batch_time * 1000:.1f}毫秒，逐个计算用时 {scalar_time * 1000:.1f}毫秒")
+    print(f"测试结果: {'✓ 通过' if mismatches == 0 else '✗ 失败'}")
@@ -0,0 +1,477 @@
+import sys
+import os
+from itertools import combinations
+from math import comb
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card.poker.poker_card import PokerCard
+from card.joker.apply_joker import OP_ADD_CHIPS, OP_TIMES_MULT, compile_jokers
+from utils.texas_poker_hand_ranking import TexasPokerHandRanking
+
+_PLUS_30 = 'POINT_PLUS_30'
+_PLUS_4 = 'MULTIPLIER_PLUS_4'
+_TIMES_1_5 = 'MULTIPLIER_TIMES_1_5'
+_EFFECT_STRIDE = len(PokerCard.SUITS) * len(PokerCard.VALUES)
+# 子集花色标记：空子集可以与任何花色组成同花，花色不一致的子集不能
+_NO_CARDS = -1
+_MIXED = -2
+_TYPE_ORDER = {hand_type: index for index, hand_type in enumerate(TexasPokerHandRanking.HAND_TYPES)}
+
+
+def _card_parts(code, card_ops=()):
+    """
+    解析牌编码
+
+    参数:
+        code: 牌编码
+        card_ops: 小丑牌流水线的card_ops，与牌自身的效果一样在这张牌计分时执行
+
+    返回:
+        tuple: (质数, 筹码（含加点效果）, 花色, 按执行顺序的倍率操作(是否为乘法, 数值)元组, 点数)
+    """
+    card = PokerCard.from_code(code)
+    chips = card.chips + (30 if card.effect == _PLUS_30 else 0)
+    multiplier_ops = []
+    if card.effect == _TIMES_1_5:
+        multiplier_ops.append((True, 1.5))
+    elif card.effect == _PLUS_4:
+        multiplier_ops.append((False, 4))
+    for op, value, suits, values in card_ops:
+        if (suits is None or card.suit_code in suits) and (values is None or card.rank in values):
+            if op == OP_ADD_CHIPS:
+                chips += value
+            else:
+                multiplier_ops.append((op == OP_TIMES_MULT, value))
+    return card.prime, chips, card.suit_code, tuple(multiplier_ops), card.rank
+
+
+def _subset_groups(parts, max_size):
+    """
+    按大小分组的所有子集摘要
+
+    返回:
+        list: 第i项为大小为i的子集列表，每个子集为(质数积, 筹码, 花色标记, 按计分顺序排列的倍率操作)
+    """
+    groups = [[] for _ in range(max_size + 1)]
+    for size in range(min(max_size, len(parts)) + 1):
+        for indices in combinations(range(len(parts)), size):
+            key = 1
+            chips = 0
+            suit = _NO_CARDS
+            effects = []
+            # play_card按索引从大到小的顺序计分
+            for index in reversed(indices):
+                prime, card_chips, card_suit, multiplier_ops, _ = parts[index]
+                key *= prime
+                chips += card_chips
+                if suit == _NO_CARDS:
+                    suit = card_suit
+                elif suit != card_suit:
+                    suit = _MIXED
+                effects.extend(multiplier_ops)
+            groups[size].append((key, chips, suit, tuple(effects)))
+    return groups
+
+
+class DiscardEVCalculator:
+    """
+    精确计算弃牌后的期望：弃掉若干手牌、从牌池补牌到手牌上限后，
+    最佳出牌的牌型分布和期望得分
+
+    不做抽样，而是对补到的牌做超几何计数：
+        先忽略花色，把牌池按(点数, 效果)归类，枚举补牌在各类别中的张数，
+        每种组合的权重为各类别组合数之积，除以C(牌池张数, 补牌张数)即为概率；
+        不足10张的手牌中最多只有一种花色能凑够5张，因此同花只需逐个花色修正：
+        对保留的同花色张数加补牌可能达到5张的花色，枚举补到的该花色的牌和其余牌的点数，
+        把这些结果的得分从忽略花色时的得分修正为考虑同花后的得分。
+    每种补牌结果的最佳出牌由保留手牌的子集摘要与补到的牌的子集组合得到，
+    保留手牌的部分在一次计算中只预处理一次。
+
+    最佳出牌与Player.best_play一致（包括小丑牌的效果），得分相同时取更高的牌型。牌型点数和倍率随牌型单调不减、
+    没有5张同点数的牌、且小丑牌效果不减少分数也不以花色或牌型为条件时，最佳出牌一定是5张
+    （手牌不足5张时为全部手牌），只比较这些子集；不满足时（或最终手牌达到10张）退回到区分花色逐类枚举、
+    比较所有1-5张子集。同一次补牌中同时出现加倍率和乘倍率效果的牌时，补到的牌按类别顺序计分。
+    """
+    def __init__(self, hand_rank=None, jokers=()):
+        """
+        初始化计算器
+
+        参数:
+            hand_rank: 牌型判断器，为None时新建
+            jokers: 计分时生效的小丑牌，可传入玩家的小丑牌列表，每次计算时按其当前内容编译
+        """
+        self.hand_rank = hand_rank if hand_rank is not None else TexasPokerHandRanking()
+        self.jokers = jokers
+
+    def _prepare(self):
+        """
+        按当前的牌型表和小丑牌准备计分数据，best_score和evaluate开始时调用
+
+        _points_by_type: 牌型 -> (点数, 倍率, 小丑牌per_hand加点数, 按执行顺序的per_hand倍率操作)
+        """
+        pipeline = compile_jokers(self.jokers)
+        self._card_ops = pipeline.card_ops
+        self._points_by_type = {}
+        for hand_type in TexasPokerHandRanking.HAND_TYPES:
+            points, multiplier = self.hand_rank.get_points(hand_type)
+            chips = 0
+            multiplier_ops = []
+            for op, value, hand_types in pipeline.hand_ops:
+                if hand_types is None or hand_type in hand_types:
+                    if op == OP_ADD_CHIPS:
+                        chips += value
+                    else:
+                        multiplier_ops.append((op == OP_TIMES_MULT, value))
+            self._points_by_type[hand_type] = (points, multiplier, chips, tuple(multiplier_ops))
+        # 最佳出牌一定是5张的前提：小丑牌效果不减少分数，且对同点数、同效果的牌作用相同、对所有牌型作用相同
+        self._jokers_uniform = pipeline.monotone and all(suits is None for _, _, suits, _ in pipeline.card_ops) and all(
+            hand_types is None for _, _, hand_types in pipeline.hand_ops)
+
+    def _monotone_table(self):
+        """牌型点数和倍率是否随HAND_TYPES顺序单调不减"""
+        previous = (0, 0)
+        for hand_type in TexasPokerHandRanking.HAND_TYPES:
+            points = self.hand_rank.get_points(hand_type)
+            if points[0] < previous[0] or points[1] < previous[1]:
+                return False
+            previous = points
+        return True
+
+    def best_score(self, codes):
+        """
+        直接比较所有1-5张子集，得到手牌中得分最高的出牌
+
+        参数:
+            codes: 手牌编码序列，按手牌顺序排列
+
+        返回:
+            tuple: (牌型, 分数)，手牌为空时为(None, 0)
+        """
+        self._prepare()
+        parts = [_card_parts(code, self._card_ops) for code in codes]
+        groups = _subset_groups(parts, 5)
+        return self._best_of(groups, [], range(1, min(5, len(parts)) + 1), True)
+
+    def _best_of(self, kept_groups, drawn_parts, sizes, allow_flush):
+        """
+        保留手牌子集与补到的牌的子集组合中得分最高的出牌
+
+        参数:
+            kept_groups: 保留手牌的_subset_groups
+            drawn_parts: 补到的牌的_card_parts，按补牌顺序排列
+            sizes: 需要比较的出牌张数
+            allow_flush: 为False时忽略花色，所有出牌都不算同花
+
+        返回:
+            tuple: (牌型, 分数)
+        """
+        table = TexasPokerHandRanking._hand_type_table
+        if table is None:
+            table = TexasPokerHandRanking._build_hand_type_table()
+        points_by_type = self._points_by_type
+        drawn_groups = _subset_groups(drawn_parts, 5)
+
+        best_type = None
+        best = -1
+        for size in sizes:
+            for drawn_size in range(max(0, size - len(kept_groups) + 1), min(size, len(drawn_parts)) + 1):
+                kept_size = size - drawn_size
+                if kept_size >= len(kept_groups):
+                    continue
+                for drawn_key, drawn_chips, drawn_suit, drawn_effects in drawn_groups[drawn_size]:
+                    for kept_key, kept_chips, kept_suit, kept_effects in kept_groups[kept_size]:
+                        key = (drawn_key * kept_key) << 1
+                        if allow_flush and size == 5 and drawn_suit != _MIXED and kept_suit != _MIXED and (
+                                drawn_suit == kept_suit or drawn_suit == _NO_CARDS or kept_suit == _NO_CARDS):
+                            key |= 1
+                        hand_type = table[key]
+                        points, multiplier, hand_chips, hand_effects = points_by_type[hand_type]
+                        # 补到的牌在手牌末尾，计分时先于保留的牌；小丑牌的per_hand效果最后执行
+                        for times, value in drawn_effects + kept_effects + hand_effects:
+                            if times:
+                                multiplier *= value
+                            else:
+                                multiplier += value
+                        score = int((points + drawn_chips + kept_chips + hand_chips) * multiplier)
+                        if score > best or (score == best and _TYPE_ORDER[hand_type] > _TYPE_ORDER[best_type]):
+                            best_type, best = hand_type, score
+        return best_type, best
+
+    def evaluate(self, hand, discard_indices, pool, hand_limit):
+        """
+        计算一种弃牌方案的精确期望
+
+        参数:
+            hand: 当前手牌列表
+            discard_indices: 要弃掉的手牌索引，可以为空表示不弃牌
+            pool: 牌池（列表或PokerCardSet），补牌从中无放回抽取
+            hand_limit: 手牌上限
+
+        返回:
+            dict: 包含
+                hand_types: 最佳出牌牌型的概率分布 {牌型: 概率}
+                expected_score: 最佳出牌的期望得分
+                draws: 补牌张数
+                outcomes: 评估的补牌结果数（按类别计）
+        """
+        self._prepare()
+        discarded = set(discard_indices)
+        kept = [card.code for index, card in enumerate(hand) if index not in discarded]
+        pool_codes = [card.code for card in pool]
+        draws = max(0, min(hand_limit - len(kept), len(pool_codes)))
+        final_size = len(kept) + draws
+
+        card_ops = self._card_ops
+        kept_parts = [_card_parts(code, card_ops) for code in kept]
+        rank_counts = {}
+        for part in kept_parts:
+            rank_counts[part[4]] = rank_counts.get(part[4], 0) + 1
+        for code in pool_codes:
+            rank_counts[code % len(PokerCard.VALUES)] = rank_counts.get(code % len(PokerCard.VALUES), 0) + 1
+        # 同点数的牌可能凑够5张时，多加一张牌会让牌型降低，需要比较所有子集
+        fast = self._monotone_table() and self._jokers_uniform and final_size < 10 and max(rank_counts.values(), default=0) < 5
+
+        self._distribution = {}
+        self._expected = 0.0
+        self._outcomes = 0
+        self._total = comb(len(pool_codes), draws)
+        if fast:
+            self._evaluate_by_rank(kept_parts, pool_codes, draws, final_size)
+        else:
+            self._evaluate_by_card_class(kept, kept_parts, pool_codes, draws)
+        return {
+            'hand_types': {hand_type: probability for hand_type, probability in self._distribution.items() if probability > 1e-15},
+            'expected_score': self._expected,
+            'draws': draws,
+            'outcomes': self._outcomes
+        }
+
+    def _record(self, weight, hand_type, score):
+        """累加一种补牌结果；weight为负时撤销之前按忽略花色记录的结果"""
+        probability = weight / self._total
+        self._distribution[hand_type] = self._distribution.get(hand_type, 0.0) + probability
+        self._expected += probability * score
+
+    def _evaluate_by_rank(self, kept_parts, pool_codes, draws, final_size):
+        """忽略花色枚举，再逐个花色修正同花"""
+        kept_groups = _subset_groups(kept_parts, 5)
+        sizes = [min(5, final_size)]
+
+        def classes_of(codes):
+            # (点数, 效果)相同的牌归为一类，代表牌取第一张
+            classes = {}
+            for code in codes:
+                key = (code % len(PokerCard.VALUES), code // _EFFECT_STRIDE)
+                entry = classes.get(key)
+                if entry is None:
+                    classes[key] = [code, 1]
+                else:
+                    entry[1] += 1
+            return [(code, count) for code, count in classes.values()]
+
+        no_flush = {}  # 补到的牌的点数类别 -> 忽略花色时的(牌型, 分数)
+
+        def evaluate_no_flush(drawn):
+            key = tuple(sorted(code % _EFFECT_STRIDE % len(PokerCard.VALUES) + code // _EFFECT_STRIDE * len(PokerCard.VALUES) for code in drawn))
+            result = no_flush.get(key)
+            if result is None:
+                result = self._best_of(kept_groups, [_card_parts(code, self._card_ops) for code in drawn], sizes, False)
+                no_flush[key] = result
+                self._outcomes += 1
+            return result
+
+        # 第一步：忽略花色
+        def on_rank_outcome(drawn, weight):
+            hand_type, score = evaluate_no_flush(drawn)
+            self._record(weight, hand_type, score)
+
+        _enumerate_multisets(classes_of(pool_codes), draws, on_rank_outcome)
+
+        if final_size < 5:
+            return
+
+        # 第二步：只有保留的同花色张数加补到的同花色张数达到5张时才可能同花，这些结果互斥
+        kept_suits = {}
+        for part in kept_parts:
+            kept_suits[part[2]] = kept_suits.get(part[2], 0) + 1
+        for suit in range(len(PokerCard.SUITS)):
+            suited = [code for code in pool_codes if code // len(PokerCard.VALUES) % len(PokerCard.SUITS) == suit]
+            need = max(0, 5 - kept_suits.get(suit, 0))
+            if need > min(draws, len(suited)):
+                continue
+            others = classes_of([code for code in pool_codes if code // len(PokerCard.VALUES) % len(PokerCard.SUITS) != suit])
+            suited_classes = classes_of(suited)
+            for suited_count in range(need, min(draws, len(suited)) + 1):
+                def on_suited(suited_drawn, suited_weight):
+                    def on_flush_outcome(other_drawn, other_weight):
+                        # 同花色的牌排在前面，其余牌不会与它们同花色
+                        drawn = suited_drawn + other_drawn
+                        weight = suited_weight * other_weight
+                        parts = [_card_parts(code, self._card_ops) for code in drawn]
+                        for index in range(len(suited_drawn), len(parts)):
+                            parts[index] = parts[index][:2] + (_MIXED,) + parts[index][3:]
+                        flush_type, flush_score = self._best_of(kept_groups, parts, sizes, True)
+                        self._outcomes += 1
+                        plain_type, plain_score = evaluate_no_flush(drawn)
+                        if flush_type != plain_type or flush_score != plain_score:
+                            self._record(-weight, plain_type, plain_score)
+                            self._record(weight, flush_type, flush_score)
+
+                    _enumerate_multisets(others, draws - suited_count, on_flush_outcome, suited_weight)
+
+                _enumerate_multisets(suited_classes, suited_count, on_suited)
+
+    def _evaluate_by_card_class(self, kept, kept_parts, pool_codes, draws):
+        """按(点数, 花色, 效果)归类逐一枚举，比较所有1-5张子集"""
+        kept_groups = _subset_groups(kept_parts, 5)
+        final_size = len(kept) + draws
+        sizes = range(1, min(5, final_size) + 1)
+        classes = {}
+        for code in pool_codes:
+            entry = classes.get(code)
+            if entry is None:
+                classes[code] = [code, 1]
+            else:
+                entry[1] += 1
+
+        def on_outcome(drawn, weight):
+            hand_type, score = self._best_of(kept_groups, [_card_parts(code, self._card_ops) for code in drawn], sizes, True)
+            self._outcomes += 1
+            self._record(weight, hand_type, score)
+
+        _enumerate_multisets([tuple(entry) for entry in classes.values()], draws, on_outcome)
+
+    def rank_discards(self, hand, pool, hand_limit, candidates=None, max_discard=5):
+        """
+        比较多种弃牌方案
+
+        参数:
+            hand: 当前手牌列表
+            pool: 牌池
+            hand_limit: 手牌上限
+            candidates: 弃牌索引元组的列表，为None时枚举所有1到max_discard张的组合
+            max_discard: 枚举时最多弃牌张数
+
+        返回:
+            list: (弃牌索引元组, evaluate的结果)，按期望得分从高到低排列
+        """
+        if candidates is None:
+            candidates = [indices for count in range(1, min(max_discard, len(hand)) + 1)
+                          for indices in combinations(range(len(hand)), count)]
+        results = [(tuple(indices), self.evaluate(hand, indices, pool, hand_limit)) for indices in candidates]
+        results.sort(key=lambda item: -item[1]['expected_score'])
+        return results
+
+
+def _enumerate_multisets(classes, count, callback, weight=1):
+    """
+    枚举从各类别中无放回抽取count张的所有组合
+
+    参数:
+        classes: (代表牌编码, 该类张数)列表
+        count: 抽取张数
+        callback: 对每种组合调用callback(抽到的编码列表, 组合数)
+        weight: 乘到组合数上的系数
+    """
+    drawn = []
+
+    def recurse(start, remaining, current):
+        if remaining == 0:
+            callback(list(drawn), current)
+            return
+        for index in range(start, len(classes)):
+            code, size = classes[index]
+            for taken in range(1, min(size, remaining) + 1):
+                drawn.extend([code] * taken)
+                recurse(index + 1, remaining - taken, current * comb(size, taken))
+                del drawn[len(drawn) - taken:]
+
+    recurse(0, count, weight)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from card.joker.apply_joker import ADD_MULT, PER_CARD, PER_HAND, TIMES_MULT, JokerEffect, register_joker_effect
+    from card.joker.joker import joker
+    from player import Player
+
+    print("===== 弃牌期望精确计算测试 =====")
+    rng = random.Random(0)
+    deck = [PokerCard(suit, value) for suit in PokerCard.SUITS[:4] for value in PokerCard.VALUES[:-1]]
+    rng.shuffle(deck)
+    hand = [deck.pop() for _ in range(8)]
+    hand[2].effect = 'MULTIPLIER_PLUS_4'
+    print(f"手牌: {[str(card) for card in hand]}")
+
+    player = Player(verbose=False)
+    hand_rank = player.poker_hand_rank
+    calculator = DiscardEVCalculator(hand_rank)
+    TexasPokerHandRanking._build_hand_type_table()
+
+    def brute_force(discard, jokers=()):
+        # 逐一枚举所有补牌和所有出牌子集，得分相同时取更高的牌型
+        kept = [card for index, card in enumerate(hand) if index not in discard]
+        total = 0
+        types = {}
+        count = 0
+        for drawn in combinations(deck, len(discard)):
+            final = kept + list(drawn)
+            best = (-1, -1, None)
+            for size in range(1, 6):
+                for indices in combinations(range(len(final)), size):
+                    played = [final[index] for index in reversed(indices)]
+                    score = player.compute_score(played, hand_rank, list(jokers))
+                    hand_type = hand_rank.get_hand_type_fast(played)
+                    best = max(best, (score, _TYPE_ORDER[hand_type], hand_type))
+            total += best[0]
+            types[best[2]] = types.get(best[2], 0) + 1
+            count += 1
+        return total / count, {hand_type: number / count for hand_type, number in types.items()}
+
+    for discard in [(0, 5), (1, 4)]:
+        result = calculator.evaluate(hand, discard, deck, 8)
+        expected, types = brute_force(discard)
+        same = abs(result['expected_score'] - expected) < 1e-6 and set(types) == set(result['hand_types']) and all(
+            abs(result['hand_types'][hand_type] - probability) < 1e-9 for hand_type, probability in types.items())
+        print(f"弃掉{discard}: 期望得分 {result['expected_score']:.4f}，逐一枚举 {expected:.4f}: {'✓ 通过' if same else '✗ 失败'}")
+
+    # 同花修正：保留4张同花色的牌
+    flush_hand = [PokerCard('Hearts', value) for value in ['2', '5', '9', 'J']] + [PokerCard('Spades', value) for value in ['3', '7', 'Q', 'K']]
+    flush_deck = [card for card in deck if all(card.code != other.code for other in flush_hand)]
+    hand, deck = flush_hand, flush_deck
+    result = calculator.evaluate(hand, (4, 5), deck, 8)
+    expected, types = brute_force((4, 5))
+    same = abs(result['expected_score'] - expected) < 1e-6 and all(abs(result['hand_types'].get(hand_type, 0) - probability) < 1e-9 for hand_type, probability in types.items())
+    print(f"同花听牌弃2张: 期望得分 {result['expected_score']:.4f}，逐一枚举 {expected:.4f}，同花概率 {result['hand_types'].get('FLUSH', 0):.4f}: {'✓ 通过' if same else '✗ 失败'}")
+
+    # 新建的计算器直接求最佳出牌，与Player.best_play一致
+    codes = [card.code for card in hand]
+    _, score = DiscardEVCalculator(hand_rank).best_score(codes)
+    _, best = player.best_play(hand, [])
+    print(f"新计算器的最佳出牌 {score}，best_play {best}: {'✓ 通过' if score == best else '✗ 失败'}")
+
+    # 小丑牌效果计入得分：不以花色和牌型为条件时仍只比较5张出牌，否则逐类枚举所有子集
+    register_joker_effect("红桃", JokerEffect(PER_CARD, ADD_MULT, 3, suits=['Hearts']))
+    register_joker_effect("人头", JokerEffect(PER_CARD, TIMES_MULT, 1.5, values=['J', 'Q', 'K']))
+    register_joker_effect("对子", JokerEffect(PER_HAND, ADD_MULT, 8, hand_types=['ONE_PAIR']))
+    lucky = joker("幸运星", price=1, effect="测试")
+    pair = [PokerCard('Spades', 'A'), PokerCard('Hearts', 'A')]
+    _, score = DiscardEVCalculator(hand_rank, [lucky]).best_score([card.code for card in pair])
+    _, best = player.best_play(pair, [lucky])
+    print(f"一张幸运星时一对A的最佳出牌 {score}，best_play {best}: {'✓ 通过' if score == best else '✗ 失败'}")
+    for names in (["幸运星", "小丑王"], ["幸运星", "红桃", "人头", "对子"]):
+        jokers = [joker(name, price=1, effect="测试") for name in names]
+        result = DiscardEVCalculator(hand_rank, jokers).evaluate(hand, (4, 5), deck, 8)
+        expected, types = brute_force((4, 5), jokers)
+        same = abs(result['expected_score'] - expected) < 1e-6 and all(
+            abs(result['hand_types'].get(hand_type, 0) - probability) < 1e-9 for hand_type, probability in types.items())
+        print(f"小丑牌{names}: 期望得分 {result['expected_score']:.4f}，逐一枚举 {expected:.4f}: {'✓ 通过' if same else '✗ 失败'}")
+
+    print("\n===== 耗时 =====")
+    for discard in [(5,), (4, 5), (4, 5, 6), (4, 5, 6, 7), (0, 4, 5, 6, 7)]:
+        start = time.perf_counter()
+        result = calculator.evaluate(hand, discard, deck, 8)
+        elapsed = time.perf_counter() - start
+        best_type = max(result['hand_types'], key=result['hand_types'].get)
+        print(f"弃{len(discard)}张: 期望 {result['expected_score']:.1f}，最可能的牌型 {best_type}，评估 {result['outcomes']}种结果，{elapsed * 1000:.1f}毫秒")
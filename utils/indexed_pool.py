@@ -0,0 +1,256 @@
+class IndexedPool:
+    """
+    带稳定编号的卡牌池，加入、移除、成员判断和按权重抽取都与牌池大小无关
+
+    卡牌按权重类别（如小丑牌的稀有度）分桶存放在紧凑列表中，移除时用桶末尾的牌填补空位；
+    每张牌的位置按对象身份记录，成员判断不再逐个比较。
+    按权重抽取分两步：先用类别的别名表（Vose方法）按“类别权重×桶内张数”抽出一个桶，
+    再在桶内均匀抽取一张。别名表只在桶的张数变化后的下一次抽取时重建，代价只与类别数有关。
+
+    每张牌第一次加入时分配一个编号，之后移除再放回也保持不变，可用get按编号取回。
+    支持len()、迭代、in、append/extend/remove/copy，可以代替环境中的牌池列表。
+    """
+    DEFAULT_CATEGORY = None
+
+    def __init__(self, items=(), weight_attr=None, weights=None):
+        """
+        初始化牌池
+
+        参数:
+            items: 初始卡牌
+            weight_attr: 决定权重类别的属性名（如'rarity'），为None时所有牌属于同一类别
+            weights: 类别到权重的字典，未列出的类别权重为1
+        """
+        self.weight_attr = weight_attr
+        self.weights = dict(weights) if weights else {}
+        self._buckets = {}  # 类别 -> 该类别的卡牌列表
+        self._positions = {}  # id(卡牌) -> 在所属桶中的下标
+        self._ids = {}  # id(卡牌) -> 稳定编号
+        self._by_id = {}  # 稳定编号 -> 卡牌
+        self._size = 0
+        self._alias = None  # (类别列表, 概率表, 别名表)，为None时需要重建
+        for item in items:
+            self.append(item)
+
+    def _category(self, item):
+        if self.weight_attr is None:
+            return self.DEFAULT_CATEGORY
+        return getattr(item, self.weight_attr, self.DEFAULT_CATEGORY)
+
+    def append(self, item):
+        """
+        加入一张牌
+
+        返回:
+            int: 该牌的稳定编号
+        """
+        key = id(item)
+        if key in self._positions:
+            raise ValueError(f'卡牌已在牌池中: {item!r}')
+        item_id = self._ids.get(key)
+        if item_id is None:
+            item_id = len(self._by_id)
+            self._ids[key] = item_id
+            self._by_id[item_id] = item
+
+        bucket = self._buckets.setdefault(self._category(item), [])
+        self._positions[key] = len(bucket)
+        bucket.append(item)
+        self._size += 1
+        self._alias = None
+        return item_id
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def remove(self, item):
+        """移除一张牌，不在牌池中时抛出ValueError"""
+        index = self._positions.pop(id(item), None)
+        if index is None:
+            raise ValueError('IndexedPool.remove(x): x不在牌池中')
+        bucket = self._buckets[self._category(item)]
+        last = bucket.pop()
+        if last is not item:
+            bucket[index] = last
+            self._positions[id(last)] = index
+        self._size -= 1
+        self._alias = None
+
+    def discard(self, item):
+        """移除一张牌，不在牌池中时忽略"""
+        if id(item) in self._positions:
+            self.remove(item)
+
+    def clear(self):
+        """清空牌池，保留已分配的编号"""
+        self._buckets.clear()
+        self._positions.clear()
+        self._size = 0
+        self._alias = None
+
+    def get(self, item_id):
+        """按稳定编号取卡牌（包括已移出牌池的）"""
+        return self._by_id[item_id]
+
+    def id_of(self, item):
+        """卡牌的稳定编号，从未加入过时返回None"""
+        return self._ids.get(id(item))
+
+    def shuffle(self, rng):
+        """打乱迭代顺序，抽取结果不依赖于此，只为兼容列表牌池的用法"""
+        for bucket in self._buckets.values():
+            rng.shuffle(bucket)
+            for index, item in enumerate(bucket):
+                self._positions[id(item)] = index
+
+    def copy(self):
+        """浅复制，共享卡牌对象和编号"""
+        other = IndexedPool(weight_attr=self.weight_attr, weights=self.weights)
+        other._ids = self._ids.copy()
+        other._by_id = self._by_id.copy()
+        other.extend(self)
+        return other
+
+    def _build_alias(self):
+        """为非空且权重为正的类别构建别名表"""
+        categories = []
+        masses = []
+        for category, bucket in self._buckets.items():
+            mass = self.weights.get(category, 1) * len(bucket)
+            if mass > 0:
+                categories.append(category)
+                masses.append(mass)
+        count = len(categories)
+        total = sum(masses)
+        scaled = [mass * count / total for mass in masses]
+        probability = [1.0] * count
+        alias = list(range(count))
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            probability[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        self._alias = (categories, probability, alias)
+
+    def choice(self, rng):
+        """
+        按权重抽取一张牌（不移除）
+
+        参数:
+            rng: random.Random对象
+
+        返回:
+            卡牌，牌池中没有权重为正的牌时返回None
+        """
+        if self._alias is None:
+            self._build_alias()
+        categories, probability, alias = self._alias
+        if not categories:
+            return None
+        column = rng.randrange(len(categories))
+        if rng.random() >= probability[column]:
+            column = alias[column]
+        bucket = self._buckets[categories[column]]
+        return bucket[rng.randrange(len(bucket))]
+
+    def sample(self, k, rng):
+        """
+        按权重无放回地抽取k张不同的牌，抽到重复的牌时重抽
+
+        参数:
+            k: 抽取张数
+            rng: random.Random对象
+
+        返回:
+            list: 抽到的牌；牌池不足k张时返回全部牌
+        """
+        if self._size <= k:
+            return list(self)
+        if self._alias is None:
+            self._build_alias()
+        categories = self._alias[0]
+        positive = sum(len(self._buckets[category]) for category in categories)
+        if positive <= k:
+            # 权重为正的牌不足k张：全部选中，其余从权重为0的牌中均匀补足
+            chosen = [item for category in categories for item in self._buckets[category]]
+            rest = [item for item in self if self.weights.get(self._category(item), 1) <= 0]
+            return chosen + rng.sample(rest, k - len(chosen))
+
+        chosen = []
+        seen = set()
+        while len(chosen) < k:
+            item = self.choice(rng)
+            if id(item) not in seen:
+                seen.add(id(item))
+                chosen.append(item)
+        return chosen
+
+    def __contains__(self, item):
+        return id(item) in self._positions
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for bucket in list(self._buckets.values()):
+            yield from list(bucket)
+
+    def __repr__(self):
+        return f"IndexedPool({list(self)!r})"
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    import sys
+    import os
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from card.joker.joker import joker
+
+    print("===== IndexedPool测试 =====")
+    rng = random.Random(0)
+    rarities = list(joker.RARITY_WEIGHTS)
+    jokers = [joker(f"小丑{i}", price=1, effect="无", rarity=rarities[i % 3]) for i in range(3000)]
+    pool = IndexedPool(jokers, weight_attr='rarity', weights=joker.RARITY_WEIGHTS)
+    first_id = pool.id_of(jokers[5])
+    pool.remove(jokers[5])
+    assert jokers[5] not in pool and len(pool) == 2999
+    pool.append(jokers[5])
+    assert pool.id_of(jokers[5]) == first_id and pool.get(first_id) is jokers[5]
+    print("  ✓ 移除后放回编号不变")
+
+    counts = {rarity: 0 for rarity in rarities}
+    draws = 100000
+    for _ in range(draws):
+        counts[pool.choice(rng).rarity] += 1
+    masses = {rarity: joker.RARITY_WEIGHTS[rarity] * 1000 for rarity in rarities[:3]}
+    total_mass = sum(masses.values())
+    print("  抽取频率/期望: " + ", ".join(f"{rarity} {counts[rarity] / draws:.3f}/{masses[rarity] / total_mass:.3f}" for rarity in rarities[:3]))
+
+    print("\n===== 商店操作耗时（每次刷新+购买+出售） =====")
+    for size in (100, 1000, 10000):
+        items = [joker(f"小丑{i}", price=1, effect="无", rarity=rarities[i % 3]) for i in range(size)]
+        list_pool = list(items)
+        indexed = IndexedPool(items, weight_attr='rarity', weights=joker.RARITY_WEIGHTS)
+        repeats = 2000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            shop = rng.sample(list_pool, 2)
+            list_pool.remove(shop[0])
+            if shop[0] not in list_pool:
+                list_pool.append(shop[0])
+        list_time = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(repeats):
+            shop = indexed.sample(2, rng)
+            indexed.remove(shop[0])
+            if shop[0] not in indexed:
+                indexed.append(shop[0])
+        indexed_time = (time.perf_counter() - start) / repeats
+        print(f"  {size}张: 列表 {list_time * 1e6:.1f}微秒，IndexedPool {indexed_time * 1e6:.1f}微秒")
@@ -0,0 +1,175 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card.poker.poker_card import PokerCard
+from card.Tarot.tarot_card import TarotCard
+
+TAROT_TYPE_IDS = {tarot_type: index for index, tarot_type in enumerate(TarotCard.TAROT_TYPES)}
+
+
+class ObservationEncoder:
+    """
+    把环境状态编码为固定形状的float32向量，写入预先分配、反复使用的缓冲区
+
+    观测布局（按顺序）：
+        hand: 每个手牌位置3个数 (点数下标, 花色下标, 效果下标)，空位为-1
+        deck_ranks: 牌池中每种点数剩余张数，对应PokerCard.VALUES
+        deck_suits: 牌池中每种花色剩余张数，对应PokerCard.SUITS
+        jokers: 每个小丑牌位置的小丑牌编号，空位为-1
+        tarots: 拥有的每种塔罗牌的张数，对应TarotCard.TAROT_TYPES
+        shop_jokers: 商店每个小丑牌位置 (编号, 价格)，空位为-1
+        shop_tarots: 商店每个塔罗牌位置 (类型编号, 价格)，空位为-1
+        status: 分数、目标分数、剩余出牌次数、剩余弃牌次数、资金、当前回合
+
+    行动掩码布局（按顺序）：
+        kinds: 能否出牌、弃牌、使用塔罗牌（同Player.can_play/can_discard）
+        hand: 每个手牌位置是否有牌（出牌、弃牌和塔罗牌目标的索引校验）
+        use_tarot: 每个塔罗牌位置能否使用
+        buy_joker / buy_tarot: 商店每个位置是否有物品且资金足够
+        sell_joker / sell_tarot: 每个拥有的小丑牌/塔罗牌位置能否出售
+    """
+    SHOP_SLOTS = 2
+
+    def __init__(self, hand_limit, joker_names, max_jokers=5, max_tarots=5):
+        """
+        初始化编码器并分配缓冲区
+
+        参数:
+            hand_limit: 手牌上限，决定手牌部分的位置数
+            joker_names: 所有小丑牌的名称，下标即小丑牌编号
+            max_jokers: 观测中记录的小丑牌位置数
+            max_tarots: 行动掩码中记录的塔罗牌位置数
+        """
+        self.hand_limit = hand_limit
+        self.joker_ids = {name: index for index, name in enumerate(joker_names)}
+        self.max_jokers = max_jokers
+        self.max_tarots = max_tarots
+
+        sizes = [
+            ('hand', hand_limit * 3),
+            ('deck_ranks', len(PokerCard.VALUES)),
+            ('deck_suits', len(PokerCard.SUITS)),
+            ('jokers', max_jokers),
+            ('tarots', len(TAROT_TYPE_IDS)),
+            ('shop_jokers', self.SHOP_SLOTS * 2),
+            ('shop_tarots', self.SHOP_SLOTS * 2),
+            ('status', 6)
+        ]
+        self.slices = {}
+        start = 0
+        for name, size in sizes:
+            self.slices[name] = slice(start, start + size)
+            start += size
+        self.observation = np.zeros(start, dtype=np.float32)
+
+        mask_sizes = [
+            ('kinds', 3),
+            ('hand', hand_limit),
+            ('use_tarot', max_tarots),
+            ('buy_joker', self.SHOP_SLOTS),
+            ('buy_tarot', self.SHOP_SLOTS),
+            ('sell_joker', max_jokers),
+            ('sell_tarot', max_tarots)
+        ]
+        self.mask_slices = {}
+        start = 0
+        for name, size in mask_sizes:
+            self.mask_slices[name] = slice(start, start + size)
+            start += size
+        self.action_mask = np.zeros(start, dtype=bool)
+
+        # 各部分的视图，写入时不再切片
+        self._views = {name: self.observation[part] for name, part in self.slices.items()}
+        self._hand_view = self._views['hand'].reshape(hand_limit, 3)
+        self._shop_joker_view = self._views['shop_jokers'].reshape(self.SHOP_SLOTS, 2)
+        self._shop_tarot_view = self._views['shop_tarots'].reshape(self.SHOP_SLOTS, 2)
+        self._mask_views = {name: self.action_mask[part] for name, part in self.mask_slices.items()}
+
+    def encode(self, environment, current_round=1, game_over=False):
+        """
+        把环境和玩家的当前状态写入观测缓冲区与行动掩码
+
+        参数:
+            environment: Environment对象
+            current_round: 当前回合
+            game_over: 对局是否已结束，结束时所有行动都不可用
+
+        返回:
+            numpy.ndarray: 观测缓冲区本身，下次编码会被覆盖，需要保留时请复制
+        """
+        player = environment.player
+        views = self._views
+
+        hand_view = self._hand_view
+        hand_view.fill(-1)
+        hand = player.hand
+        for slot in range(min(len(hand), self.hand_limit)):
+            card = hand[slot]
+            row = hand_view[slot]
+            row[0] = card.rank
+            row[1] = card.suit_code
+            row[2] = card.code // (len(PokerCard.SUITS) * len(PokerCard.VALUES))
+
+        views['deck_ranks'][:] = environment.get_remaining_rank_counts()
+        views['deck_suits'][:] = environment.get_remaining_suit_counts()
+
+        joker_view = views['jokers']
+        joker_view.fill(-1)
+        for slot, joker_card in enumerate(player.jokers[:self.max_jokers]):
+            joker_view[slot] = self.joker_ids.get(joker_card.name, -1)
+
+        tarot_view = views['tarots']
+        tarot_view.fill(0)
+        for tarot_card in player.tarot_cards:
+            tarot_view[TAROT_TYPE_IDS[tarot_card.tarot_type]] += 1
+
+        shop = environment.shop
+        shop_view = self._shop_joker_view
+        shop_view.fill(-1)
+        for slot, joker_card in enumerate(shop['jokers'][:self.SHOP_SLOTS]):
+            shop_view[slot, 0] = self.joker_ids.get(joker_card.name, -1)
+            shop_view[slot, 1] = joker_card.get_price()
+        shop_view = self._shop_tarot_view
+        shop_view.fill(-1)
+        for slot, tarot_card in enumerate(shop['tarots'][:self.SHOP_SLOTS]):
+            shop_view[slot, 0] = TAROT_TYPE_IDS[tarot_card.tarot_type]
+            shop_view[slot, 1] = tarot_card.get_price()
+
+        status = views['status']
+        status[0] = player.score
+        status[1] = player.target_score
+        status[2] = player.plays_per_round - player.current_plays
+        status[3] = player.discards_per_round - player.current_discards
+        status[4] = player.funds
+        status[5] = current_round
+
+        self._encode_mask(environment, game_over)
+        return self.observation
+
+    def _encode_mask(self, environment, game_over):
+        """根据can_play/can_discard和索引校验写入行动掩码"""
+        player = environment.player
+        masks = self._mask_views
+        self.action_mask.fill(False)
+        if game_over:
+            return
+
+        kinds = masks['kinds']
+        kinds[0] = player.can_play()
+        kinds[1] = player.can_discard()
+        kinds[2] = len(player.tarot_cards) > 0
+
+        masks['hand'][:min(len(player.hand), self.hand_limit)] = True
+        masks['use_tarot'][:min(len(player.tarot_cards), self.max_tarots)] = True
+
+        shop = environment.shop
+        for slot, joker_card in enumerate(shop['jokers'][:self.SHOP_SLOTS]):
+            masks['buy_joker'][slot] = player.funds >= joker_card.get_price()
+        for slot, tarot_card in enumerate(shop['tarots'][:self.SHOP_SLOTS]):
+            masks['buy_tarot'][slot] = player.funds >= tarot_card.get_price()
+
+        masks['sell_joker'][:min(len(player.jokers), self.max_jokers)] = True
+        masks['sell_tarot'][:min(len(player.tarot_cards), self.max_tarots)] = True
@@ -0,0 +1,288 @@
+import sys
+import os
+import time
+import importlib
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 被测量的阶段：(阶段名, 模块, 类, 方法)
+# 外层阶段的耗时包含内层阶段，如score包含classify，refill包含deal
+PHASES = (
+    ('round', 'forward', 'GameController', 'process_round'),
+    ('step', 'engine', 'GameEngine', 'step'),
+    ('play', 'player', 'Player', 'play_card'),
+    ('discard', 'player', 'Player', 'discard_card'),
+    ('deal', 'environment', 'Environment', 'send_poker_card'),
+    ('refill', 'environment', 'Environment', 'refill_hand'),
+    ('classify', 'utils.texas_poker_hand_ranking', 'TexasPokerHandRanking', 'get_hand_type_fast'),
+    ('score', 'player', 'Player', 'compute_score'),
+    ('shop', 'environment', 'Environment', 'init_shop'),
+    ('shop', 'environment', 'Environment', 'refresh_shop'),
+    ('shop', 'environment', 'Environment', 'buy_joker_from_shop'),
+    ('shop', 'environment', 'Environment', 'buy_tarot_from_shop'),
+    ('shop', 'environment', 'Environment', 'sell_joker_to_shop'),
+    ('shop', 'environment', 'Environment', 'sell_tarot_to_shop'),
+    ('tarot', 'player', 'Player', 'use_tarot_card')
+)
+
+
+def _resolve_classes(module_name, class_name):
+    """
+    找到要包装的类；模块作为脚本运行时（如python forward.py），
+    __main__中的同名类与导入的模块中的类是两个对象，两个都要包装
+    """
+    classes = [getattr(importlib.import_module(module_name), class_name)]
+    main = sys.modules.get('__main__')
+    main_file = getattr(main, '__file__', None)
+    if main_file and os.path.splitext(os.path.basename(main_file))[0] == module_name.rsplit('.', 1)[-1]:
+        cls = getattr(main, class_name, None)
+        if isinstance(cls, type) and cls not in classes:
+            classes.append(cls)
+    return classes
+
+
+class PhaseStats:
+    """一个阶段的调用次数和耗时"""
+    __slots__ = ('calls', 'total', 'max')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+class Profiler:
+    """
+    游戏循环的计时与计数注册表
+
+    启用时把PHASES中列出的方法替换为计时的包装函数，记录每个阶段的调用次数和耗时，
+    并在每次成功出牌后记录牌型和得分；停用时恢复原方法，被测代码中没有任何额外判断，
+    因此停用时没有开销。同一时间只能启用一个Profiler。
+
+    自定义的计数和计时可以用count和phase添加。
+    """
+    _active = None  # 当前启用的Profiler
+
+    def __init__(self):
+        self.phases = {}  # 阶段名 -> PhaseStats
+        self.counters = {}  # 计数器名 -> 计数
+        self.hand_types = {}  # 出牌的牌型 -> 次数
+        self.play_scores = {}  # 单次出牌得分的对数分桶下界 -> 次数
+        self._originals = []  # (类, 方法名, 原方法)
+
+    @property
+    def enabled(self):
+        return Profiler._active is self
+
+    def enable(self):
+        """替换被测方法，开始记录"""
+        if self.enabled:
+            return
+        if Profiler._active is not None:
+            raise RuntimeError('已有其他Profiler处于启用状态')
+        Profiler._active = self
+        for phase, module_name, class_name, method_name in PHASES:
+            for cls in _resolve_classes(module_name, class_name):
+                original = cls.__dict__[method_name]
+                self._originals.append((cls, method_name, original))
+                if phase == 'play':
+                    wrapper = self._wrap_play(original)
+                else:
+                    wrapper = self._wrap(phase, original)
+                setattr(cls, method_name, wrapper)
+
+    def disable(self):
+        """恢复被测方法，停止记录，已记录的数据保留"""
+        if not self.enabled:
+            return
+        for cls, method_name, original in reversed(self._originals):
+            setattr(cls, method_name, original)
+        self._originals.clear()
+        Profiler._active = None
+
+    def _stats(self, phase):
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        return stats
+
+    def _wrap(self, phase, original):
+        stats = self._stats(phase)
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                stats.add(clock() - start)
+        wrapper.__wrapped__ = original
+        wrapper.__name__ = original.__name__
+        wrapper.__doc__ = original.__doc__
+        return wrapper
+
+    def _wrap_play(self, original):
+        """出牌除计时外，成功时按牌型和得分分桶计数"""
+        timed = self._wrap('play', original)
+        # 牌型判断用未包装的方法，不计入classify阶段
+        from utils.texas_poker_hand_ranking import TexasPokerHandRanking
+        classify = TexasPokerHandRanking.__dict__['get_hand_type_fast']
+
+        def wrapper(player, card_index=None, *args, **kwargs):
+            hand = list(player.hand)
+            score = player.score
+            success = timed(player, card_index, *args, **kwargs)
+            if success:
+                played = [hand[index] for index in sorted(card_index, reverse=True)]
+                self.record_play(classify(player.poker_hand_rank, played), player.score - score)
+            return success
+        wrapper.__wrapped__ = original
+        wrapper.__name__ = original.__name__
+        wrapper.__doc__ = original.__doc__
+        return wrapper
+
+    def record_play(self, hand_type, score):
+        """记录一次出牌的牌型和得分"""
+        self.hand_types[hand_type] = self.hand_types.get(hand_type, 0) + 1
+        bucket = 0 if score <= 0 else 1 << (int(score).bit_length() - 1)
+        self.play_scores[bucket] = self.play_scores.get(bucket, 0) + 1
+        self.count('play_score_total', score)
+
+    def count(self, name, value=1):
+        """累加自定义计数器"""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def phase(self, name):
+        """
+        给一段代码计时，计入name阶段；未启用时不计时
+
+        用法:
+            with profiler.phase('rollout'):
+                ...
+        """
+        if not self.enabled:
+            yield
+            return
+        stats = self._stats(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.add(time.perf_counter() - start)
+
+    def reset(self):
+        """清空已记录的数据（启用状态不变）"""
+        for stats in self.phases.values():
+            stats.calls = 0
+            stats.total = 0.0
+            stats.max = 0.0
+        self.counters.clear()
+        self.hand_types.clear()
+        self.play_scores.clear()
+
+    def report(self):
+        """
+        导出记录的数据
+
+        返回:
+            dict: phases（阶段 -> 调用次数、总耗时、平均耗时、最大耗时，单位秒）、
+                counters、hand_types、play_scores（得分区间下界 -> 次数）
+        """
+        phases = {}
+        for name, stats in self.phases.items():
+            if stats.calls:
+                phases[name] = {
+                    'calls': stats.calls,
+                    'total': stats.total,
+                    'mean': stats.total / stats.calls,
+                    'max': stats.max
+                }
+        return {
+            'phases': phases,
+            'counters': dict(self.counters),
+            'hand_types': dict(sorted(self.hand_types.items(), key=lambda item: -item[1])),
+            'play_scores': dict(sorted(self.play_scores.items()))
+        }
+
+    def format_report(self):
+        """把report()整理成便于阅读的多行文本"""
+        report = self.report()
+        lines = [f"{'阶段':<10}{'调用次数':>10}{'总耗时(毫秒)':>14}{'平均(微秒)':>12}{'最大(微秒)':>12}"]
+        for name, stats in sorted(report['phases'].items(), key=lambda item: -item[1]['total']):
+            lines.append(f"{name:<12}{stats['calls']:>10}{stats['total'] * 1e3:>16.2f}{stats['mean'] * 1e6:>14.2f}{stats['max'] * 1e6:>14.2f}")
+        if report['hand_types']:
+            plays = sum(report['hand_types'].values())
+            lines.append("出牌牌型: " + ", ".join(f"{hand_type} {count / plays:.1%}" for hand_type, count in report['hand_types'].items()))
+            lines.append("单次得分: " + ", ".join(f"{low}-{max(low * 2 - 1, low)}: {count}" for low, count in report['play_scores'].items()))
+        for name, value in report['counters'].items():
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+
+# 进程内共享的默认注册表
+PROFILER = Profiler()
+
+
+@contextmanager
+def profiling(profiler=None):
+    """
+    在with块内启用profiler（默认为PROFILER），退出时停用
+
+    用法:
+        with profiling() as profiler:
+            engine.run(policy)
+        print(profiler.format_report())
+    """
+    profiler = PROFILER if profiler is None else profiler
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+
+
+if __name__ == "__main__":
+    import random
+    from engine import GameEngine
+    from policy import GreedyPolicy
+    from player import Player
+
+    print("===== 分阶段计时测试 =====")
+
+    greedy = GreedyPolicy()
+
+    def play_games(count):
+        random.seed(0)
+        start = time.perf_counter()
+        for game in range(count):
+            GameEngine(seed=game).run(greedy)
+        return time.perf_counter() - start
+
+    original_score = Player.compute_score
+    play_games(20)  # 预热
+    disabled_before = play_games(200)
+    with profiling() as profiler:
+        enabled = play_games(200)
+    disabled_after = play_games(200)
+    print(profiler.format_report())
+    report = profiler.report()
+    plays = sum(report['hand_types'].values())
+    print(f"\n出牌 {report['phases']['play']['calls']}次，其中成功 {plays}次，计分 {report['phases']['score']['calls']}次")
+    print(f"200局耗时：启用前 {disabled_before * 1e3:.0f}毫秒，启用时 {enabled * 1e3:.0f}毫秒，停用后 {disabled_after * 1e3:.0f}毫秒")
+    print(f"停用后方法已恢复: {'✓ 通过' if Player.compute_score is original_score and not profiler.enabled else '✗ 失败'}")
+    print(f"得分分桶合计等于成功出牌次数: {'✓ 通过' if sum(report['play_scores'].values()) == plays else '✗ 失败'}")
@@ -0,0 +1,649 @@
+import sys
+import os
+import math
+import random
+import time
+from itertools import combinations
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card.poker.poker_card import PokerCard
+from card.joker.apply_joker import OP_ADD_MULT, OP_TIMES_MULT, compile_jokers
+from engine import Action
+from utils.texas_poker_hand_ranking import TexasPokerHandRanking
+
+_NUM_VALUES = len(PokerCard.VALUES)
+_NUM_SUITS = len(PokerCard.SUITS)
+_EFFECT_STRIDE = _NUM_SUITS * _NUM_VALUES
+_STANDARD_SUITS = 4
+_STANDARD_RANKS = 13
+_PLUS_30 = PokerCard.EFFECTS.index('POINT_PLUS_30')
+_PLUS_4 = PokerCard.EFFECTS.index('MULTIPLIER_PLUS_4')
+_TIMES_1_5 = PokerCard.EFFECTS.index('MULTIPLIER_TIMES_1_5')
+# 顺子的5个连续点数窗口的点数位掩码（A既可在2之前也可在K之后）
+_STRAIGHT_MASKS = [sum(1 << (rank % _STANDARD_RANKS) for rank in range(start, start + 5)) for start in range(_STANDARD_RANKS - 3)]
+_ROYAL_MASK = _STRAIGHT_MASKS[-1]
+
+
+class RoundSolution:
+    """
+    单回合求解的结果
+
+    probability: 本回合达到目标分数的概率；已知牌堆顺序时为0或1，超时未求出时为上界1
+    actions: 已知牌堆顺序且能达到目标时，达到目标的行动序列（手牌索引对应执行时的手牌顺序），否则为空
+    nodes: 搜索展开的状态数
+    exact: 是否在时间限制内求出了结果
+    """
+    __slots__ = ('probability', 'actions', 'nodes', 'stderr', 'samples', 'exact', 'undecided')
+
+    def __init__(self, probability, actions=(), nodes=0, stderr=0.0, samples=1, exact=True, undecided=0):
+        self.probability = probability
+        self.actions = list(actions)
+        self.nodes = nodes
+        self.stderr = stderr  # 按采样的牌堆顺序估计时的标准误差
+        self.samples = samples  # 求解的牌堆顺序数
+        self.exact = exact
+        self.undecided = undecided  # 超时未求出、按能达到计入的牌堆顺序数
+
+    def __repr__(self):
+        return f"RoundSolution(probability={self.probability}, actions={self.actions}, nodes={self.nodes}, exact={self.exact})"
+
+
+class _Timeout(Exception):
+    """搜索超过时间限制"""
+
+
+class RoundSolver:
+    """
+    单回合最优出牌/弃牌求解器：最大化在剩余出牌和弃牌次数内达到目标分数的概率
+
+    已知牌堆顺序时回合是确定性的，用记忆化深度优先搜索精确求解能否达到目标，
+    并给出达到目标的行动序列；这相当于知道牌堆顺序的玩家，其结果是任何实际策略的上界。
+    状态为(手牌, 已发张数, 剩余出牌次数, 剩余弃牌次数)，每个状态记录已证明能达到的
+    最大剩余分数和已证明达不到的最小剩余分数，不同的剩余分数共享同一条记录。
+
+    缩减状态的方法：
+        手牌作为多重集排序后作为键，与手牌顺序无关（计分与出牌顺序有关时除外，见下）；
+        花色对称：花色只在同花时有用，本回合还能拿到的牌中不足5张的花色不可能再组成同花，
+            这些花色的牌只按点数和效果区分（小丑牌带花色条件时不做这一缩减）；
+        上界剪枝：按还能拿到的牌中各牌型最多能组成几手（如同花数=各花色张数整除5），
+            取剩余出牌次数手最高的牌型分数，加上按倍率从高到低分配的最高筹码，
+            上界达不到剩余分数的状态直接判为失败，出牌按得分从高到低尝试，
+            本手得分加剩余出牌的上界达不到时不再尝试得分更低的出牌。
+
+    计分使用Player.compute_score，与play_card一样按手牌索引从大到小的顺序计分。
+    牌或小丑牌的效果中既有逐张加倍率又有逐张乘倍率时，得分与计分顺序有关，
+    此时手牌按实际顺序（补牌接在末尾）保存，不再排序，求出的行动序列按原样执行得到相同的分数。
+
+    目标接近或超过能达到的最高分时搜索量很大，超过time_limit时停止搜索，
+    结果标记为不精确（exact=False），probability取上界1，仍可作为上界使用。
+
+    牌堆顺序未知时（solve_distribution）对剩余牌堆的顺序采样，逐个精确求解后取平均，
+    得到知道牌堆顺序的玩家的成功率的估计，作为实际策略成功率的上界。
+    """
+    def __init__(self, scorer=None, hand_limit=8, jokers=(), time_limit=2.0):
+        """
+        参数:
+            scorer: 用于计分的Player对象，为None时新建；使用其compute_score和牌型表
+            hand_limit: 手牌上限，出牌和弃牌后补牌到此张数
+            jokers: 小丑牌列表
+            time_limit: 每次求解的时间上限（秒），为None时不限制
+        """
+        if scorer is None:
+            from player import Player
+            scorer = Player(hand_limit=hand_limit, verbose=False)
+        self.scorer = scorer
+        self.hand_rank = scorer.poker_hand_rank
+        self.hand_limit = hand_limit
+        self.jokers = list(jokers)
+        self.time_limit = time_limit
+        self._scores = {}  # 按计分顺序的出牌编码元组 -> 得分
+        self._cards = {}  # 编码 -> PokerCard
+
+    @classmethod
+    def from_state(cls, state):
+        """创建与GameState规则一致的求解器"""
+        config = state.config
+        return cls(scorer=config.scorer, hand_limit=config.hand_limit, jokers=state.jokers)
+
+    def _prepare(self, codes):
+        """
+        按当前的牌型表和小丑牌准备计分和上界所需的数据
+
+        参数:
+            codes: 本回合可能出现的所有牌的编码，用于判断计分是否与出牌顺序有关
+        """
+        pipeline = compile_jokers(self.jokers)
+        key = (pipeline.fingerprint, self.hand_rank.hand_rank.token)
+        if getattr(self, '_scoring_key', None) != key:
+            self._scoring_key = key
+            self._scores = {}
+        self._pipeline = pipeline
+        # 小丑牌带花色条件时花色不只影响同花
+        self._suit_reduction = all(suits is None for _, _, suits, _ in pipeline.card_ops)
+        self._bounded = pipeline.monotone
+        self._bound_info = {}  # 编码 -> _card_bound_info
+        # 逐张的加倍率和乘倍率交替生效时，得分与计分顺序有关
+        effects = {code // _EFFECT_STRIDE for code in codes}
+        ops = {op for op, _, _, _ in pipeline.card_ops}
+        self._ordered = (_PLUS_4 in effects or OP_ADD_MULT in ops) and (_TIMES_1_5 in effects or OP_TIMES_MULT in ops)
+        # 按编码查花色，以及去掉花色后的键（负数，不与编码冲突）
+        codes = range(len(PokerCard.EFFECTS) * _EFFECT_STRIDE)
+        self._suit_of = [code // _NUM_VALUES % _NUM_SUITS for code in codes]
+        self._reduced = [-1 - (code // _EFFECT_STRIDE * _NUM_VALUES + code % _NUM_VALUES) for code in codes]
+        # 每种牌型的(点数, 加上小丑牌加倍率后的倍率, 小丑牌乘倍率)
+        self._type_points = []
+        for hand_type in TexasPokerHandRanking.HAND_TYPES:
+            points, multiplier = self.hand_rank.get_points(hand_type)
+            chips, plus, times = pipeline.hand_bonus(hand_type)
+            self._type_points.append((points + chips, multiplier + plus, times))
+
+    def _score(self, played):
+        """一组出牌（按计分顺序）的得分，按出牌缓存"""
+        score = self._scores.get(played)
+        if score is None:
+            cards = self._cards
+            hand = []
+            for code in played:
+                card = cards.get(code)
+                if card is None:
+                    card = cards[code] = PokerCard.from_code(code)
+                hand.append(card)
+            score = self._scores[played] = self.scorer.compute_score(hand, self.hand_rank, self.jokers)
+        return score
+
+    def _plays(self, hand):
+        """
+        手牌所有1-5张出牌，按得分从高到低排列
+
+        返回:
+            list: (得分, 出牌在hand中的索引元组, 剩余手牌编码元组)
+        """
+        plays = self._play_table.get(hand)
+        if plays is None:
+            plays = []
+            positions = range(len(hand))
+            for size in range(1, min(5, len(hand)) + 1):
+                for indices in combinations(positions, size):
+                    # 与play_card相同，按索引从大到小的顺序计分
+                    played = tuple([hand[index] for index in reversed(indices)])
+                    rest = tuple([hand[index] for index in positions if index not in indices])
+                    plays.append((self._score(played), indices, rest))
+            plays.sort(key=lambda play: -play[0])
+            self._play_table[hand] = plays
+        return plays
+
+    def _window_counts(self, start, end):
+        """牌堆中[start, end)这些牌的统计，按窗口缓存，见_count"""
+        window = (start, end)
+        counts = self._window_bounds.get(window)
+        if counts is None:
+            counts = self._window_bounds[window] = self._count(self._deck[start:end], None)
+        return counts
+
+    def _count(self, cards, base):
+        """
+        在base的基础上累加cards的统计
+
+        返回:
+            tuple: (各点数张数, 各花色张数, 各花色的点数位掩码, 点数位掩码, 筹码上界列表,
+                    加倍率效果张数, 乘倍率效果张数, 小丑牌最大加倍率, 小丑牌最大乘倍率, 是否都是标准牌)
+        """
+        if base is None:
+            rank_counts = [0] * _NUM_VALUES
+            suit_counts = [0] * _NUM_SUITS
+            suit_masks = [0] * _NUM_SUITS
+            rank_mask = 0
+            chips = []
+            plus_cards = 0
+            times_cards = 0
+            joker_plus = 0
+            joker_times = 1
+            standard = True
+        else:
+            rank_counts, suit_counts, suit_masks, rank_mask, chips, plus_cards, times_cards, joker_plus, joker_times, standard = base
+            rank_counts = rank_counts[:]
+            suit_counts = suit_counts[:]
+            suit_masks = suit_masks[:]
+            chips = chips[:]
+        info = self._bound_info
+        for code in cards:
+            entry = info.get(code)
+            if entry is None:
+                entry = self._card_bound_info(code)
+            rank, suit, card_chips, effect, bonus_plus, bonus_times = entry
+            rank_counts[rank] += 1
+            suit_counts[suit] += 1
+            bit = 1 << rank
+            suit_masks[suit] |= bit
+            rank_mask |= bit
+            if rank >= _STANDARD_RANKS or suit >= _STANDARD_SUITS:
+                standard = False
+            if effect == _PLUS_4:
+                plus_cards += 1
+            elif effect == _TIMES_1_5:
+                times_cards += 1
+            if bonus_plus > joker_plus:
+                joker_plus = bonus_plus
+            if bonus_times > joker_times:
+                joker_times = bonus_times
+            chips.append(card_chips)
+        return rank_counts, suit_counts, suit_masks, rank_mask, chips, plus_cards, times_cards, joker_plus, joker_times, standard
+
+    def _upper_bound(self, hand, start, end, plays):
+        """
+        用手牌和牌堆中[start, end)的牌出plays手的总得分上界
+
+        返回:
+            float: 上界，小丑牌效果可能减少分数时为无穷大
+        """
+        if plays <= 0:
+            return 0
+        if not self._bounded:
+            return math.inf
+        end = min(end, len(self._deck))
+        if not hand and start >= end:
+            return 0
+        rank_counts, suit_counts, suit_masks, rank_mask, chips, plus_cards, times_cards, joker_plus, joker_times, standard = \
+            self._count(hand, self._window_counts(start, end))
+
+        # 每种牌型最多能组成的不相交的手数
+        pairs = sum(count // 2 for count in rank_counts)
+        trips = sum(count // 3 for count in rank_counts)
+        quads = sum(count // 4 for count in rank_counts)
+        flushes = sum(count // 5 for count in suit_counts)
+        straights = len(chips) // 5 if any(rank_mask & mask == mask for mask in _STRAIGHT_MASKS) else 0
+        straight_flushes = 0
+        royal_flushes = 0
+        for suit in range(_NUM_SUITS):
+            if suit_counts[suit] >= 5:
+                mask = suit_masks[suit]
+                if any(mask & window == window for window in _STRAIGHT_MASKS):
+                    straight_flushes += suit_counts[suit] // 5
+                if mask & _ROYAL_MASK == _ROYAL_MASK:
+                    royal_flushes += suit_counts[suit] // 5
+        if standard:
+            capacity = (plays, pairs, pairs // 2, trips, straights, flushes, trips, quads, straight_flushes, royal_flushes)
+        else:
+            # 石头牌等非标准牌的牌型规则特殊，不限制牌型
+            capacity = (plays,) * len(TexasPokerHandRanking.HAND_TYPES)
+
+        # 倍率上界：所有加倍率都在乘倍率之前生效，一手最多5张牌触发效果
+        plus_bound = 4 * min(5, plus_cards) + 5 * joker_plus
+        times_bound = 1.5 ** min(5, times_cards) * joker_times ** 5
+        values = []
+        multipliers = []
+        for (points, multiplier, hand_times), count in zip(self._type_points, capacity):
+            if count <= 0:
+                continue
+            multiplier = (multiplier + plus_bound) * times_bound * hand_times
+            count = min(count, plays)
+            values.extend([points * multiplier] * count)
+            multipliers.extend([multiplier] * count)
+        values.sort(reverse=True)
+        multipliers.sort(reverse=True)
+        chips.sort(reverse=True)
+        bound = sum(values[:plays])
+        for play in range(min(plays, len(multipliers))):
+            bound += sum(chips[play * 5:play * 5 + 5]) * multipliers[play]
+        return bound
+
+    def _card_bound_info(self, code):
+        """上界用到的一张牌的数据：(点数下标, 花色下标, 筹码上界, 效果下标, 小丑牌加倍率, 小丑牌乘倍率)"""
+        effect, rest = divmod(code, _EFFECT_STRIDE)
+        suit, rank = divmod(rest, _NUM_VALUES)
+        card_chips = PokerCard.CHIPS[rank] + (30 if effect == _PLUS_30 else 0)
+        bonus_plus = 0
+        bonus_times = 1
+        if self._pipeline:
+            card = self._cards.get(code)
+            if card is None:
+                card = self._cards[code] = PokerCard.from_code(code)
+            bonus_chips, bonus_plus, bonus_times = self._pipeline.card_bonus(card)
+            card_chips += bonus_chips
+        entry = self._bound_info[code] = (rank, suit, card_chips, effect, bonus_plus, bonus_times)
+        return entry
+
+    def _key(self, hand, pointer, end):
+        """状态的记忆化键中的手牌部分，不可能再组成同花的花色的牌只保留点数和效果"""
+        if self._suit_reduction:
+            window = (pointer, end)
+            counts = self._window_suits.get(window)
+            if counts is None:
+                counts = [0] * _NUM_SUITS
+                for code in self._deck[pointer:end]:
+                    counts[code // _NUM_VALUES % _NUM_SUITS] += 1
+                self._window_suits[window] = counts
+            counts = counts[:]
+            suit_of = self._suit_of
+            for code in hand:
+                counts[suit_of[code]] += 1
+            if min(counts[:_STANDARD_SUITS]) < 5:
+                reduced = self._reduced
+                hand = tuple([code if counts[suit_of[code]] >= 5 else reduced[code] for code in hand])
+                if not self._ordered:
+                    hand = tuple(sorted(hand))
+        return hand
+
+    def _after(self, rest, pointer):
+        """打出或弃掉牌后补牌，返回(新手牌, 新的已发张数)"""
+        draws = min(self.hand_limit - len(rest), len(self._deck) - pointer)
+        if draws <= 0:
+            return rest, pointer
+        hand = rest + self._deck[pointer:pointer + draws]
+        return (hand if self._ordered else tuple(sorted(hand))), pointer + draws
+
+    def _reach(self, hand, pointer, plays, discards, need):
+        """能否从这个状态在本回合内再得到need分"""
+        if need <= 0:
+            return True
+        if plays <= 0 or not hand:
+            return False
+        end = pointer + 5 * (plays - 1 + discards)
+        key = (self._key(hand, pointer, end), pointer, plays, discards)
+        entry = self._memo.get(key)
+        if entry is None:
+            entry = self._memo[key] = [0, math.inf]  # [已证明能达到的剩余分数, 已证明达不到的剩余分数]
+        if need <= entry[0]:
+            return True
+        if need >= entry[1]:
+            return False
+        self.nodes += 1
+        if self._deadline is not None and not self.nodes & 1023 and time.perf_counter() > self._deadline:
+            raise _Timeout()
+
+        result = self._search(hand, pointer, plays, discards, need)
+        if result:
+            entry[0] = need
+        else:
+            entry[1] = need
+        return result
+
+    def _bounds(self, hand, pointer, plays, discards, need):
+        """
+        剩余plays手的总得分上界，以及打出一手后其余plays-1手的上界
+
+        取两种上界中较小的：所有还能拿到的牌合起来出plays手的上界；
+        逐手上界之和——从现在起第j手出牌之前最多补5*(j+discards)张牌，
+        只能用手牌和牌堆中接下来这些牌，每手分别取出一手的上界（不能再补牌时第一手就是手牌的最高分）。
+        """
+        upper_bound = self._upper_bound
+        end = pointer + 5 * (plays - 1 + discards)
+        total = upper_bound(hand, pointer, end, plays)
+        if total < need:
+            return total, total
+        rest = upper_bound(hand, pointer, end, plays - 1)
+        first = self._plays(hand)[0][0] if discards == 0 else upper_bound(hand, pointer, pointer + 5 * discards, 1)
+        later = 0
+        for play in range(1, plays):
+            if later >= rest:
+                break
+            later += upper_bound(hand, pointer, pointer + 5 * (play + discards), 1)
+        rest = min(rest, later)
+        return min(total, first + rest), rest
+
+    def _search(self, hand, pointer, plays, discards, need):
+        bound, rest_bound = self._bounds(hand, pointer, plays, discards, need)
+        if bound < need:
+            return False
+        plays_table = self._plays(hand)
+        if plays_table[0][0] >= need:
+            return True
+        if plays == 1 and discards == 0:
+            return False
+
+        if plays > 1:
+            for score, _, rest in plays_table:
+                if score + rest_bound < need:
+                    break
+                child, child_pointer = self._after(rest, pointer)
+                if self._reach(child, child_pointer, plays - 1, discards, need - score):
+                    return True
+        if discards > 0:
+            for _, _, rest in self._discards(hand):
+                child, child_pointer = self._after(rest, pointer)
+                if self._reach(child, child_pointer, plays, discards - 1, need):
+                    return True
+        return False
+
+    def _discards(self, hand):
+        """弃牌方案，先弃掉不在高分出牌中的牌"""
+        return sorted(self._plays(hand), key=lambda play: -len(play[1]))
+
+    def solve(self, hand, deck, plays_left, discards_left, need, time_limit=None):
+        """
+        已知牌堆顺序时精确求解
+
+        参数:
+            hand: 手牌编码序列，按手牌顺序
+            deck: 剩余牌堆编码序列，第一张最先发出
+            plays_left: 剩余出牌次数
+            discards_left: 剩余弃牌次数
+            need: 还需要的分数
+            time_limit: 本次求解的时间上限（秒），为None时使用self.time_limit
+
+        返回:
+            RoundSolution: probability为1或0；能达到时actions为达到目标的行动序列；
+                超时时exact为False，probability为上界1
+        """
+        self._deck = tuple(deck)
+        self._prepare(tuple(hand) + self._deck)
+        self._memo = {}
+        self._play_table = {}
+        self._window_suits = {}  # (已发张数, 窗口结束位置) -> 窗口内各花色张数
+        self._window_bounds = {}  # (窗口开始位置, 窗口结束位置) -> 窗口内牌的统计
+        self.nodes = 0
+        time_limit = self.time_limit if time_limit is None else time_limit
+        self._deadline = None if time_limit is None else time.perf_counter() + time_limit
+        try:
+            success = self._reach(self._canonical(hand), 0, plays_left, discards_left, need)
+            actions = self._plan(list(hand), plays_left, discards_left, need) if success and need > 0 else []
+            solution = RoundSolution(1.0 if success else 0.0, actions, self.nodes)
+        except _Timeout:
+            solution = RoundSolution(1.0, nodes=self.nodes, exact=False)
+        self._memo = self._play_table = self._window_suits = self._window_bounds = None
+        return solution
+
+    def _canonical(self, hand):
+        """手牌的规范形式：计分与顺序无关时排序，否则保持实际顺序"""
+        return tuple(hand) if self._ordered else tuple(sorted(hand))
+
+    def _plan(self, hand, plays, discards, need):
+        """沿记忆化的结果还原达到目标的行动序列，hand为按实际顺序排列的手牌"""
+        actions = []
+        pointer = 0
+        while need > 0:
+            canonical = self._canonical(hand)
+            chosen = None
+            for score, played, rest in self._plays(canonical):
+                child, child_pointer = self._after(rest, pointer)
+                if score >= need or (plays > 1 and self._reach(child, child_pointer, plays - 1, discards, need - score)):
+                    chosen = (Action.PLAY, played, score)
+                    break
+            if chosen is None:
+                for _, played, rest in self._discards(canonical):
+                    child, child_pointer = self._after(rest, pointer)
+                    if discards > 0 and self._reach(child, child_pointer, plays, discards - 1, need):
+                        chosen = (Action.DISCARD, played, 0)
+                        break
+            kind, played, score = chosen
+            if self._ordered:
+                indices = list(played)
+            else:
+                # 把排序后手牌中的索引按编码对应回实际手牌中的索引
+                remaining = [canonical[index] for index in played]
+                indices = []
+                for index, code in enumerate(hand):
+                    if code in remaining:
+                        remaining.remove(code)
+                        indices.append(index)
+            actions.append(Action(kind, indices))
+            selected = set(indices)
+            hand = [code for index, code in enumerate(hand) if index not in selected]
+            draws = min(self.hand_limit - len(hand), len(self._deck) - pointer)
+            if draws > 0:
+                hand.extend(self._deck[pointer:pointer + draws])
+                pointer += draws
+            if kind == Action.PLAY:
+                plays -= 1
+                need -= score
+            else:
+                discards -= 1
+        return actions
+
+    def solve_state(self, state, time_limit=None):
+        """
+        按GameState的实际牌堆顺序精确求解当前回合
+
+        返回:
+            RoundSolution: 同solve，need为目标分数减去当前分数
+        """
+        config = state.config
+        return self.solve(state.hand, state.remaining_deck()[::-1], config.plays_per_round - state.current_plays,
+                          config.discards_per_round - state.current_discards, config.target_score - state.score, time_limit)
+
+    def solve_distribution(self, state, samples=200, seed=None, time_limit=None):
+        """
+        牌堆顺序未知时，对剩余牌堆的顺序采样，逐个精确求解后取平均
+
+        超时未求出的牌堆顺序按能达到目标计入，结果仍是上界，个数记在undecided中。
+
+        参数:
+            state: GameState，只使用其剩余牌堆的组成
+            samples: 采样的牌堆顺序数
+            seed: 随机种子
+            time_limit: 所有采样合计的时间上限（秒），平均分给每个采样；为None时每个采样使用self.time_limit
+
+        返回:
+            RoundSolution: probability为知道牌堆顺序时成功率的估计，stderr为其标准误差
+        """
+        rng = random.Random(seed)
+        successes = 0
+        nodes = 0
+        undecided = 0
+        per_sample = None if time_limit is None else time_limit / samples
+        for _ in range(samples):
+            solution = self.solve_state(state.determinize(rng), per_sample)
+            successes += solution.probability
+            nodes += solution.nodes
+            undecided += not solution.exact
+        probability = successes / samples
+        stderr = math.sqrt(probability * (1 - probability) / samples)
+        return RoundSolution(probability, nodes=nodes, stderr=stderr, samples=samples, exact=undecided == 0, undecided=undecided)
+
+if __name__ == "__main__":
+    import time
+    from engine import GameEngine
+    from game_state import GameState
+    from player import Player
+    from policy import GreedyPolicy
+
+    print("===== 单回合求解测试 =====")
+
+    def with_effects(codes, rng):
+        """给约一半的牌随机加上效果，加倍率和乘倍率同时出现时计分与顺序有关"""
+        return [code + rng.randrange(len(PokerCard.EFFECTS)) * _EFFECT_STRIDE if rng.random() < 0.5 else code
+                for code in codes]
+
+    # 小规模配置下与不剪枝、按完整手牌记忆化的穷举比较：能达到目标当且仅当目标不超过最高总分。
+    # 穷举按play_card的规则：剩余手牌保持顺序，补的牌追加在末尾，出的牌按索引从大到小计分
+    hand_limit, plays_left, discards_left = 5, 3, 2
+    scorer = Player(hand_limit=hand_limit, verbose=False)
+    solver = RoundSolver(scorer=scorer, hand_limit=hand_limit, time_limit=None)
+    mismatches = 0
+    checks = 0
+    ordered = 0
+    for seed in range(10):
+        rng = random.Random(seed)
+        deck = [PokerCard(suit, value).code for suit in PokerCard.SUITS[:4] for value in PokerCard.VALUES[:13]]
+        rng.shuffle(deck)
+        if seed >= 5:
+            deck = with_effects(deck, rng)
+        hand, deck = deck[:hand_limit], deck[hand_limit:]
+        best = {}
+
+        def best_total(cards, pointer, plays, discards):
+            if plays == 0:
+                return 0
+            key = (cards, pointer, plays, discards)
+            if key not in best:
+                result = 0
+                for size in range(1, min(5, len(cards)) + 1):
+                    for indices in combinations(range(len(cards)), size):
+                        played = [PokerCard.from_code(cards[index]) for index in reversed(indices)]
+                        rest = tuple([code for index, code in enumerate(cards) if index not in indices]
+                                     + deck[pointer:pointer + size])
+                        score = scorer.compute_score(played, scorer.poker_hand_rank, [])
+                        result = max(result, score + best_total(rest, pointer + size, plays - 1, discards))
+                        if discards > 0:
+                            result = max(result, best_total(rest, pointer + size, plays, discards - 1))
+                best[key] = result
+            return best[key]
+
+        maximum = best_total(tuple(hand), 0, plays_left, discards_left)
+        for need in (maximum // 2, maximum - 1, maximum, maximum + 1):
+            checks += 1
+            solution = solver.solve(hand, deck, plays_left, discards_left, need)
+            ordered += solver._ordered
+            if solution.probability != (need <= maximum):
+                mismatches += 1
+    print(f"与穷举比较{checks}次（{ordered}次计分与顺序有关）: {'✓ 通过' if mismatches == 0 else f'✗ 失败 {mismatches}'}")
+
+    # 默认配置：按实际牌堆顺序求解，并在GameState上执行给出的行动序列；后10局的牌带随机效果
+    failures = 0
+    reached = 0
+    timings = []
+    for seed in range(20):
+        engine = GameEngine(seed=seed, target_score=800)
+        engine.start()
+        state = GameState.from_engine(engine)
+        if seed >= 10:
+            rng = random.Random(seed)
+            state.hand = tuple(with_effects(state.hand, rng))
+            state.deck = tuple(with_effects(state.deck, rng))
+        start = time.perf_counter()
+        solution = RoundSolver.from_state(state).solve_state(state)
+        timings.append(time.perf_counter() - start)
+        for action in solution.actions:
+            state = state.apply(action)
+        reached += solution.probability == 1
+        if solution.probability and not state.has_won():
+            failures += 1
+    print(f"执行求解给出的行动序列达到目标（{reached}/20局能达到）: {'✓ 通过' if failures == 0 else f'✗ 失败 {failures}'}")
+    print(f"  目标800分: 平均 {sum(timings) / len(timings):.2f}秒，最长 {max(timings):.2f}秒")
+
+    # 接近最高分和达不到的目标：每次求解都在时间限制内返回，未求出的标记为不精确
+    limit = 2.0
+    late = 0
+    for need in (1600, 2500, 4000):
+        timings = []
+        undecided = 0
+        for seed in range(3):
+            engine = GameEngine(seed=seed, target_score=need)
+            engine.start()
+            state = GameState.from_engine(engine)
+            start = time.perf_counter()
+            solution = RoundSolver.from_state(state).solve_state(state, time_limit=limit)
+            timings.append(time.perf_counter() - start)
+            undecided += not solution.exact
+        late += max(timings) > limit + 0.5
+        print(f"  目标{need}分: 最长 {max(timings):.2f}秒，{3 - undecided}/3局精确求出")
+    print(f"求解时间不超过限制{limit}秒: {'✓ 通过' if late == 0 else f'✗ 失败 {late}'}")
+
+    # 牌堆顺序未知：知道牌堆顺序时的成功率应不低于贪心策略
+    engine = GameEngine(seed=0, target_score=600, discards_per_round=0)
+    engine.start()
+    root = GameState.from_engine(engine)
+    solver = RoundSolver.from_state(root)
+    start = time.perf_counter()
+    solution = solver.solve_distribution(root, samples=200, seed=0)
+    elapsed = time.perf_counter() - start
+    policy = GreedyPolicy()
+    rng = random.Random(0)
+    wins = 0
+    for _ in range(200):
+        state = root.determinize(rng)
+        while not state.game_over and state.current_round == root.current_round:
+            state = state.apply(policy.act(state))
+        wins += state.has_won()
+    print(f"目标600分、不弃牌: 求解器上界 {solution.probability:.3f}±{solution.stderr:.3f}（{elapsed:.1f}秒），"
+          f"贪心策略 {wins / 200:.3f}: {'✓ 通过' if solution.probability >= wins / 200 else '✗ 失败'}")
@@ -0,0 +1,183 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card.poker.poker_card import PokerCard
+
+
+class ScoreBreakdown:
+    """
+    一次计分的明细，由调用方预先创建，传给Player.compute_score(..., breakdown=)时原地填写
+
+    不传breakdown时计分路径不变，不产生任何额外开销；同一个对象可以反复使用，
+    每次计分只覆盖其中的数值，数组容量不足时才扩容。
+
+    字段:
+        hand_type: 牌型
+        base_points / base_multiplier: 牌型表给出的基础点数和倍率
+        num_cards: 出牌张数，每张牌的数组只有前num_cards项有效
+        card_codes: 每张牌的整数编码（PokerCard.code），按计分顺序
+        card_chips: 每张牌的筹码
+        effect_points / effect_multipliers: 每张牌自身效果增加的点数和倍率
+        num_jokers: 小丑牌张数，每张小丑牌的数组只有前num_jokers项有效
+        joker_points / joker_multipliers: 每张小丑牌增加的点数和倍率，下标与jokers列表一致；
+            乘倍率效果按生效时倍率的增加量计
+        points / multiplier / score: 总点数、总倍率和最终分数
+    """
+    __slots__ = ('hand_type', 'base_points', 'base_multiplier', 'num_cards', 'card_codes', 'card_chips',
+                 'effect_points', 'effect_multipliers', 'num_jokers', 'joker_points', 'joker_multipliers',
+                 'points', 'multiplier', 'score')
+
+    def __init__(self, max_cards=5, max_jokers=5):
+        """
+        参数:
+            max_cards: 预先分配的出牌张数
+            max_jokers: 预先分配的小丑牌张数
+        """
+        self.card_codes = [0] * max_cards
+        self.card_chips = [0] * max_cards
+        self.effect_points = [0] * max_cards
+        self.effect_multipliers = [0] * max_cards
+        self.joker_points = [0] * max_jokers
+        self.joker_multipliers = [0] * max_jokers
+        self.reset(0, 0)
+
+    def reset(self, num_cards, num_jokers):
+        """
+        开始记录一次计分：清零小丑牌的累计值，容量不足时扩容
+
+        参数:
+            num_cards: 出牌张数
+            num_jokers: 小丑牌张数
+        """
+        if num_cards > len(self.card_codes):
+            extra = [0] * (num_cards - len(self.card_codes))
+            for values in (self.card_codes, self.card_chips, self.effect_points, self.effect_multipliers):
+                values.extend(extra)
+        if num_jokers > len(self.joker_points):
+            extra = [0] * (num_jokers - len(self.joker_points))
+            self.joker_points.extend(extra)
+            self.joker_multipliers.extend(extra)
+        joker_points = self.joker_points
+        joker_multipliers = self.joker_multipliers
+        for index in range(num_jokers):
+            joker_points[index] = 0
+            joker_multipliers[index] = 0
+        self.hand_type = None
+        self.base_points = 0
+        self.base_multiplier = 0
+        self.num_cards = num_cards
+        self.num_jokers = num_jokers
+        self.points = 0
+        self.multiplier = 0
+        self.score = 0
+
+    def as_dict(self):
+        """
+        把有效部分导出为字典，便于记录或比较
+
+        返回:
+            dict: 牌型、基础点数和倍率、每张牌和每张小丑牌的贡献、总点数、总倍率和分数
+        """
+        num_cards = self.num_cards
+        num_jokers = self.num_jokers
+        return {
+            'hand_type': self.hand_type,
+            'base_points': self.base_points,
+            'base_multiplier': self.base_multiplier,
+            'cards': [{
+                'code': self.card_codes[index],
+                'chips': self.card_chips[index],
+                'effect_points': self.effect_points[index],
+                'effect_multiplier': self.effect_multipliers[index]
+            } for index in range(num_cards)],
+            'jokers': [{
+                'points': self.joker_points[index],
+                'multiplier': self.joker_multipliers[index]
+            } for index in range(num_jokers)],
+            'points': self.points,
+            'multiplier': self.multiplier,
+            'score': self.score
+        }
+
+    def format(self, jokers=None):
+        """
+        整理成便于阅读的多行文本
+
+        参数:
+            jokers: 计分时使用的小丑牌列表，用于显示名称；为None时显示下标
+        """
+        lines = [f"牌型: {self.hand_type}，基础点数 {self.base_points}，基础倍率 {self.base_multiplier}"]
+        for index in range(self.num_cards):
+            card = PokerCard.from_code(self.card_codes[index])
+            line = f"  {card}: 筹码 +{self.card_chips[index]}"
+            if self.effect_points[index] or self.effect_multipliers[index]:
+                line += f"，效果 点数+{self.effect_points[index]} 倍率+{self.effect_multipliers[index]:g}"
+            lines.append(line)
+        for index in range(self.num_jokers):
+            name = jokers[index].name if jokers is not None else f"#{index}"
+            lines.append(f"  小丑牌 {name}: 点数+{self.joker_points[index]} 倍率+{self.joker_multipliers[index]:g}")
+        lines.append(f"总点数 {self.points} × 总倍率 {self.multiplier:g} = {self.score}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"ScoreBreakdown(hand_type={self.hand_type!r}, points={self.points}, multiplier={self.multiplier}, score={self.score})"
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    import tracemalloc
+    from card.joker import apply_joker as effects
+    from card.joker.joker import joker
+    from player import Player
+
+    print("===== 计分明细测试 =====")
+    effects.register_joker_effect("红桃", effects.JokerEffect(effects.PER_CARD, effects.ADD_MULT, 3, suits=['Hearts']))
+    effects.register_joker_effect("人头", effects.JokerEffect(effects.PER_CARD, effects.TIMES_MULT, 1.5, values=['J', 'Q', 'K']))
+    effects.register_joker_effect("同花", effects.JokerEffect(effects.PER_HAND, effects.ADD_CHIPS, 40, hand_types=['FLUSH']))
+
+    rng = random.Random(0)
+    player = Player(verbose=False)
+    player.jokers = [joker(name, price=1, effect="测试") for name in ("幸运星", "红桃", "人头", "同花", "小丑王")]
+    hand_rank = player.poker_hand_rank
+    deck = [PokerCard(suit, value, rng.choice(PokerCard.EFFECTS)) for suit in PokerCard.SUITS[:4] for value in PokerCard.VALUES[:13]]
+    hands = [rng.sample(deck, rng.randint(1, 5)) for _ in range(5000)]
+
+    breakdown = ScoreBreakdown()
+    mismatches = 0
+    for hand in hands:
+        score = player.compute_score(hand, hand_rank, player.jokers, breakdown=breakdown)
+        if score != player.compute_score(hand, hand_rank, player.jokers) or score != breakdown.score:
+            mismatches += 1
+            continue
+        # 各部分贡献之和等于总点数和总倍率
+        points = breakdown.base_points + sum(breakdown.card_chips[:breakdown.num_cards]) + \
+            sum(breakdown.effect_points[:breakdown.num_cards]) + sum(breakdown.joker_points[:breakdown.num_jokers])
+        multiplier = breakdown.base_multiplier + sum(breakdown.effect_multipliers[:breakdown.num_cards]) + \
+            sum(breakdown.joker_multipliers[:breakdown.num_jokers])
+        if points != breakdown.points or abs(multiplier - breakdown.multiplier) > 1e-9:
+            mismatches += 1
+    print(f"明细与分数一致、各部分之和等于总数: {'✓ 通过' if mismatches == 0 else f'✗ 失败 {mismatches}'}")
+    print(breakdown.format(player.jokers))
+
+    # 反复使用同一个对象不再分配内存
+    tracemalloc.start()
+    player.compute_score(hands[0], hand_rank, player.jokers, breakdown=breakdown)
+    before = tracemalloc.get_traced_memory()[0]
+    for hand in hands[:1000]:
+        player.compute_score(hand, hand_rank, player.jokers, breakdown=breakdown)
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"复用明细对象1000次，内存增长 {grown}字节")
+
+    plain = Player(verbose=False)
+    for label, scorer in (("0张小丑牌", plain), ("5张小丑牌", player)):
+        jokers = scorer.jokers
+        timings = []
+        for kwargs in ({}, {'breakdown': breakdown}):
+            start = time.perf_counter()
+            for hand in hands:
+                scorer.compute_score(hand, hand_rank, jokers, **kwargs)
+            timings.append((time.perf_counter() - start) / len(hands) * 1e6)
+        print(f"  {label}: 不记录明细 {timings[0]:.2f}微秒/手，记录明细 {timings[1]:.2f}微秒/手")
@@ -0,0 +1,144 @@
+import sys
+import os
+from collections import OrderedDict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card.poker.poker_card import PokerCard
+from card.joker.apply_joker import compile_jokers
+
+# 牌的整数编码中效果下标的权重，见PokerCard.code
+_EFFECT_STRIDE = len(PokerCard.SUITS) * len(PokerCard.VALUES)
+_MULTIPLIER_PLUS_4 = PokerCard.EFFECTS.index('MULTIPLIER_PLUS_4')
+_MULTIPLIER_TIMES_1_5 = PokerCard.EFFECTS.index('MULTIPLIER_TIMES_1_5')
+# 编码不小于此值的牌带有乘倍率效果
+_TIMES_1_5_START = _MULTIPLIER_TIMES_1_5 * _EFFECT_STRIDE
+
+
+class ScoreCache:
+    """
+    计分缓存，按出牌的规范签名缓存compute_score的结果，容量满时淘汰最久未使用的条目
+
+    缓存键由三部分组成：
+        出牌签名：每张牌的整数编码（包含点数、花色和效果）排序后的元组，与出牌顺序无关；
+            同时含有加倍率和乘倍率效果时结果与顺序有关，另外记录倍率效果的顺序；
+            小丑牌有逐张计分的效果时，倍率的增减与牌的顺序有关，另外记录完整的出牌顺序
+        小丑牌指纹：小丑牌编译后的计分流水线的签名，效果相同的小丑牌组合共享条目
+        牌型表编号：HandRankTable的唯一编号
+    每个条目记录计算时所属牌型的版本号，牌型的点数或倍率被修改后，
+    该牌型的条目在下次访问时作废并重新计算，其余牌型的条目不受影响。
+    """
+    def __init__(self, maxsize=4096):
+        """
+        初始化计分缓存
+
+        参数:
+            maxsize (int): 最多缓存的条目数
+        """
+        if maxsize <= 0:
+            raise ValueError("缓存容量必须大于0")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0  # 命中次数
+        self.misses = 0  # 未命中次数
+        self.evictions = 0  # 因容量淘汰的条目数
+        self.invalidations = 0  # 因牌型表修改而作废的条目数
+
+    def make_key(self, hand, hand_rank, jokers):
+        """
+        生成出牌的缓存键
+
+        参数:
+            hand: 出牌列表
+            hand_rank: 牌型判断器
+            jokers: 小丑牌列表
+
+        返回:
+            tuple: 可哈希的缓存键
+        """
+        codes = sorted([card.code for card in hand])
+
+        pipeline = compile_jokers(jokers) if jokers else None
+        order = None
+        if pipeline is not None and pipeline.card_ops:
+            # 逐张触发的小丑牌效果与牌自身的倍率效果交替生效，结果与出牌顺序有关
+            order = tuple([card.code for card in hand])
+        elif codes[-1] >= _TIMES_1_5_START:
+            # 只有加倍率和乘倍率效果同时出现时，计算顺序才会影响结果，此时另外记录倍率效果的顺序
+            effects = [card.code // _EFFECT_STRIDE for card in hand]
+            if _MULTIPLIER_PLUS_4 in effects:
+                order = tuple(effect for effect in effects if effect >= _MULTIPLIER_PLUS_4)
+
+        joker_fingerprint = pipeline.fingerprint if pipeline is not None else ()
+        table = hand_rank.hand_rank
+        return (tuple(codes), order, joker_fingerprint, getattr(table, 'token', id(table)))
+
+    def get(self, key, hand_rank):
+        """
+        查询缓存的分数
+
+        参数:
+            key: make_key生成的缓存键
+            hand_rank: 牌型判断器，用于检查牌型版本
+
+        返回:
+            int: 缓存的分数，未命中或已作废时返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        score, hand_type, version = entry
+        versions = getattr(hand_rank.hand_rank, 'versions', None)
+        if versions is not None and versions.get(hand_type, 0) != version:
+            del self._entries[key]
+            self.invalidations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def put(self, key, hand_type, score, hand_rank):
+        """
+        写入缓存
+
+        参数:
+            key: make_key生成的缓存键
+            hand_type: 出牌的牌型
+            score: 计算得到的分数
+            hand_rank: 牌型判断器，用于记录牌型版本
+        """
+        versions = getattr(hand_rank.hand_rank, 'versions', None)
+        version = versions.get(hand_type, 0) if versions is not None else 0
+        self._entries[key] = (score, hand_type, version)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """清空缓存，保留统计计数"""
+        self._entries.clear()
+
+    def get_stats(self):
+        """
+        获取缓存统计信息
+
+        返回:
+            dict: 包含容量、条目数、命中、未命中、淘汰、作废次数和命中率的字典
+        """
+        lookups = self.hits + self.misses
+        return {
+            'maxsize': self.maxsize,
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,13 +1,137 @@
 import sys
 import os
+import itertools
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from card.poker.poker_card import PokerCard
 
+# 每种点数对应一个质数，点数多重集的质数乘积与牌的顺序无关，可直接作为查表键
+_RANK_PRIMES = dict(zip(PokerCard.VALUES, PokerCard.RANK_PRIMES))
+
+class _HandRankEntry(dict):
+    """
+    单个牌型的点数和倍率，修改时通知所属的HandRankTable
+    """
+    def __init__(self, table, hand_type, values):
+        super().__init__(values)
+        self._table = table
+        self._hand_type = hand_type
+
+    def _touch(self):
+        # pickle恢复时先写入字典内容再恢复属性，此时无需通知
+        table = getattr(self, '_table', None)
+        if table is not None:
+            table._touch(self._hand_type)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._touch()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self._touch()
+        return value
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._touch()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._touch()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._touch()
+
+
+class HandRankTable(dict):
+    """
+    牌型点数倍率表，记录每种牌型被修改的版本号
+
+    直接修改表或其中任一牌型的字典都会使对应牌型的版本号加一，
+    计分缓存据此判断缓存结果是否已经过期。
+    """
+    # 每张表的唯一编号，避免不同的表因id复用而混淆
+    _next_token = 0
+
+    def __init__(self, values=()):
+        super().__init__()
+        HandRankTable._next_token += 1
+        self.token = HandRankTable._next_token
+        self.version = 0
+        self.versions = {}
+        for hand_type, entry in dict(values).items():
+            self[hand_type] = entry
+
+    def __reduce__(self):
+        # 复制或序列化后的表使用新的编号，不与原表的缓存结果混淆
+        return (HandRankTable, ({hand_type: dict(entry) for hand_type, entry in self.items()},))
+
+    def _touch(self, hand_type):
+        self.version += 1
+        self.versions[hand_type] = self.versions.get(hand_type, 0) + 1
+
+    def __setitem__(self, hand_type, entry):
+        super().__setitem__(hand_type, _HandRankEntry(self, hand_type, entry))
+        if hasattr(self, 'versions'):
+            self._touch(hand_type)
+
+    def __delitem__(self, hand_type):
+        super().__delitem__(hand_type)
+        self._touch(hand_type)
+
+    def update(self, *args, **kwargs):
+        for hand_type, entry in dict(*args, **kwargs).items():
+            self[hand_type] = entry
+
+    def setdefault(self, hand_type, default=None):
+        if hand_type not in self:
+            self[hand_type] = default if default is not None else {}
+        return self[hand_type]
+
+    def pop(self, hand_type, *args):
+        if hand_type in self:
+            entry = super().pop(hand_type)
+            self._touch(hand_type)
+            return entry
+        return super().pop(hand_type, *args)
+
+    def popitem(self):
+        hand_type, entry = super().popitem()
+        self._touch(hand_type)
+        return hand_type, entry
+
+    def clear(self):
+        hand_types = list(self)
+        super().clear()
+        for hand_type in hand_types:
+            self._touch(hand_type)
+
+
 class TexasPokerHandRanking:
     """
     德扑牌型等级类，定义了德扑中所有可能的牌型及其对应的点数和倍数
     """
+    # 牌型编码，按牌型由低到高排列，编码即元组下标
+    HAND_TYPES = (
+        'HIGH_CARD', 'ONE_PAIR', 'TWO_PAIR', 'THREE_OF_A_KIND', 'STRAIGHT',
+        'FLUSH', 'FULL_HOUSE', 'FOUR_OF_A_KIND', 'STRAIGHT_FLUSH', 'ROYAL_FLUSH'
+    )
+    HAND_TYPE_CODES = {hand_type: code for code, hand_type in enumerate(HAND_TYPES)}
+
+    # 查表分类器使用的牌型表，首次使用时构建，所有实例共享
+    _hand_type_table = None
     def __init__(self):
         """
         初始化德扑牌型
@@ -25,6 +149,17 @@ class TexasPokerHandRanking:
             'HIGH_CARD': {'points': 5, 'multiplier': 1.0}
         }
     
+    @property
+    def hand_rank(self):
+        """牌型点数倍率表，整体替换时自动转换为HandRankTable以便跟踪修改"""
+        return self._hand_rank
+
+    @hand_rank.setter
+    def hand_rank(self, table):
+        if not isinstance(table, HandRankTable):
+            table = HandRankTable(table)
+        self._hand_rank = table
+
     def get_points(self, hand_type):
         """
         获取牌型对应的点数
@@ -97,6 +232,86 @@ class TexasPokerHandRanking:
             return 'ONE_PAIR'
         else:
             return 'HIGH_CARD'
+
+    def get_hand_type_fast(self, cards):
+        """
+        查表版本的牌型判断，结果与get_hand_type完全一致
+
+        以点数多重集签名（质数乘积）加同花标志为键查预先计算的牌型表，
+        每次判断只需遍历一次手牌，不再重复统计点数。
+        为了速度只检查牌的数量，不逐张检查是否为PokerCard对象。
+
+        参数:
+            cards: 包含1-5张PokerCard对象的列表
+
+        返回:
+            牌型类型字符串
+        """
+        count = len(cards)
+        if count < 1 or count > 5:
+            raise ValueError("输入必须是包含1-5张牌的列表")
+
+        table = TexasPokerHandRanking._hand_type_table
+        if table is None:
+            table = self._build_hand_type_table()
+
+        key = 1
+        for card in cards:
+            key *= card.prime
+        key <<= 1
+
+        # 只有5张牌才可能构成同花
+        if count == 5:
+            suit = cards[0].suit_code
+            if cards[1].suit_code == suit and cards[2].suit_code == suit and cards[3].suit_code == suit and cards[4].suit_code == suit:
+                key |= 1
+
+        return table[key]
+
+    def get_hand_types_batch(self, cards):
+        """
+        批量判断牌型
+
+        参数:
+            cards: 形状为(N, 5)的整数编码数组，空位为PAD_CARD，可用utils.batch_scoring.encode_hands生成
+
+        返回:
+            numpy.ndarray: 牌型编码数组，对应HAND_TYPES的下标，空行为-1
+        """
+        # numpy只在批量判断时需要，延迟导入
+        from utils.batch_scoring import batch_get_hand_types
+        return batch_get_hand_types(cards)
+
+    @classmethod
+    def _build_hand_type_table(cls):
+        """
+        构建查表分类器使用的牌型表
+
+        枚举1-5张牌所有可能的点数多重集（包括stone和重复的牌），5张牌时再区分是否同花，
+        用get_hand_type对代表牌组判断牌型，保证查表结果与逐条规则判断一致。
+
+        返回:
+            dict: 签名键到牌型字符串的映射
+        """
+        reference = cls()
+        table = {}
+        for count in range(1, 6):
+            for values in itertools.combinations_with_replacement(PokerCard.VALUES, count):
+                key = 1
+                for value in values:
+                    key *= _RANK_PRIMES[value]
+                key <<= 1
+
+                # 非同花：第一张牌用不同的花色
+                cards = [PokerCard('Hearts' if i == 0 else 'Spades', value) for i, value in enumerate(values)]
+                table[key] = reference.get_hand_type(cards)
+
+                if count == 5:
+                    cards = [PokerCard('Spades', value) for value in values]
+                    table[key | 1] = reference.get_hand_type(cards)
+
+        cls._hand_type_table = table
+        return table
     
     def _is_royal_flush(self, cards, values, suits):
         """判断是否为皇家同花顺：同一花色的10, J, Q, K, A"""
@@ -393,6 +608,26 @@ if __name__ == "__main__":
             print(f"\n测试 {i+1}: 错误 - {str(e)}")
     
     print("\n===== 测试完成 =====")
+
+    # 查表分类器与逐条规则判断的一致性测试：52张牌的所有1-5张子集，以及包含stone的组合
+    print("\n===== 查表牌型判断一致性测试 =====")
+    import time
+    deck = [PokerCard(suit, value) for suit in ['Spades', 'Hearts', 'Clubs', 'Diamonds'] for value in PokerCard.VALUES[:-1]]
+    stones = [PokerCard('No_suits', 'stone') for _ in range(4)]
+    mismatches = 0
+    checked = 0
+    start = time.perf_counter()
+    for count in range(1, 6):
+        for combo in itertools.chain(itertools.combinations(deck, count),
+                                     itertools.combinations(deck[:13] + stones, count)):
+            cards = list(combo)
+            if hand_ranking.get_hand_type_fast(cards) != hand_ranking.get_hand_type(cards):
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"不一致: {cards}")
+            checked += 1
+    print(f"共检查 {checked} 组牌，不一致 {mismatches} 组，用时 {time.perf_counter() - start:.1f}秒")
+    print(f"测试结果: {'✓ 通过' if mismatches == 0 else '✗ 失败'}")
     
     
     
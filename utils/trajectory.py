@@ -0,0 +1,343 @@
+import sys
+import os
+import glob
+import json
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.observation import ObservationEncoder
+from utils.batch_scoring import PAD_CARD, batch_compute_score
+from utils.texas_poker_hand_ranking import TexasPokerHandRanking
+from card.joker.apply_joker import compile_jokers
+
+# 行动类型的编码，对应engine.Action.KINDS的顺序
+ACTION_KINDS = ('play', 'discard', 'tarot', 'buy_joker', 'buy_tarot', 'sell_joker', 'sell_tarot', 'refresh_shop')
+_ACTION_KIND_CODES = {kind: code for code, kind in enumerate(ACTION_KINDS)}
+_PLAY = _ACTION_KIND_CODES['play']
+
+# 每步记录的列，(列名, 数据类型, 每行的形状)，形状中的字符串在分配时换成观测、行动掩码的长度和手牌上限
+STEP_COLUMNS = (
+    ('game_id', np.int64, ()),
+    ('step', np.int32, ()),
+    ('observation', np.float32, ('observation',)),
+    ('action_mask', np.bool_, ('action_mask',)),
+    ('action_kind', np.int8, ()),
+    ('action_index', np.int16, ()),
+    ('action_cards', np.bool_, ('hand_limit',)),
+    ('success', np.bool_, ()),
+    ('score_delta', np.int32, ()),
+    ('played_cards', np.int16, (5,)),
+    ('hand_type', np.int8, ()),
+    ('base_points', np.int32, ()),
+    ('base_multiplier', np.float32, ()),
+    ('points', np.int32, ()),
+    ('multiplier', np.float32, ()),
+    ('score', np.int32, ())
+)
+# 每个记录器的对局编号占用的区间，记录器writer的编号从writer * GAME_ID_STRIDE开始
+GAME_ID_STRIDE = 1 << 32
+# 每局一行的汇总表
+GAME_COLUMNS = (
+    ('game_id', np.int64),
+    ('won', np.bool_),
+    ('final_score', np.int32),
+    ('target_score', np.int32),
+    ('rounds', np.int16),
+    ('num_steps', np.int32)
+)
+
+
+class _PointsSnapshot:
+    """某一时刻牌型点数倍率表的副本，提供与TexasPokerHandRanking相同的get_points"""
+    __slots__ = ('points',)
+
+    def __init__(self, hand_rank):
+        self.points = {hand_type: hand_rank.get_points(hand_type) for hand_type in TexasPokerHandRanking.HAND_TYPES}
+
+    def get_points(self, hand_type):
+        return self.points[hand_type]
+
+
+class TrajectoryRecorder:
+    """
+    按列记录对局轨迹，写满一块就压缩写入磁盘，内存占用只取决于块大小
+
+    每个决策点（GameEngine.step）记录一行：行动前的观测和行动掩码、选择的行动、
+    是否成功、分数变化，出牌时另外记录打出的牌的编码和计分明细
+    （牌型编码对应TexasPokerHandRanking.HAND_TYPES，未出牌时为-1）。
+    计分明细在写块时用batch_compute_score一次算出整块，所用的点数倍率表副本和小丑牌是块内各步共同的，
+    点数倍率表或小丑牌的计分效果变化时先写出当前块。
+    每局结束时在汇总表中记录一行。
+
+    多个记录器（如每个工作进程一个）可以写入同一目录，用不同的writer编号区分：
+    块文件名和对局编号都按writer分开，互不覆盖。再次打开目录时从该writer已有的块之后继续编号。
+
+    输出目录中：
+        meta.json: 列的布局、观测和行动掩码各部分的位置、牌型和行动类型的编码，各记录器共用
+        steps-0000-00000.npz, steps-0000-00001.npz, ...: writer 0的决策点列块
+        games-0000-00000.npz, ...: 与同编号步块一起写出的对局汇总块
+    """
+    def __init__(self, directory, chunk_size=65536, compress=True, writer=0):
+        """
+        初始化记录器
+
+        参数:
+            directory: 输出目录，不存在时创建
+            chunk_size: 每块的决策点数
+            compress: 是否用np.savez_compressed压缩
+            writer: 记录器编号，0到9999，同时写入同一目录的记录器必须使用不同的编号
+        """
+        if not 0 <= writer < 10000:
+            raise ValueError("记录器编号必须在0到9999之间")
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.writer = writer
+        os.makedirs(directory, exist_ok=True)
+        self.encoder = None
+        self._columns = None
+        self._games = {name: [] for name, _ in GAME_COLUMNS}
+        self._rows = 0  # 当前块已写入的行数
+        self._chunk_index, self._next_game_id = self._resume()
+        self._points = None  # 当前块使用的点数倍率表副本
+        self._rank_table = None
+        self._rank_version = None
+        self._jokers = None  # 当前块使用的小丑牌
+        self._pending = None  # 当前步行动前的状态
+
+    def _chunk_path(self, prefix, index):
+        return os.path.join(self.directory, f'{prefix}-{self.writer:04d}-{index:05d}.npz')
+
+    def _resume(self):
+        """
+        从本writer已写出的块之后继续编号，避免覆盖已有的块和重复的对局编号
+
+        返回:
+            tuple: (下一块的编号, 下一局的编号)
+        """
+        next_game_id = self.writer * GAME_ID_STRIDE
+        paths = sorted(glob.glob(os.path.join(self.directory, f'steps-{self.writer:04d}-*.npz')))
+        if not paths:
+            return 0, next_game_id
+        last = int(os.path.basename(paths[-1])[len('steps-0000-'):-len('.npz')])
+        # 对局编号递增，最后一块中的编号最大
+        for path in (paths[-1], self._chunk_path('games', last)):
+            if os.path.exists(path):
+                with np.load(path) as chunk:
+                    game_ids = chunk['game_id']
+                if len(game_ids):
+                    next_game_id = max(next_game_id, int(game_ids.max()) + 1)
+        return last + 1, next_game_id
+
+    def _allocate(self, engine):
+        """按第一局的手牌上限和小丑牌名称分配块缓冲区并写出meta.json"""
+        environment = engine.environment
+        self.encoder = ObservationEncoder(engine.player.hand_limit, environment.joker_names)
+        sizes = {
+            'observation': len(self.encoder.observation),
+            'action_mask': len(self.encoder.action_mask),
+            'hand_limit': engine.player.hand_limit
+        }
+        self._columns = {}
+        for name, dtype, shape in STEP_COLUMNS:
+            shape = tuple(sizes.get(dim, dim) for dim in shape)
+            self._columns[name] = np.empty((self.chunk_size,) + shape, dtype=dtype)
+
+        meta = {
+            'step_columns': {name: {'dtype': np.dtype(dtype).name, 'shape': list(self._columns[name].shape[1:])} for name, dtype, _ in STEP_COLUMNS},
+            'game_columns': {name: np.dtype(dtype).name for name, dtype in GAME_COLUMNS},
+            'observation_slices': {name: [part.start, part.stop] for name, part in self.encoder.slices.items()},
+            'action_mask_slices': {name: [part.start, part.stop] for name, part in self.encoder.mask_slices.items()},
+            'hand_types': list(TexasPokerHandRanking.HAND_TYPES),
+            'action_kinds': list(ACTION_KINDS),
+            'joker_names': list(environment.joker_names),
+            'hand_limit': engine.player.hand_limit
+        }
+        path = os.path.join(self.directory, 'meta.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                if json.load(f) != meta:
+                    raise ValueError(f"{self.directory}中已有布局不同的轨迹，请使用新的目录")
+            return
+        # 先写临时文件再替换，多个记录器同时写入时不会读到写了一半的文件
+        temporary = f'{path}.{self.writer}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(temporary, path)
+
+    def begin_game(self, engine):
+        """开始记录一局，由GameEngine.start调用"""
+        if self._columns is None:
+            self._allocate(engine)
+        self._check_scoring(engine.player)
+        engine.game_id = self._next_game_id
+        engine.recorded_steps = 0
+        self._next_game_id += 1
+
+    def _check_scoring(self, player):
+        """点数倍率表或小丑牌的计分效果与当前块不同时先写出当前块，再换用新的"""
+        pipeline = compile_jokers(player.jokers)
+        if self._jokers is not None and pipeline.fingerprint != compile_jokers(self._jokers).fingerprint and self._rows:
+            self.flush()
+        self._jokers = tuple(player.jokers)
+
+        hand_rank = player.poker_hand_rank
+        table = hand_rank.hand_rank
+        version = getattr(table, 'version', None)
+        if table is self._rank_table and version is not None and version == self._rank_version:
+            return
+        points = _PointsSnapshot(hand_rank)
+        if self._points is not None and points.points != self._points.points and self._rows:
+            self.flush()
+        self._points = points
+        self._rank_table = table
+        self._rank_version = version
+
+    def before_step(self, engine, action):
+        """在行动执行前记录观测、行动掩码和要打出的牌"""
+        self._check_scoring(engine.player)
+        columns = self._columns
+        row = self._rows
+        columns['observation'][row] = self.encoder.encode(engine.environment, engine.current_round, engine.game_over)
+        columns['action_mask'][row] = self.encoder.action_mask
+
+        played = columns['played_cards'][row]
+        played.fill(PAD_CARD)
+        selection = columns['action_cards'][row]
+        selection.fill(False)
+        hand = engine.player.hand
+        indices = action.card_indices or ()
+        for index in indices:
+            if 0 <= index < len(selection):
+                selection[index] = True
+        kind = _ACTION_KIND_CODES[action.kind]
+        if kind == _PLAY and 0 < len(indices) <= 5 and all(0 <= index < len(hand) for index in indices):
+            # 与play_card相同，按索引从大到小的顺序
+            for slot, index in enumerate(sorted(indices, reverse=True)):
+                played[slot] = hand[index].code
+
+        columns['action_kind'][row] = kind
+        columns['action_index'][row] = -1 if action.index is None else action.index
+        self._pending = engine.player.score
+
+    def after_step(self, engine, success):
+        """在行动执行后记录结果，写满一块时写入磁盘"""
+        columns = self._columns
+        row = self._rows
+        columns['game_id'][row] = engine.game_id
+        columns['step'][row] = engine.recorded_steps
+        columns['success'][row] = success
+        columns['score_delta'][row] = engine.player.score - self._pending
+        if not success:
+            columns['played_cards'][row].fill(PAD_CARD)
+        engine.recorded_steps += 1
+        self._rows += 1
+
+        if engine.game_over:
+            self.end_game(engine)
+        if self._rows == self.chunk_size:
+            self.flush()
+
+    def end_game(self, engine):
+        """在汇总表中记录一局的结果"""
+        player = engine.player
+        games = self._games
+        games['game_id'].append(engine.game_id)
+        games['won'].append(player.has_won())
+        games['final_score'].append(player.score)
+        games['target_score'].append(player.target_score)
+        games['rounds'].append(min(engine.current_round, engine.max_rounds))
+        games['num_steps'].append(engine.recorded_steps)
+
+    def flush(self):
+        """把当前块和已结束的对局写入磁盘"""
+        if self._columns is None or (self._rows == 0 and not self._games['game_id']):
+            return
+        rows = self._rows
+        columns = {name: array[:rows] for name, array in self._columns.items()}
+
+        # 计分明细整块计算，未出牌的行全为空位
+        if rows:
+            breakdown = batch_compute_score(columns['played_cards'].astype(np.int64), self._points, self._jokers)
+            columns['hand_type'][:] = breakdown['hand_types']
+            columns['base_points'][:] = breakdown['base_points']
+            columns['base_multiplier'][:] = breakdown['base_multipliers']
+            columns['points'][:] = breakdown['points']
+            columns['multiplier'][:] = breakdown['multipliers']
+            columns['score'][:] = breakdown['scores']
+
+        save = np.savez_compressed if self.compress else np.savez
+        save(self._chunk_path('steps', self._chunk_index), **columns)
+        games = {name: np.asarray(self._games[name], dtype=dtype) for name, dtype in GAME_COLUMNS}
+        save(self._chunk_path('games', self._chunk_index), **games)
+
+        self._chunk_index += 1
+        self._rows = 0
+        for values in self._games.values():
+            values.clear()
+
+    def close(self):
+        """写出剩余的数据"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    import glob
+    import random
+    import tempfile
+    import time
+    import tracemalloc
+    from engine import Action, GameEngine
+
+    print("===== 轨迹记录测试 =====")
+    rng = random.Random(0)
+
+    def policy(engine):
+        hand_size = len(engine.player.hand)
+        indices = rng.sample(range(hand_size), rng.randint(1, min(5, hand_size)))
+        return Action.play(indices) if rng.random() < 0.8 or not engine.can_discard() else Action.discard(indices)
+
+    with tempfile.TemporaryDirectory() as directory:
+        num_games = 2000
+        tracemalloc.start()
+        start = time.perf_counter()
+        with TrajectoryRecorder(directory, chunk_size=4096) as recorder:
+            for game in range(num_games):
+                engine = GameEngine(seed=game, recorder=recorder)
+                engine.run(policy)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        steps = [np.load(path) for path in sorted(glob.glob(os.path.join(directory, 'steps-*.npz')))]
+        games = [np.load(path) for path in sorted(glob.glob(os.path.join(directory, 'games-*.npz')))]
+        total_steps = sum(len(chunk['game_id']) for chunk in steps)
+        total_games = sum(len(chunk['game_id']) for chunk in games)
+        size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, '*.npz')))
+        print(f"{num_games}局，{total_steps}个决策点，{len(steps)}块，共 {size / 1024:.0f}KB，每局 {elapsed / num_games * 1000:.2f}毫秒，内存峰值 {peak / 1024 / 1024:.1f}MB")
+
+        # 出牌成功的行，分数变化应等于计分明细
+        consistent = True
+        for chunk in steps:
+            played = chunk['success'] & (chunk['action_kind'] == _PLAY)
+            consistent &= bool(np.all(chunk['score_delta'][played] == chunk['score'][played]))
+            consistent &= bool(np.all(chunk['hand_type'][~played] == -1))
+        print(f"汇总表局数 {total_games}/{num_games}，分数变化与计分明细一致: {'✓ 通过' if consistent and total_games == num_games else '✗ 失败'}")
+
+        # 再次打开同一目录继续写入，另一个记录器用不同的writer编号同时写入
+        with TrajectoryRecorder(directory, chunk_size=4096) as reopened, \
+                TrajectoryRecorder(directory, chunk_size=4096, writer=1) as other:
+            for game in range(100):
+                GameEngine(seed=game, recorder=reopened).run(policy)
+                GameEngine(seed=game, recorder=other).run(policy)
+        game_ids = np.concatenate([np.load(path)['game_id'] for path in sorted(glob.glob(os.path.join(directory, 'games-*.npz')))])
+        kept = sum(len(np.load(path)['game_id']) for path in sorted(glob.glob(os.path.join(directory, 'steps-*.npz'))))
+        unique = len(np.unique(game_ids)) == len(game_ids) == num_games + 200
+        print(f"重新打开和多个记录器写入同一目录，块不被覆盖、对局编号不重复: {'✓ 通过' if unique and kept > total_steps else '✗ 失败'}")
@@ -0,0 +1,329 @@
+import sys
+import os
+import glob
+import json
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.texas_poker_hand_ranking import TexasPokerHandRanking
+
+# 合并后的列存放的子目录，每列一个.npy文件
+STEPS_DIR = 'steps'
+GAMES_DIR = 'games'
+
+
+def _chunk_paths(directory, prefix):
+    return sorted(glob.glob(os.path.join(directory, f'{prefix}-*.npz')))
+
+
+def _consolidate_chunks(paths, target):
+    """把同一前缀的各块按顺序拼接成每列一个.npy文件，每次只解压一块中的一列"""
+    os.makedirs(target, exist_ok=True)
+    if not paths:
+        return
+    with np.load(paths[0]) as first:
+        names = list(first.files)
+    lengths = []
+    for path in paths:
+        with np.load(path) as chunk:
+            lengths.append(len(chunk[names[0]]))
+    total = sum(lengths)
+
+    for name in names:
+        output = None
+        offset = 0
+        for path, length in zip(paths, lengths):
+            with np.load(path) as chunk:
+                values = chunk[name]
+            if output is None:
+                output = np.lib.format.open_memmap(os.path.join(target, name + '.npy.tmp'), mode='w+', dtype=values.dtype, shape=(total,) + values.shape[1:])
+            output[offset:offset + length] = values
+            offset += length
+        output.flush()
+        del output
+        os.replace(os.path.join(target, name + '.npy.tmp'), os.path.join(target, name + '.npy'))
+
+
+def consolidate_trajectories(directory, force=False):
+    """
+    把TrajectoryRecorder写出的压缩块合并成可内存映射的列文件
+
+    压缩的.npz无法内存映射，合并后每列一个未压缩的.npy文件，
+    存放在directory/steps和directory/games中。已合并且块没有更新时直接返回。
+
+    参数:
+        directory: 记录器的输出目录
+        force: 是否强制重新合并
+    """
+    step_paths = _chunk_paths(directory, 'steps')
+    game_paths = _chunk_paths(directory, 'games')
+    stamp_path = os.path.join(directory, STEPS_DIR, '.chunks')
+    stamp = json.dumps([os.path.basename(path) for path in step_paths + game_paths])
+    if not force and os.path.exists(stamp_path):
+        with open(stamp_path, encoding='utf-8') as f:
+            if f.read() == stamp:
+                return
+
+    _consolidate_chunks(step_paths, os.path.join(directory, STEPS_DIR))
+    _consolidate_chunks(game_paths, os.path.join(directory, GAMES_DIR))
+    with open(stamp_path, 'w', encoding='utf-8') as f:
+        f.write(stamp)
+
+
+def _hand_type_code(hand_type):
+    """牌型名称或编码转为TexasPokerHandRanking中的编码"""
+    if isinstance(hand_type, str):
+        return TexasPokerHandRanking.HAND_TYPE_CODES[hand_type]
+    return int(hand_type)
+
+
+class TrajectoryDataset:
+    """
+    内存映射的轨迹数据集，按行随机访问、打乱分批和筛选，不把整个数据集读入内存
+
+    各列通过np.load(mmap_mode='r')映射，只有实际访问的页才会读入；
+    多个进程打开同一目录时共享操作系统的页缓存。数据集对象可以pickle，
+    传给子进程时只传目录和行索引，在子进程中重新映射。
+
+    牌型列的编码与TexasPokerHandRanking.HAND_TYPE_CODES一致，-1表示该步没有出牌。
+    """
+    def __init__(self, directory, indices=None, consolidate=True):
+        """
+        打开数据集
+
+        参数:
+            directory: TrajectoryRecorder的输出目录
+            indices: 选中的行号数组，为None时包含全部行
+            consolidate: 是否先合并尚未合并的块
+        """
+        self.directory = directory
+        if consolidate:
+            consolidate_trajectories(directory)
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self._open()
+        self.indices = None if indices is None else np.asarray(indices, dtype=np.int64)
+
+    def _open(self):
+        """映射各列文件，并建立对局编号到对局汇总行的查找表"""
+        self.columns = self._map(STEPS_DIR)
+        self.games = self._map(GAMES_DIR)
+        # 对局结果按对局编号排序，编号按记录器分段，不连续，用二分查找
+        if 'game_id' in self.games and len(self.games['game_id']):
+            game_ids = np.asarray(self.games['game_id'])
+            order = np.argsort(game_ids, kind='stable')
+            self._game_ids = game_ids[order]
+            self._game_won = (np.asarray(self.games['final_score']) >= np.asarray(self.games['target_score']))[order].astype(np.int8)
+        else:
+            self._game_ids = np.empty(0, dtype=np.int64)
+            self._game_won = np.empty(0, dtype=np.int8)
+
+    def _outcomes_of(self, rows):
+        """
+        各行所在对局的结果
+
+        返回:
+            numpy.ndarray: 1为获胜，0为失败，-1为未结束（汇总表中没有）
+        """
+        game_ids = np.asarray(self.columns['game_id'])[rows]
+        if not len(self._game_ids):
+            return np.full(len(game_ids), -1, dtype=np.int8)
+        positions = np.minimum(np.searchsorted(self._game_ids, game_ids), len(self._game_ids) - 1)
+        return np.where(self._game_ids[positions] == game_ids, self._game_won[positions], -1).astype(np.int8)
+
+    def _map(self, subdirectory):
+        paths = glob.glob(os.path.join(self.directory, subdirectory, '*.npy'))
+        return {os.path.basename(path)[:-4]: np.load(path, mmap_mode='r') for path in paths}
+
+    def __getstate__(self):
+        return {'directory': self.directory, 'indices': self.indices}
+
+    def __setstate__(self, state):
+        self.__init__(state['directory'], state['indices'], consolidate=False)
+
+    def __len__(self):
+        if self.indices is not None:
+            return len(self.indices)
+        return len(self.columns['game_id']) if 'game_id' in self.columns else 0
+
+    def _all_rows(self):
+        """数据集包含的全部行号"""
+        return np.arange(len(self.columns['game_id'])) if self.indices is None else self.indices
+
+    def _rows(self, rows):
+        """数据集中的位置转为列文件中的行号"""
+        if self.indices is None:
+            return rows
+        return self.indices[rows]
+
+    def __getitem__(self, item):
+        """
+        按位置取数据
+
+        参数:
+            item: 整数、切片或整数数组
+
+        返回:
+            dict: 列名到数据的字典，整数返回单行，其余返回一批
+        """
+        if isinstance(item, slice):
+            item = np.arange(len(self))[item]
+        return self.get(item)
+
+    def get(self, rows, columns=None):
+        """
+        读取指定位置的若干列
+
+        参数:
+            rows: 整数或整数数组
+            columns: 列名列表，为None时读取全部列
+
+        返回:
+            dict: 列名到numpy数组的字典（从映射中复制出来，可以修改）
+        """
+        rows = self._rows(rows)
+        names = self.columns if columns is None else columns
+        if np.ndim(rows) == 0:
+            return {name: np.array(self.columns[name][rows]) for name in names}
+        rows = np.asarray(rows, dtype=np.int64)
+        # 排序后读取，相邻的行落在同一页上，再按原顺序排列
+        order = np.argsort(rows, kind='stable')
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        sorted_rows = rows[order]
+        return {name: self.columns[name][sorted_rows][inverse] for name in names}
+
+    def outcomes(self):
+        """
+        每行所在对局的结果
+
+        返回:
+            numpy.ndarray: 1为获胜，0为失败，-1为对局未结束
+        """
+        return self._outcomes_of(self._all_rows())
+
+    def filter(self, won=None, hand_types=None, success=None):
+        """
+        按条件筛选行，返回共享同一映射的新数据集
+
+        参数:
+            won: True只保留获胜对局的行，False只保留失败对局的行（未结束的对局都不保留）
+            hand_types: 牌型名称或编码的列表，只保留打出这些牌型的行
+            success: True/False只保留行动成功/失败的行
+
+        返回:
+            TrajectoryDataset: 筛选后的数据集
+        """
+        rows = self._all_rows()
+        keep = np.ones(len(rows), dtype=bool)
+        if won is not None:
+            keep &= self._outcomes_of(rows) == int(bool(won))
+        if hand_types is not None:
+            codes = [_hand_type_code(hand_type) for hand_type in hand_types]
+            keep &= np.isin(np.asarray(self.columns['hand_type'])[rows], codes)
+        if success is not None:
+            keep &= np.asarray(self.columns['success'])[rows] == bool(success)
+        return self._view(rows[keep])
+
+    def _view(self, indices):
+        """共享映射和查找表的新数据集"""
+        view = object.__new__(TrajectoryDataset)
+        view.directory = self.directory
+        view.meta = self.meta
+        view.columns = self.columns
+        view.games = self.games
+        view._game_ids = self._game_ids
+        view._game_won = self._game_won
+        view.indices = indices
+        return view
+
+    def shard(self, worker_index, num_workers):
+        """
+        多进程读取时每个进程取其中一份，份与份之间不重叠
+
+        参数:
+            worker_index: 进程序号，从0开始
+            num_workers: 进程总数
+
+        返回:
+            TrajectoryDataset: 该进程负责的行
+        """
+        rows = self._all_rows()
+        return self._view(rows[worker_index::num_workers])
+
+    def iter_batches(self, batch_size, shuffle=True, seed=None, drop_last=False, columns=None):
+        """
+        分批遍历数据集
+
+        参数:
+            batch_size: 每批的行数
+            shuffle: 是否打乱顺序
+            seed: 打乱使用的随机种子
+            drop_last: 是否丢弃不足一批的最后部分
+            columns: 要读取的列名列表，为None时读取全部列
+
+        返回:
+            迭代器，每次给出一批的列字典
+        """
+        size = len(self)
+        order = np.random.default_rng(seed).permutation(size) if shuffle else np.arange(size)
+        stop = size - size % batch_size if drop_last else size
+        for start in range(0, stop, batch_size):
+            yield self.get(order[start:start + batch_size], columns)
+
+
+def _worker_sum(dataset, worker_index, num_workers):
+    """多进程测试：每个进程读取自己那一份的分数变化之和"""
+    total = 0
+    for batch in dataset.shard(worker_index, num_workers).iter_batches(1024, seed=worker_index, columns=['score_delta']):
+        total += int(batch['score_delta'].sum())
+    return total
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    from engine import Action, GameEngine
+    from utils.trajectory import TrajectoryRecorder
+
+    print("===== 轨迹数据集测试 =====")
+    rng = random.Random(0)
+
+    def policy(engine):
+        hand_size = len(engine.player.hand)
+        indices = rng.sample(range(hand_size), rng.randint(1, min(5, hand_size)))
+        return Action.play(indices) if rng.random() < 0.8 or not engine.can_discard() else Action.discard(indices)
+
+    with tempfile.TemporaryDirectory() as directory:
+        with TrajectoryRecorder(directory, chunk_size=1000) as recorder:
+            for game in range(1000):
+                GameEngine(seed=game, max_rounds=2, recorder=recorder).run(policy)
+
+        dataset = TrajectoryDataset(directory)
+        steps = [np.load(path) for path in _chunk_paths(directory, 'steps')]
+        expected = np.concatenate([chunk['score_delta'] for chunk in steps])
+        print(f"{len(dataset)}行，{len(steps)}块，score_delta为内存映射: {'✓' if isinstance(dataset.columns['score_delta'], np.memmap) else '✗'}")
+
+        rows = np.random.default_rng(0).integers(0, len(dataset), 500)
+        print(f"随机访问与原始块一致: {'✓ 通过' if np.array_equal(dataset.get(rows)['score_delta'], expected[rows]) else '✗ 失败'}")
+
+        seen = np.concatenate([batch['game_id'] * 10000 + batch['step'] for batch in dataset.iter_batches(256, seed=1, columns=['game_id', 'step'])])
+        print(f"打乱分批覆盖每行恰好一次: {'✓ 通过' if len(np.unique(seen)) == len(dataset) == len(seen) else '✗ 失败'}")
+
+        won = dataset.filter(won=True)
+        lost = dataset.filter(won=False)
+        games = dataset.games
+        won_games = set(np.asarray(games['game_id'])[np.asarray(games['final_score']) >= np.asarray(games['target_score'])])
+        won_ok = set(np.unique(won.get(np.arange(len(won)), ['game_id'])['game_id'])) == won_games
+        print(f"按结果筛选 获胜{len(won)}行 失败{len(lost)}行，与汇总表一致: {'✓ 通过' if won_ok and len(won) + len(lost) <= len(dataset) else '✗ 失败'}")
+
+        pairs = dataset.filter(hand_types=['ONE_PAIR'], success=True)
+        pair_code = TexasPokerHandRanking.HAND_TYPE_CODES['ONE_PAIR']
+        print(f"按牌型筛选 一对{len(pairs)}行: {'✓ 通过' if len(pairs) and np.all(pairs[:]['hand_type'] == pair_code) else '✗ 失败'}")
+
+        workers = 4
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            totals = list(executor.map(_worker_sum, [dataset] * workers, range(workers), [workers] * workers))
+        print(f"{workers}个进程分片读取的总和一致: {'✓ 通过' if sum(totals) == int(expected.sum()) else '✗ 失败'}")
@@ -0,0 +1,248 @@
+import numpy as np
+
+from card.poker.poker_card import PokerCard
+from utils.texas_poker_hand_ranking import TexasPokerHandRanking
+from utils.batch_scoring import PAD_CARD, batch_compute_score
+
+
+class VecEnv:
+    """
+    向量化的多局游戏环境，同步推进大量相互独立的对局
+
+    所有对局的牌堆、手牌、分数、出牌/弃牌次数和资金都存放在预先分配的numpy数组中，
+    不为每局创建Environment和Player对象。规则与GameEngine一致：
+        出牌和弃牌的校验同Player.play_card/discard_card，成功后补牌到手牌上限；
+        出牌按手牌索引从大到小的顺序计分，计分同Player.compute_score；
+        出牌次数用完时回合结束，超过回合上限或达到目标分数时对局结束。
+    结束的对局会在同一次step中自动重置为新的一局。
+    牌堆只包含52张标准牌，不涉及商店、塔罗牌和小丑牌。
+    """
+    PLAY = 0
+    DISCARD = 1
+
+    # 52张标准牌的编码，花色为SUITS的前四种，点数为A到K
+    STANDARD_CODES = np.array([PokerCard(suit, value).code for suit in PokerCard.SUITS[:4] for value in PokerCard.VALUES[:-1]], dtype=np.int64)
+
+    def __init__(self, num_envs, seed=None, initial_funds=4, target_score=200, hand_limit=8,
+                 plays_per_round=4, discards_per_round=3, max_rounds=10, hand_rank=None):
+        """
+        初始化向量化环境
+
+        参数:
+            num_envs: 同时进行的对局数
+            seed: 随机种子
+            initial_funds, target_score, hand_limit, plays_per_round, discards_per_round: 同Player
+            max_rounds: 最多进行的回合数，同GameEngine
+            hand_rank: 牌型判断器，为None时新建
+        """
+        self.num_envs = num_envs
+        self.initial_funds = initial_funds
+        self.target_score = target_score
+        self.hand_limit = hand_limit
+        self.plays_per_round = plays_per_round
+        self.discards_per_round = discards_per_round
+        self.max_rounds = max_rounds
+        self.hand_rank = hand_rank if hand_rank is not None else TexasPokerHandRanking()
+        self.rng = np.random.default_rng(seed)
+
+        deck_size = len(self.STANDARD_CODES)
+        self.deck = np.empty((num_envs, deck_size), dtype=np.int64)  # 牌堆，从末尾发牌
+        self.deck_size = np.zeros(num_envs, dtype=np.int64)  # 牌堆剩余张数
+        self.hand = np.full((num_envs, hand_limit), PAD_CARD, dtype=np.int64)  # 手牌，空位为PAD_CARD
+        self.hand_count = np.zeros(num_envs, dtype=np.int64)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.current_plays = np.zeros(num_envs, dtype=np.int64)
+        self.current_discards = np.zeros(num_envs, dtype=np.int64)
+        self.current_round = np.ones(num_envs, dtype=np.int64)
+        self.funds = np.zeros(num_envs, dtype=np.int64)
+
+        self._rows = np.arange(num_envs)
+        self._slots = np.arange(hand_limit)
+        self.reset()
+
+    def reset(self, mask=None):
+        """
+        重置对局：洗牌、发初始手牌并清零计数
+
+        参数:
+            mask: 需要重置的对局布尔数组，为None时重置全部
+        """
+        rows = self._rows if mask is None else np.flatnonzero(mask)
+        if len(rows) == 0:
+            return
+        self.deck[rows] = self.rng.permuted(np.broadcast_to(self.STANDARD_CODES, (len(rows), self.deck.shape[1])), axis=1)
+        self.deck_size[rows] = self.deck.shape[1]
+        self.hand[rows] = PAD_CARD
+        self.hand_count[rows] = 0
+        self.score[rows] = 0
+        self.current_plays[rows] = 0
+        self.current_discards[rows] = 0
+        self.current_round[rows] = 1
+        self.funds[rows] = self.initial_funds
+
+        refill = np.zeros(self.num_envs, dtype=bool)
+        refill[rows] = True
+        self._refill(refill)
+
+    def _refill(self, mask):
+        """从牌堆末尾依次补牌到手牌上限，新牌追加在手牌末尾"""
+        needed = np.where(mask, self.hand_limit - self.hand_count, 0)
+        drawn = np.minimum(needed, self.deck_size)
+
+        # 手牌第j个位置取牌堆中第(j - 已有张数)张要发的牌
+        offset = self._slots[None, :] - self.hand_count[:, None]
+        take = (offset >= 0) & (offset < drawn[:, None])
+        deck_index = np.clip(self.deck_size[:, None] - 1 - offset, 0, self.deck.shape[1] - 1)
+        cards = np.take_along_axis(self.deck, deck_index, axis=1)
+        np.copyto(self.hand, cards, where=take)
+
+        self.hand_count += drawn
+        self.deck_size -= drawn
+
+    def _remove_selected(self, selected):
+        """移除选中的手牌，剩余手牌保持原有顺序向前靠拢"""
+        keep = (self.hand != PAD_CARD) & ~selected
+        # 稳定排序把保留的牌移到前面
+        order = np.argsort(~keep, axis=1, kind='stable')
+        self.hand[...] = np.where(np.take_along_axis(keep, order, axis=1), np.take_along_axis(self.hand, order, axis=1), PAD_CARD)
+        self.hand_count[...] = keep.sum(axis=1)
+
+    def _played_cards(self, selected):
+        """按手牌索引从大到小的顺序取出被选中的牌，组成(N, 5)的出牌数组"""
+        key = np.where(selected, -self._slots[None, :], self.hand_limit)
+        order = np.argsort(key, axis=1, kind='stable')[:, :5]
+        played = np.take_along_axis(self.hand, order, axis=1)
+        chosen = np.take_along_axis(selected, order, axis=1)
+        played = np.where(chosen, played, PAD_CARD)
+        if played.shape[1] < 5:
+            played = np.pad(played, ((0, 0), (0, 5 - played.shape[1])), constant_values=PAD_CARD)
+        return played
+
+    def step(self, action_types, selections):
+        """
+        所有对局同时执行一次行动
+
+        参数:
+            action_types: 形状为(N,)的行动类型数组，PLAY或DISCARD
+            selections: 形状为(N, hand_limit)的布尔数组，选中的手牌位置
+
+        返回:
+            tuple: (rewards, dones, infos)
+                rewards: 本次出牌得分
+                dones: 本次行动后结束的对局
+                infos: 字典，包含valid（行动是否有效）、won、final_score、rounds，
+                    后三项只对结束的对局有意义，结束的对局已自动重置
+        """
+        action_types = np.asarray(action_types)
+        selected = np.asarray(selections, dtype=bool)
+        if selected.shape != self.hand.shape:
+            raise ValueError(f"selections的形状必须是{self.hand.shape}")
+
+        # 与play_card/discard_card相同的校验：手牌非空、次数未用完、选1-5张且索引有效
+        counts = selected.sum(axis=1)
+        in_hand = ~(selected & (self.hand == PAD_CARD)).any(axis=1)
+        basic = (self.hand_count > 0) & (counts >= 1) & (counts <= 5) & in_hand
+        play = (action_types == self.PLAY) & basic & (self.current_plays < self.plays_per_round)
+        discard = (action_types == self.DISCARD) & basic & (self.current_discards < self.discards_per_round)
+        valid = play | discard
+
+        rewards = np.zeros(self.num_envs, dtype=np.int64)
+        if play.any():
+            scores = batch_compute_score(self._played_cards(selected & play[:, None]), self.hand_rank)['scores']
+            rewards = np.where(play, scores, 0)
+            self.score += rewards
+            self.current_plays += play
+
+        self.current_discards += discard
+        self._remove_selected(selected & valid[:, None])
+        self._refill(valid)
+
+        # 胜利判定，未胜利且出牌次数用完的对局结束当前回合
+        won = self.score >= self.target_score
+        round_over = ~won & ((self.current_plays >= self.plays_per_round) | (self.hand_count == 0))
+        self._refill(round_over)
+        self.current_round += round_over
+        self.current_plays[round_over] = 0
+        self.current_discards[round_over] = 0
+        # 补牌后仍没有手牌时无法再出牌，之后的回合都会直接结束
+        lost = round_over & ((self.current_round > self.max_rounds) | (self.hand_count == 0))
+
+        dones = won | lost
+        infos = {
+            'valid': valid,
+            'won': won.copy(),
+            'final_score': self.score.copy(),
+            'rounds': np.minimum(self.current_round, self.max_rounds)
+        }
+        self.reset(dones)
+        return rewards, dones, infos
+
+    def can_play(self):
+        """每局是否还能出牌，同Player.can_play"""
+        return (self.current_plays < self.plays_per_round) & (self.hand_count > 0)
+
+    def can_discard(self):
+        """每局是否还能弃牌，同Player.can_discard"""
+        return (self.current_discards < self.discards_per_round) & (self.hand_count > 0)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from engine import Action, GameEngine
+
+    print("===== VecEnv与GameEngine规则一致性测试 =====")
+    num_envs = 64
+    vec_env = VecEnv(num_envs, seed=0, target_score=400)
+
+    def make_engine(row):
+        # 发牌只移动牌堆指针，deck中仍是完整的洗牌顺序，按此顺序重建一局GameEngine
+        engine = GameEngine(target_score=vec_env.target_score)
+        engine.environment.poker_card_pool = [PokerCard.from_code(code) for code in vec_env.deck[row]]
+        engine.start()
+        return engine
+
+    engines = [make_engine(row) for row in range(num_envs)]
+
+    rng = random.Random(0)
+    mismatches = 0
+    finished = 0
+    for _ in range(300):
+        action_types = np.zeros(num_envs, dtype=np.int64)
+        selections = np.zeros((num_envs, vec_env.hand_limit), dtype=bool)
+        actions = []
+        for row, engine in enumerate(engines):
+            kind = rng.choice([VecEnv.PLAY, VecEnv.DISCARD])
+            indices = rng.sample(range(vec_env.hand_limit), rng.randint(1, 5))
+            action_types[row] = kind
+            selections[row, indices] = True
+            actions.append(Action.play(indices) if kind == VecEnv.PLAY else Action.discard(indices))
+
+        rewards, dones, infos = vec_env.step(action_types, selections)
+        for row, engine in enumerate(engines):
+            engine.step(actions[row])
+            if engine.game_over != bool(dones[row]):
+                mismatches += 1
+            if dones[row]:
+                finished += 1
+                if engine.player.score != infos['final_score'][row] or engine.player.has_won() != infos['won'][row]:
+                    mismatches += 1
+                engines[row] = make_engine(row)
+            elif engine.player.score != vec_env.score[row] or [card.code for card in engine.player.hand] != list(vec_env.hand[row][:vec_env.hand_count[row]]):
+                mismatches += 1
+    print(f"共完成 {finished} 局，不一致 {mismatches} 处")
+    print(f"测试结果: {'✓ 通过' if mismatches == 0 else '✗ 失败'}")
+
+    print("\n===== VecEnv吞吐量 =====")
+    num_envs = 4096
+    vec_env = VecEnv(num_envs, seed=1)
+    steps = 200
+    games = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        counts = vec_env.rng.integers(1, 6, size=num_envs)
+        selections = vec_env._slots[None, :] < counts[:, None]
+        rewards, dones, infos = vec_env.step(np.full(num_envs, VecEnv.PLAY), selections)
+        games += int(dones.sum())
+    elapsed = time.perf_counter() - start
+    print(f"{num_envs}局并行，{steps}步用时 {elapsed:.2f}秒，{num_envs * steps / elapsed:.0f}步/秒，完成 {games / elapsed:.0f}局/秒")